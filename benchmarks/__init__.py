@@ -0,0 +1,3 @@
+"""
+micro-benchmarks of the hot paths of pytest-factory, see benchmarks/run.py
+"""
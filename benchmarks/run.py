@@ -0,0 +1,181 @@
+"""
+runs the benchmarks of benchmarks/workloads.py and compares them with the baseline kept in the repo
+
+from the root of the repo:
+    python -m benchmarks.run                      # prints the results
+    python -m benchmarks.run --save               # updates benchmarks/baseline.json with the results
+    python -m benchmarks.run --compare            # exits with 1 if a hot path regressed beyond --threshold
+    python -m benchmarks.run --max-size 1000 -k compare,get_next_response
+
+timings are compared relative to a pure-python calibration loop timed in the same run, so that a baseline recorded on
+one machine can be compared with a run on another
+"""
+import argparse
+import gc
+import json
+import sys
+from pathlib import Path
+from timeit import Timer
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from benchmarks.workloads import WORKLOADS
+
+BASELINE_PATH = Path(__file__).parent.joinpath('baseline.json')
+
+# how much slower than the baseline, relative to the calibration loop, a benchmark may be before it is a regression.
+# the timings of a shared machine vary by about a third from one run to the next, hence the margin and the retries
+DEFAULT_THRESHOLD = 0.5
+
+REPEAT = 3
+
+# how many more times a benchmark that looks like a regression is timed before it counts as one
+RETRIES = 2
+
+
+class BenchmarkResult(NamedTuple):
+    """
+    seconds is the fastest time of one operation; relative is seconds divided by the seconds of the calibration loop
+    """
+    name: str
+    size: int
+    seconds: float
+    relative: float
+
+    @property
+    def key(self) -> str:
+        return f'{self.name}[{self.size}]'
+
+
+class Regression(NamedTuple):
+    key: str
+    baseline: float
+    actual: float
+
+    @property
+    def ratio(self) -> float:
+        return self.actual / self.baseline
+
+
+def calibrate() -> float:
+    """
+    :return: the seconds of one run of a fixed pure-python loop of dict and str operations
+    """
+    def loop():
+        d = {}
+        for i in range(2_000):
+            key = f'key{i}'
+            d[key] = key.upper()
+            d.get(key.lower())
+        return d
+
+    return time_op(loop)
+
+
+def time_op(op, repeat: int = REPEAT) -> float:
+    """
+    :return: the fastest time of one call of op, over repeat runs that each take at least 0.2 seconds
+    """
+    timer = Timer(op)
+    number, _ = timer.autorange()
+    gc.collect()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(names: Optional[Iterable[str]] = None, max_size: Optional[int] = None,
+        repeat: int = REPEAT) -> List[BenchmarkResult]:
+    """
+    :param names: the workloads to run; all of them if not given
+    :param max_size: if given, sizes above it are skipped
+    """
+    results = []
+    for name in names or WORKLOADS:
+        for size in WORKLOADS[name][1]:
+            if max_size is None or size <= max_size:
+                results.append(run_one(name=name, size=size, repeat=repeat))
+    return results
+
+
+def run_one(name: str, size: int, repeat: int = REPEAT) -> BenchmarkResult:
+    op = WORKLOADS[name][0](size)
+    # calibrated next to each benchmark, since the speed of a shared machine drifts during a run
+    calibration = calibrate()
+    seconds = time_op(op, repeat=repeat)
+    return BenchmarkResult(name=name, size=size, seconds=seconds, relative=seconds / calibration)
+
+
+def to_json(results: Iterable[BenchmarkResult]) -> Dict[str, Dict[str, float]]:
+    return {result.key: {'seconds': result.seconds, 'relative': result.relative} for result in results}
+
+
+def compare(results: Iterable[BenchmarkResult], baseline: Dict[str, Dict[str, float]],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Regression]:
+    """
+    :param baseline: results as written by to_json; benchmarks that are not in it are not compared
+    :return: the benchmarks that are more than threshold slower than baseline, relative to the calibration loop
+    """
+    regressions = []
+    for result in results:
+        expected = baseline.get(result.key)
+        if expected and result.relative > expected['relative'] * (1 + threshold):
+            regressions.append(Regression(key=result.key, baseline=expected['relative'], actual=result.relative))
+    return regressions
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, factor in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds * factor >= 1:
+            return f'{seconds * factor:.2f} {unit}'
+    return f'{seconds * 1e9:.0f} ns'
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='names', default=None, help='comma-separated workloads to run')
+    parser.add_argument('--max-size', type=int, default=None, help='skip workloads of more test doubles than this')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--save', action='store_true', help=f'write the results to {BASELINE_PATH.name}')
+    parser.add_argument('--compare', action='store_true', help=f'compare the results with {BASELINE_PATH.name}')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--retries', type=int, default=RETRIES,
+                        help='how many more times to time a benchmark that looks like a regression')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    args = parser.parse_args(argv)
+
+    names = args.names.split(',') if args.names else None
+    results = run(names=names, max_size=args.max_size, repeat=args.repeat)
+    baseline = {}
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for _ in range(args.retries):
+            regressed = {regression.key for regression in compare(results, baseline=baseline,
+                                                                  threshold=args.threshold)}
+            results = [min(result, run_one(name=result.name, size=result.size, repeat=args.repeat),
+                           key=lambda r: r.relative) if result.key in regressed else result
+                       for result in results]
+    for result in results:
+        line = f'{result.key:<32}{format_seconds(result.seconds):>12}{result.relative:>14.3f}x'
+        if result.key in baseline:
+            line += f'{result.relative / baseline[result.key]["relative"]:>10.2f} of baseline'
+        print(line)
+
+    if args.save:
+        saved = {}
+        if args.baseline.exists():
+            with open(args.baseline) as f:
+                saved = json.load(f)
+        saved.update(to_json(results))
+        with open(args.baseline, 'w') as f:
+            json.dump(dict(sorted(saved.items())), f, indent=2)
+            f.write('\n')
+    if args.compare:
+        regressions = compare(results, baseline=baseline, threshold=args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression.key}: {regression.ratio:.2f}x the baseline', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
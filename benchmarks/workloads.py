@@ -0,0 +1,148 @@
+"""
+synthetic workloads for the hot paths of pytest-factory. each workload takes the number of test doubles and returns
+the operation to time, after doing its setup; nothing here touches the network or config.ini
+"""
+from json import JSONDecodeError
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List, Tuple
+
+from pytest_factory.framework.base_types import BaseMockRequest, Factory, TrackedResponses
+from pytest_factory.framework.http_types import MockHttpRequest, MockHttpResponse
+from pytest_factory.framework.store import Store
+
+# the handler the recordings are of; the writer only needs its import path
+SUT_CALLABLE = 'tests.test_http.passthru_app.PassthruTestHandler'
+
+# the distinct requests that an operation cycles through, so that route caches see more than one key
+PROBES = 64
+
+
+def make_requests(n: int) -> List[MockHttpRequest]:
+    return [MockHttpRequest(url=f'http://www.test{i % 10}.com/endpoint{i}?id={i}', method='get') for i in range(n)]
+
+
+def make_responses(n: int) -> List[MockHttpResponse]:
+    return [MockHttpResponse(body=f'response {i}'.encode(), status=200) for i in range(n)]
+
+
+def compare(n: int) -> Callable[[], None]:
+    """
+    MockHttpRequest.compare of a request against every one of n test doubles, i.e. a linear scan for its route
+    """
+    keys = make_requests(n)
+    probe = MockHttpRequest(url=keys[-1].url, method='get')
+
+    def op():
+        for key in keys:
+            key.compare(probe, wildcard_fields=())
+
+    return op
+
+
+def get_next_response(n: int) -> Callable[[], None]:
+    """
+    Store.get_next_response for requests to PROBES of n endpoints, replaying their responses as Store.bench does
+    """
+    store = Store(test_path='benchmarks.get_next_response')
+    store.update(factory_name='make_factory', req_obj=BaseMockRequest(), response=object(), response_is_sut=True)
+    requests = make_requests(n)
+    for req_obj, response in zip(requests, make_responses(n)):
+        store.update(factory_name='mock_http_server', req_obj=req_obj, response=response)
+    store._bench = True
+    probes = [MockHttpRequest(url=requests[i].url, method='get') for i in range(0, n, max(n // PROBES, 1))]
+
+    def op():
+        for req_obj in probes:
+            store.get_next_response(factory_name='mock_http_server', req_obj=req_obj)
+
+    return op
+
+
+def factory_setitem(n: int) -> Callable[[], None]:
+    """
+    Factory.__setitem__ of n test doubles into an empty Factory
+    """
+    items = [(req_obj, TrackedResponses.from_any(exchange_id=req_obj.exchange_id, response=response))
+             for req_obj, response in zip(make_requests(n), make_responses(n))]
+
+    def op():
+        factory = Factory()
+        for key, value in items:
+            factory[key] = value
+
+    return op
+
+
+def tracked_responses(n: int) -> Callable[[], None]:
+    """
+    TrackedResponses made from n responses, each dequeued once and then once more than there are responses
+    """
+    responses = make_responses(n)
+
+    def op():
+        tracked = TrackedResponses.from_any(exchange_id='benchmark', response=responses)
+        for _ in range(n + 1):
+            tracked.dequeue()
+
+    return op
+
+
+def make_recording(n: int):
+    from pytest_factory.lifecycle.recording import Recording
+    from pytest_factory.monkeypatch.tornado import TornadoRequest
+
+    request = TornadoRequest(url='endpoint0', sut_callable=SUT_CALLABLE)
+    doc_exchanges = list(zip(make_requests(n), make_responses(n)))
+    return Recording(incident_type=JSONDecodeError, sut_exchange=(request, JSONDecodeError),
+                     doc_exchanges=doc_exchanges)
+
+
+def recording_serialize(n: int) -> Callable[[], None]:
+    """
+    Recording.serialize of a Recording with n exchanges with depended-on-components
+    """
+    recording = make_recording(n)
+    return recording.serialize
+
+
+def recording_deserialize(n: int) -> Callable[[], None]:
+    """
+    Recording.deserialize of a Recording with n exchanges with depended-on-components
+    """
+    from pytest_factory.lifecycle.recording import Recording
+
+    serialized = make_recording(n).serialize()
+    return lambda: Recording.deserialize(b_a=serialized)
+
+
+def write_test(n: int) -> Callable[[], None]:
+    """
+    Writer.write_test of a Recording with n exchanges with depended-on-components, into a temporary directory, data
+    file included
+    """
+    from pytest_factory.lifecycle.writer import Writer
+
+    writer = Writer(recording=make_recording(n))
+    # everything the writer writes goes here. removed once the operation is garbage collected, since the operation
+    # holds the only reference to it
+    directory = TemporaryDirectory(prefix='pytest_factory_benchmarks_')
+
+    def op():
+        path = Path(directory.name)
+        writer.write_test(path.joinpath('test_benchmark.py'), data_path=path.joinpath('actual_response'))
+
+    return op
+
+
+# the workloads by name, with the numbers of test doubles each is run with. the writer formats the test it writes with
+# black, which is too slow for 100k test doubles to be worth waiting for
+WORKLOADS: Dict[str, Tuple[Callable[[int], Callable[[], None]], Tuple[int, ...]]] = {
+    'compare': (compare, (10, 1_000, 100_000)),
+    'get_next_response': (get_next_response, (10, 1_000, 100_000)),
+    'factory_setitem': (factory_setitem, (10, 1_000, 100_000)),
+    'tracked_responses': (tracked_responses, (10, 1_000, 100_000)),
+    'recording_serialize': (recording_serialize, (10, 1_000, 100_000)),
+    'recording_deserialize': (recording_deserialize, (10, 1_000, 100_000)),
+    'write_test': (write_test, (10, 1_000)),
+}
@@ -1,2 +1,24 @@
-from pytest_factory.http import mock_http_server
-from pytest_factory.framework.factory import make_factory
+from importlib import import_module
+
+# the decorators are imported the first time they are used, so that importing the pytest plugin, e.g. for
+# pytest --collect-only, does not load the factories and the http types before any test needs them
+_LAZY_EXPORTS = {
+    'mock_http_server': 'pytest_factory.http',
+    'mock_http_server_table': 'pytest_factory.http',
+    'make_factory': 'pytest_factory.framework.factory',
+    'make_bulk_factory': 'pytest_factory.framework.factory',
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(_LAZY_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
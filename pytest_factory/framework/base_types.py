@@ -1,12 +1,20 @@
 from __future__ import annotations
+import asyncio
 import json
+from operator import itemgetter
+from threading import Lock
 from uuid import uuid4
 from datetime import datetime
-from typing import Any, Dict, Union, List, Tuple, Optional, TypeVar, Set
+from collections.abc import Iterator, AsyncIterator
+from typing import Any, Dict, Union, List, Tuple, Optional, TypeVar, Set, Hashable, Callable
+
+import pytest_factory.framework.exceptions as exceptions
+from pytest_factory.framework.parse_configs import ConfigSnapshot
+from pytest_factory.framework.routing import RouteIndex, RouteEntry
 
 ALLOWED_TYPES = {int, bytes, str, type(None), bool, dict, type}
 
-HIDDEN_MSG_PROPS = {'exchange_id', '_exchange_id', 'timestamp', '_timestamp'}
+HIDDEN_MSG_PROPS = {'exchange_id', '_exchange_id', 'timestamp', '_timestamp', '_signature'}
 
 
 def stringify(x):
@@ -111,7 +119,7 @@ class BaseMockRequest(Message):
         self._timestamp = timestamp
         self._exchange_id = exchange_id
 
-    def compare(self, other) -> bool:
+    def compare(self, other, **kwargs) -> bool:
         """
         we are effectively simulating the third-party endpoint's router here. note that "this" is the request object of
         the test double that MAY match actual. the "other" request object is the actual request generated by the
@@ -121,6 +129,23 @@ class BaseMockRequest(Message):
         """
         raise NotImplementedError
 
+    def get_route(self) -> Optional[Tuple[Hashable, ...]]:
+        """
+        the segments that a Factory uses to index this request, in the order compare() checks them. a segment that is
+        empty or "*" is treated as matching any value. if None (the default), this request will be compared against
+        every key of the Factory
+        """
+        return None
+
+    def get_compare_kwargs(self, config: Optional[ConfigSnapshot] = None) -> Dict[str, Any]:
+        """
+        when this is the actual request, Factory resolves these kwargs once per lookup and passes them to compare() of
+        every key it checks, so that settings needed by compare() are not looked up again for each key
+
+        :param config: the configuration of the test directory, as handed to the Factory by its Store
+        """
+        return {}
+
     def __hash__(self) -> int:
         """
         this is necessary because https://stackoverflow.com/questions/1608842/types-that-define-eq-are-unhashable
@@ -139,74 +164,377 @@ class BaseMockResponse(Message):
         self._timestamp = self.timestamp or timestamp
 
 
-def compare_unknown_types(a, b) -> bool:
+def compare_unknown_types(a, b, **kwargs) -> bool:
     if hasattr(a, 'compare'):
-        compare_result = a.compare(b)
+        compare_result = a.compare(b, **kwargs)
     elif hasattr(b, 'compare'):
-        compare_result = b.compare(a)
+        compare_result = b.compare(a, **kwargs)
     else:
         compare_result = a == b
     return compare_result
 
 
-class TrackedResponses(list):
+_EXHAUSTED = object()
+# the first response of an async iterator, which can only be pulled once there is an event loop to await it in
+_PENDING = object()
+
+LAZY_RESPONSES_TYPE = Union[Iterator, AsyncIterator]
+
+
+def pull_next(source: LAZY_RESPONSES_TYPE) -> Any:
+    """
+    pulls the next response from a lazy source of responses for a synchronous adapter, e.g. requests. an async iterator
+    is stepped without an event loop, so it may only await things that complete without suspending; asynchronous
+    adapters await it instead, see apull_next
+
+    :param source: a generator, iterator or async iterator
+    :return: the next response, or _EXHAUSTED if there are none left
+    """
+    if isinstance(source, Iterator):
+        return next(source, _EXHAUSTED)
+    step = source.__anext__()
+    try:
+        step.send(None)
+    except StopIteration as si:
+        return si.value
+    except StopAsyncIteration:
+        return _EXHAUSTED
+    step.close()
+    raise exceptions.LazyResponseException(source=source)
+
+
+async def apull_next(source: LAZY_RESPONSES_TYPE) -> Any:
+    """
+    pulls the next response from a lazy source of responses for an asynchronous adapter, e.g. aiohttp, so that an
+    async iterator may await anything, e.g. asyncio.sleep, I/O or an asyncio.Queue
+
+    :param source: a generator, iterator or async iterator
+    :return: the next response, or _EXHAUSTED if there are none left
+    """
+    if isinstance(source, Iterator):
+        return next(source, _EXHAUSTED)
+    try:
+        return await source.__anext__()
+    except StopAsyncIteration:
+        return _EXHAUSTED
+
+
+class TrackedResponses:
     """
-    a queue that dequeues by flipping a bool paired with the item so that the next dequeue skips it
+    a queue that dequeues by advancing a cursor over the responses, so that neither the responses nor their called
+    state are copied on each call. count is the cursor: the number of times this test double was called, including
+    any calls made after the responses ran out
+
+    if the responses are a generator, iterator or async iterator, they are pulled from it on demand and only the last
+    dequeued response and the next one are held, however long the source is. pulling one response ahead is how the
+    queue knows whether any responses are left uncalled, so the code that a generator runs to make a response runs one
+    call early: the first response is pulled when the test double is stocked, and each call pulls the response of the
+    next call. an async iterator is first pulled by its first call, since stocking has no event loop to await it in;
+    until then it counts as one uncalled response. note that such a source is consumed by the first test that calls
+    it, so it should not be shared by several tests, e.g. by decorating a test class with it
+
+    dequeuing holds a lock of its own, so that a system-under-test that calls the same depended-on-component from
+    several threads gets each response exactly once
     """
+    __slots__ = ('_responses', '_size', '_source', '_next', '_lock', '_async_lock', 'count', 'exchange_id',
+                 'factory_name')
 
-    def __init__(self, *args, exchange_id: Optional[str] = None, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.count = 0
+    def __init__(self, responses: Union[List, Tuple, LAZY_RESPONSES_TYPE] = (), exchange_id: Optional[str] = None,
+                 factory_name: Optional[str] = None):
+        """
+        :param responses: the responses in the order they will be dequeued, or a lazy source of them
+        :param exchange_id: the exchange_id of the request these responses belong to
+        :param factory_name: the name of the factory these responses were made by, if they are counted by a Store
+        """
+        self.count: int = 0
         self.exchange_id = exchange_id
+        self.factory_name = factory_name
+        self._lock = Lock()
+        self._async_lock: Optional[asyncio.Lock] = None
+        if is_lazy(responses):
+            self._source: Optional[LAZY_RESPONSES_TYPE] = responses
+            self._responses: Tuple = ()
+            self._next = _PENDING if isinstance(responses, AsyncIterator) else pull_next(responses)
+            self._size: int = 0 if self._next is _EXHAUSTED else 1
+        else:
+            self._source = None
+            self._responses = tuple(responses)
+            self._next = _EXHAUSTED
+            self._size = len(self._responses)
 
     @classmethod
-    def from_any(cls, exchange_id: str, response: Union[Any, List]):
-        responses = [response] if not isinstance(response, list) else response
-        tracked_responses = [(False, _response) for _response in responses]
-        tr = cls(tracked_responses, exchange_id=exchange_id)
-        return tr
+    def from_any(cls, exchange_id: str, response: Union[Any, List, LAZY_RESPONSES_TYPE]):
+        responses = response if isinstance(response, list) or is_lazy(response) else (response,)
+        return cls(responses, exchange_id=exchange_id)
+
+    def __len__(self) -> int:
+        """
+        :return: the number of responses; for a lazy source, the number pulled from it so far
+        """
+        return self._size
+
+    def __repr__(self) -> str:
+        responses = self._source if self._source is not None else list(self._responses)
+        return f'{self.__class__.__name__}({responses}, count={self.count})'
+
+    @property
+    def called(self) -> int:
+        """
+        the number of responses that have been dequeued
+        """
+        return min(self.count, self._size)
+
+    @property
+    def uncalled(self) -> int:
+        return self._size - self.called
+
+    def uncalled_responses(self) -> List:
+        if self._source is not None:
+            if self._next is _PENDING:
+                return [self._source]
+            return [] if self._next is _EXHAUSTED else [self._next]
+        return list(self._responses[self.count:])
 
     def response(self, i=0):
-        if len(self) == 0:
+        """
+        :param i: the index of the response; a lazy source only keeps the last dequeued response, which is returned
+            for any i
+        """
+        if not self._responses:
             return None
-        return self[i][1]
+        return self._responses[i] if self._source is None else self._responses[0]
+
+    def rewind(self) -> bool:
+        """
+        makes every response uncalled again, e.g. to replay them while benchmarking; a lazy source cannot be rewound
+
+        :return: True if the responses were rewound
+        """
+        if self._source is not None:
+            return False
+        with self._lock:
+            self.count = 0
+        return True
 
     def mark_and_retrieve_next(self) -> Any:
         """
         the dequeue method
         """
-        if self.count >= len(self):
+        return self.dequeue()[0]
+
+    def dequeue(self, replay: bool = False) -> Tuple[Any, int]:
+        """
+        dequeues the next response and reports how the number of uncalled responses changed, as one atomic step
+
+        :param replay: if True and no responses are left uncalled, the responses are rewound first (see rewind)
+        :return: the response, or None if there are none left, and the number of responses that stopped being
+            uncalled; this is negative if the responses were rewound
+        """
+        with self._lock:
+            uncalled = self.uncalled
+            if replay and not uncalled and self._source is None:
+                self.count = 0
+            response = self._dequeue()
+            return response, uncalled - self.uncalled
+
+    async def adequeue(self, replay: bool = False) -> Tuple[Any, int]:
+        """
+        dequeue for asynchronous adapters: the next response of an async iterator is awaited, see apull_next
+        """
+        if not isinstance(self._source, AsyncIterator):
+            return self.dequeue(replay=replay)
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            uncalled = self.uncalled
+            response = self._next
+            if response is _PENDING:
+                response = self._pulled(await apull_next(self._source))
             self.count += 1
+            if response is not _EXHAUSTED:
+                self._pulled_ahead(response, await apull_next(self._source))
+            return None if response is _EXHAUSTED else response, uncalled - self.uncalled
+
+    def _dequeue(self) -> Any:
+        count = self.count
+        if self._source is None:
+            self.count = count + 1
+            return self._responses[count] if count < self._size else None
+        response = self._next
+        if response is _PENDING:
+            response = self._pulled(pull_next(self._source))
+        self.count = count + 1
+        if response is _EXHAUSTED:
             return None
-        response = self[self.count][1]
-        self[self.count] = (True, response)
-        self.count += 1
+        self._pulled_ahead(response, pull_next(self._source))
         return response
 
+    def _pulled(self, response: Any) -> Any:
+        """
+        takes the first response of an async iterator, which was counted as uncalled before it was pulled
+        """
+        if response is _EXHAUSTED:
+            self._next = _EXHAUSTED
+            self._size -= 1
+        return response
+
+    def _pulled_ahead(self, response: Any, next_response: Any):
+        self._responses = (response,)
+        self._next = next_response
+        if next_response is not _EXHAUSTED:
+            self._size += 1
+
+
+def is_lazy(responses: Any) -> bool:
+    return isinstance(responses, (Iterator, AsyncIterator))
+
+
+class SutBuilder:
+    """
+    builds the system-under-test when its test first asks the Store for it, rather than during collection
+    """
+    __slots__ = ('build', 'release')
+
+    def __init__(self, build: Callable[[], Any], release: Optional[Callable[[Any], None]] = None):
+        """
+        :param build: returns a new system-under-test
+        :param release: if given, receives the system-under-test once its test is done, e.g. to return it to a pool
+        """
+        self.build = build
+        self.release = release
+
 
 class Factory(dict):
     """
     wrapping the mapping between requests and test doubles in an object so
     we can add attributes to it
+
+    keys are also indexed by their route (see BaseMockRequest.get_route) so that get_matching_key only has to compare
+    the actual request against keys that may match it. string keys (e.g. plugin urls) and keys without a route are
+    kept in their own buckets and are always compared
     """
 
-    def __init__(self, req_obj: Union[str, BaseMockRequest], responses: TrackedResponses):
+    def __init__(self, req_obj: Optional[Union[str, BaseMockRequest]] = None,
+                 responses: Optional[TrackedResponses] = None, config: Optional[ConfigSnapshot] = None):
+        """
+        :param config: the configuration that compare kwargs are resolved from, unless a lookup is given its own
+        """
         super().__init__()
-        self.__setitem__(req_obj, responses)
+        self.config = config
+        self._routes = RouteIndex()
+        self._str_keys: List[RouteEntry] = []
+        self._unrouted_keys: List[RouteEntry] = []
+        self._signatures: Dict[Hashable, Any] = {}
+        self._next_order = 0
+        if req_obj is not None:
+            self.__setitem__(req_obj, responses)
 
     def __setitem__(self, key, value):
-        for _key in self.keys():
-            if compare_unknown_types(key, _key):
-                return
+        """
+        a key that would match an existing key is ignored, so the first test double registered for a request wins
+        """
+        if self.get_duplicate_key(key) is None:
+            self._set(key, value)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._reindex()
+
+    def update(self, *args, **kwargs):
+        """
+        like dict.update, the given keys are added without checking if they duplicate existing keys
+        """
+        for key, value in dict(*args, **kwargs).items():
+            self._set(key, value)
+
+    def _set(self, key, value):
+        if key not in self:
+            self._index(key)
         super().__setitem__(key, value)
 
+    def _index(self, key):
+        order = self._next_order
+        self._next_order += 1
+        signature = getattr(key, 'signature', None)
+        if signature is not None:
+            self._signatures.setdefault(signature, key)
+        if isinstance(key, str):
+            self._str_keys.append((order, key))
+            return
+        route = key.get_route() if isinstance(key, BaseMockRequest) else None
+        if route is None:
+            self._unrouted_keys.append((order, key))
+        else:
+            self._routes.add(route=route, order=order, key=key)
+
+    def _reindex(self):
+        self._routes = RouteIndex()
+        self._str_keys = []
+        self._unrouted_keys = []
+        self._signatures = {}
+        self._next_order = 0
+        for key in self.keys():
+            self._index(key)
+
+    def get_duplicate_key(self, key: Any, config: Optional[ConfigSnapshot] = None) -> Optional[Any]:
+        """
+        :param key: a key that may be added to this Factory
+        :param config: defaults to the config of this Factory
+        :return: an existing key that key matches, or None; an existing key with the same signature is found by hash
+        """
+        if key in self:
+            return key
+        signature = getattr(key, 'signature', None)
+        if signature is not None and signature in self._signatures:
+            return self._signatures[signature]
+        if isinstance(key, BaseMockRequest):
+            route, compare_kwargs = key.get_route(), key.get_compare_kwargs(config or self.config)
+        else:
+            route, compare_kwargs = None, {}
+        if route is None:
+            candidates = self.keys()
+        else:
+            candidates = [_key for _, _key in self._routes.overlapping(route)]
+            candidates.extend(_key for _, _key in self._str_keys)
+            candidates.extend(_key for _, _key in self._unrouted_keys)
+        for _key in candidates:
+            if compare_unknown_types(key, _key, **compare_kwargs):
+                return _key
+        return None
+
+    def get_matching_key(self, req_obj: Any, config: Optional[ConfigSnapshot] = None) -> Optional[Any]:
+        """
+        simulates the router of the depended-on-component: finds the first key, in order of insertion, that matches
+        the actual request
+
+        :param req_obj: the actual request generated by the component under test
+        :param config: defaults to the config of this Factory
+        :return: the matching key or None if no key matches
+        """
+        if isinstance(req_obj, BaseMockRequest):
+            route, compare_kwargs = req_obj.get_route(), req_obj.get_compare_kwargs(config or self.config)
+        else:
+            route, compare_kwargs = None, {}
+        if route is None:
+            candidates = self.keys()
+        else:
+            entries = self._routes.match(route)
+            entries.extend(self._str_keys)
+            entries.extend(self._unrouted_keys)
+            entries.sort(key=itemgetter(0))
+            candidates = [key for _, key in entries]
+        for key in candidates:
+            if compare_unknown_types(key, req_obj, **compare_kwargs):
+                return key
+        return None
+
     @property
     def get_sut(self) -> Any:
-        return list(self.values())[0].response()
+        return next(iter(self.values())).response()
 
     @property
     def FACTORY_NAME(self):
-        return list(self.keys())[0].FACTORY_NAME
+        return next(iter(self.keys())).FACTORY_NAME
 
 
 class BasePlugin:
@@ -252,6 +580,6 @@ T = TypeVar("T")
 MAGIC_TYPE = Optional[Union[List[T], T]]
 
 BASE_RESPONSE_TYPE = Union[Exception, T]
-MOCK_RESPONSES_TYPE = List[Tuple[bool, BASE_RESPONSE_TYPE]]
+MOCK_RESPONSES_TYPE = TrackedResponses
 ANY_MOCK_RESPONSE = MAGIC_TYPE[BASE_RESPONSE_TYPE[T]]
 Exchange = Tuple[Union[BaseMockRequest], BASE_RESPONSE_TYPE]
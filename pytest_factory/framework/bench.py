@@ -0,0 +1,82 @@
+"""
+the benchmark harness that drives the system-under-test of a test many times against the test doubles in its Store, see
+Store.bench
+"""
+import asyncio
+import inspect
+import json
+import math
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, List, NamedTuple, Optional, Union
+
+
+class BenchResult(NamedTuple):
+    """
+    the throughput and latency of the system-under-test; latencies are in milliseconds
+    """
+    test_path: str
+    n: int
+    concurrency: int
+    seconds: float
+    ops_per_sec: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    def write(self, path: Union[str, Path]):
+        """
+        writes this result to path as json, e.g. for comparing the results of two builds in CI
+        """
+        with open(path, 'w') as f:
+            json.dump(self._asdict(), f, indent=2)
+
+
+def percentile(latencies: List[float], p: float) -> float:
+    """
+    :param latencies: sorted latencies
+    :param p: the percentile, from 0 to 100
+    :return: the nearest-rank percentile of latencies
+    """
+    if not latencies:
+        return 0.0
+    return latencies[min(len(latencies), max(math.ceil(p / 100 * len(latencies)), 1)) - 1]
+
+
+async def drive(build: Callable[[], Any], run: Callable[[Any], Any], release: Optional[Callable[[Any], None]],
+                n: int, concurrency: int) -> List[float]:
+    """
+    runs n systems-under-test, concurrency at a time
+
+    :param build: returns a system-under-test for one run
+    :param run: takes the system-under-test and runs it; may return an awaitable
+    :param release: if given, takes the system-under-test back after its run
+    :return: the latency of each run in seconds, in the order the runs finished
+    """
+    latencies: List[float] = []
+    remaining = n
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            sut = build()
+            start = perf_counter()
+            result = run(sut)
+            if inspect.isawaitable(result):
+                await result
+            latencies.append(perf_counter() - start)
+            if release:
+                release(sut)
+
+    await asyncio.gather(*(worker() for _ in range(max(min(concurrency, n), 1))))
+    return latencies
+
+
+def summarize(test_path: str, latencies: List[float], concurrency: int, seconds: float) -> BenchResult:
+    latencies = sorted(latencies)
+    return BenchResult(test_path=test_path, n=len(latencies), concurrency=concurrency, seconds=seconds,
+                       ops_per_sec=len(latencies) / seconds if seconds else 0.0,
+                       p50_ms=percentile(latencies, 50) * 1000,
+                       p95_ms=percentile(latencies, 95) * 1000,
+                       p99_ms=percentile(latencies, 99) * 1000)
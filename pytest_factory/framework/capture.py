@@ -0,0 +1,122 @@
+"""
+capture policies for the Messages exchanged between the system-under-test and its depended-on-components during a
+test, i.e. Store.messages
+"""
+import json
+import os
+from collections import Counter, deque
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import Any, Iterable, Iterator, Optional, Deque, IO, Union
+
+from pytest_factory.framework.exceptions import ConfigException
+
+CAPTURE_MODES = {'off', 'counts', 'ring', 'full'}
+
+
+def serialize_message(message: Any) -> str:
+    return message.serialize() if hasattr(message, 'serialize') else str(message)
+
+
+class MessageLog:
+    """
+    a sequence of captured Messages that may only keep part of what it was given, depending on its mode:
+    - off: only the total number of messages is kept
+    - counts: the number of messages of each type is kept as well
+    - ring: the last size messages are kept
+    - full: every message is kept. if size is given, the messages before the last size are spilled to a temporary
+        JSONL file at spill_path, without splitting an exchange, one line per call of append or extend: the input of
+        the system-under-test on its own line, then one exchange with a depended-on-component per line
+
+    indexing, iterating and len() only see the messages that are kept in memory; total counts every message
+
+    appending holds a lock, so that the request and response of an exchange made from another thread stay together
+    """
+    __slots__ = ('mode', 'size', 'total', 'counts', 'spill_path', '_messages', '_groups', '_spill_file', '_lock')
+
+    def __init__(self, mode: str = 'full', size: Optional[int] = None):
+        if mode not in CAPTURE_MODES:
+            raise ConfigException(log_msg=f'capture mode must be one of {sorted(CAPTURE_MODES)}! got: {mode}')
+        if mode == 'ring' and not size:
+            raise ConfigException(log_msg='capture mode ring requires a capture_size!')
+        self.mode = mode
+        self.size = size
+        self.total = 0
+        self.counts: Counter = Counter()
+        self.spill_path: Optional[str] = None
+        self._messages: Deque = deque(maxlen=size if mode == 'ring' else None)
+        # the number of messages of each call of append or extend, while spilling
+        self._groups: Deque[int] = deque()
+        self._spill_file: Optional[IO] = None
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __getitem__(self, i: Union[int, slice]) -> Any:
+        if isinstance(i, slice):
+            return list(self._messages)[i]
+        return self._messages[i]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._messages)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(mode={self.mode}, total={self.total}, messages={list(self._messages)})'
+
+    def append(self, message: Any):
+        with self._lock:
+            self._append(message)
+            self._end_group(1)
+
+    def extend(self, messages: Iterable[Any]):
+        with self._lock:
+            n = 0
+            for message in messages:
+                self._append(message)
+                n += 1
+            self._end_group(n)
+
+    def _append(self, message: Any):
+        self.total += 1
+        if self.mode == 'off':
+            return
+        if self.mode == 'counts':
+            self.counts[type(message).__name__] += 1
+            return
+        self._messages.append(message)
+
+    def _end_group(self, n: int):
+        if self.mode != 'full' or self.size is None or not n:
+            return
+        self._groups.append(n)
+        if len(self._messages) - self._groups[0] >= self.size:
+            self._spill()
+
+    def _spill(self):
+        if self._spill_file is None:
+            self._spill_file = NamedTemporaryFile(mode='w', prefix='pytest_factory_', suffix='.jsonl', delete=False)
+            self.spill_path = self._spill_file.name
+        while self._groups and len(self._messages) - self._groups[0] >= self.size:
+            group = [serialize_message(self._messages.popleft()) for _ in range(self._groups.popleft())]
+            self._spill_file.write(json.dumps(group) + '\n')
+
+    def flush(self):
+        if self._spill_file is not None:
+            self._spill_file.flush()
+
+    def close(self, delete: bool = False):
+        """
+        closes the spill file, if any
+
+        :param delete: if True, the spill file is deleted as well; otherwise it is left at spill_path for inspection
+        """
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        if delete and self.spill_path is not None:
+            try:
+                os.remove(self.spill_path)
+            except FileNotFoundError:
+                pass
+            self.spill_path = None
@@ -0,0 +1,144 @@
+"""
+the simulated clock that lets tests of timeouts, latency and retries with backoff run without waiting in real time
+"""
+import asyncio
+import heapq
+import time
+from itertools import count
+from typing import Any, List, Tuple
+
+from pytest_factory.framework.exceptions import VirtualClockException
+
+_real_monotonic = time.monotonic
+_real_time = time.time
+_real_async_sleep = asyncio.sleep
+
+
+def check_loop(loop: asyncio.AbstractEventLoop):
+    """
+    the clock can only tell that the event loop is idle, and when its next timer is due, from the internals of the
+    event loops of asyncio itself, so it refuses any other, e.g. uvloop
+    """
+    if not isinstance(loop, asyncio.BaseEventLoop):
+        raise VirtualClockException(loop=loop)
+
+
+def _wake(future: asyncio.Future, result: Any):
+    if not future.done():
+        future.set_result(result)
+
+
+class VirtualClock:
+    """
+    while entered, time.monotonic, time.time, time.sleep and asyncio.sleep are patched so that sleeping advances the
+    clock instead of waiting. neither the event loop nor the Tornado IOLoop is patched for their clocks: loop.time()
+    calls time.monotonic and IOLoop.time() calls time.time, so both read the patched functions. the only hook on the
+    running event loop is its call_at, which every timer goes through (call_later, asyncio.wait_for, and the IOLoop's
+    call_at and tornado.gen.sleep), and which only makes sure the clock advances once the timer is the next thing due
+
+    time.sleep advances the clock at once, since it blocks every other task. asyncio.sleep suspends the task until
+    the event loop has nothing else ready to run, and then the clock jumps to the earliest sleeper or timer that is
+    due, so concurrent sleeps overlap as they would in real time
+    """
+
+    def __init__(self):
+        self.offset = 0.0
+        self._sleepers: List[Tuple[float, int, asyncio.Future, Any]] = []
+        self._order = count()
+        self._armed = False
+        self._patches: List[Tuple[Any, str, Any]] = []
+
+    @property
+    def elapsed(self) -> float:
+        """
+        :return: the seconds of simulated time that have passed since the clock was entered
+        """
+        return self.offset
+
+    def monotonic(self) -> float:
+        return _real_monotonic() + self.offset
+
+    def time(self) -> float:
+        return _real_time() + self.offset
+
+    def sleep(self, seconds: float):
+        if seconds < 0:
+            raise ValueError('sleep length must be non-negative')
+        self.offset += seconds
+
+    async def async_sleep(self, delay: float, result: Any = None) -> Any:
+        if delay <= 0:
+            return await _real_async_sleep(0, result)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._sleepers, (self.monotonic() + delay, next(self._order), future, result))
+        self._arm(loop)
+        return await future
+
+    def __enter__(self) -> 'VirtualClock':
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            check_loop(loop)
+        self._patch(time, 'monotonic', self.monotonic)
+        self._patch(time, 'time', self.time)
+        self._patch(time, 'sleep', self.sleep)
+        self._patch(asyncio, 'sleep', self.async_sleep)
+        self._patch(asyncio.tasks, 'sleep', self.async_sleep)
+        if loop is None:
+            return self
+        call_at = loop.call_at
+
+        def armed_call_at(*args, **kwargs):
+            self._arm(loop)
+            return call_at(*args, **kwargs)
+
+        self._patch(loop, 'call_at', armed_call_at)
+        return self
+
+    def __exit__(self, exc_type, exc_val, traceback):
+        for obj, name, original in reversed(self._patches):
+            if original is None:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self._patches.clear()
+        # anything still asleep, e.g. a background task of the system-under-test, wakes up in real time from now on
+        while self._sleepers:
+            deadline, _, future, result = heapq.heappop(self._sleepers)
+            if not future.done():
+                future.get_loop().call_later(max(deadline - self.monotonic(), 0), _wake, future, result)
+
+    def _patch(self, obj: Any, name: str, value: Any):
+        self._patches.append((obj, name, vars(obj).get(name)))
+        setattr(obj, name, value)
+
+    def _arm(self, loop: asyncio.AbstractEventLoop):
+        if not self._armed:
+            check_loop(loop)
+            self._armed = True
+            loop.call_soon(self._advance, loop)
+
+    def _advance(self, loop: asyncio.AbstractEventLoop):
+        """
+        runs once per iteration of the event loop while anything is waiting on the clock. it only moves the clock when
+        no other callback is ready, i.e. when a real event loop would block until the next timer
+        """
+        self._armed = False
+        if not self._patches:
+            return
+        while self._sleepers and self._sleepers[0][2].done():
+            heapq.heappop(self._sleepers)
+        timers = [timer.when() for timer in loop._scheduled if not timer.cancelled()]
+        if not self._sleepers and not timers:
+            return
+        if not loop._ready:
+            due = min([*timers, self._sleepers[0][0]] if self._sleepers else timers)
+            self.offset += max(due - self.monotonic(), 0)
+            now = self.monotonic()
+            while self._sleepers and self._sleepers[0][0] <= now:
+                _, _, future, result = heapq.heappop(self._sleepers)
+                _wake(future, result)
+        self._arm(loop)
@@ -0,0 +1,156 @@
+"""
+the state that is scoped to the test being run: which test and test directory are current, and the environment
+variables from config.ini. it is kept in contextvars, so that concurrent asyncio tasks (each of which copies the context
+it was created in) can each run under their own test without overlapping. threads do not inherit the context they are
+started from, e.g. those of a ThreadPoolExecutor or of loop.run_in_executor, so a context that has not set a value of
+its own falls back to the only one that is set, if there is exactly one
+
+the environment variables of config.ini are only an overlay per context if the factory_env_overlay ini option is set,
+see EnvOverlay; by default the Stocker writes them to the process environment, so that subprocesses inherit them
+"""
+import os
+from contextvars import ContextVar, Token
+from threading import Lock
+from types import MappingProxyType
+from typing import Any, Iterator, List, Mapping, MutableMapping, Optional
+
+from pytest_factory.logger import get_logger
+
+logger = get_logger(__name__)
+
+CURRENT_TEST: ContextVar[Optional[str]] = ContextVar('pytest_factory_current_test', default=None)
+CURRENT_TEST_DIR: ContextVar[Optional[str]] = ContextVar('pytest_factory_current_test_dir', default=None)
+
+_UNSET = object()
+
+ENV_OVERLAY: ContextVar[Optional[Mapping[str, Any]]] = ContextVar('pytest_factory_env_overlay', default=None)
+
+_EMPTY_OVERLAY: Mapping[str, Any] = MappingProxyType({})
+
+# the overlays that are set and not yet reset, for the contexts that have none of their own
+_active_overlays: List[Mapping[str, Any]] = []
+_active_overlays_lock = Lock()
+_warned_ambiguous = False
+
+
+def get_env_overlay() -> Mapping[str, Any]:
+    """
+    :return: the overlay of the current context or, if it has none, the only overlay that is set. if several are set,
+        e.g. by concurrent scoped tests, there is no telling which one a thread belongs to, so it reads the process
+        environment and a warning is logged
+    """
+    global _warned_ambiguous
+    overlay = ENV_OVERLAY.get()
+    if overlay is not None:
+        return overlay
+    overlays = _active_overlays
+    if len(overlays) == 1:
+        return overlays[0]
+    if overlays and not _warned_ambiguous:
+        _warned_ambiguous = True
+        logger.warning(msg=f'a thread that is not running in the context of a test read os.environ while '
+                           f'{len(overlays)} env_vars overlays are set; it reads the process environment instead. '
+                           f'start the thread with contextvars.copy_context().run or asyncio.to_thread')
+    return _EMPTY_OVERLAY
+
+
+def set_env_overlay(env_vars: Mapping[str, Any]) -> Token:
+    """
+    sets env_vars over the overlay of the current context, if any
+
+    :return: the token to pass to reset_env_overlay
+    """
+    overlay = MappingProxyType({**(ENV_OVERLAY.get() or {}), **env_vars})
+    with _active_overlays_lock:
+        _active_overlays.append(overlay)
+    return ENV_OVERLAY.set(overlay)
+
+
+def reset_env_overlay(token: Token):
+    global _warned_ambiguous
+    overlay = ENV_OVERLAY.get()
+    ENV_OVERLAY.reset(token)
+    with _active_overlays_lock:
+        _warned_ambiguous = False
+        for i in range(len(_active_overlays) - 1, -1, -1):
+            if _active_overlays[i] is overlay:
+                del _active_overlays[i]
+                break
+
+
+def _replace_env_overlay(overlay: Mapping[str, Any], new_overlay: Mapping[str, Any]):
+    with _active_overlays_lock:
+        for i, active in enumerate(_active_overlays):
+            if active is overlay:
+                _active_overlays[i] = new_overlay
+    if ENV_OVERLAY.get() is overlay:
+        ENV_OVERLAY.set(new_overlay)
+
+
+class EnvOverlay(MutableMapping):
+    """
+    replaces os.environ so that the environment variables of config.ini are an overlay in the current context (see
+    get_env_overlay) rather than changes to the environment of the whole process. os.getenv reads it too, but
+    os.environb and os.putenv do not. only installed if the factory_env_overlay ini option is set
+
+    writes and deletes go through to the process environment, and also to the overlay of the current context if it
+    has that variable, so that the system-under-test reads back what it wrote. subprocesses only inherit the process
+    environment, so pass env=dict(os.environ) to give them the overlay
+    """
+
+    def __init__(self, environ: MutableMapping[str, str]):
+        self.environ = environ
+
+    def __getitem__(self, key: str) -> str:
+        value = get_env_overlay().get(key, self.environ.get(key, _UNSET))
+        if value is _UNSET:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: str):
+        self.environ[key] = value
+        overlay = get_env_overlay()
+        if key in overlay:
+            _replace_env_overlay(overlay, MappingProxyType({**overlay, key: value}))
+
+    def __delitem__(self, key: str):
+        overlay = get_env_overlay()
+        if key not in overlay or overlay[key] is _UNSET:
+            del self.environ[key]
+        else:
+            self.environ.pop(key, None)
+            _replace_env_overlay(overlay, MappingProxyType({**overlay, key: _UNSET}))
+
+    def __iter__(self) -> Iterator[str]:
+        overlay = get_env_overlay()
+        for key in self.environ:
+            if key not in overlay:
+                yield key
+        for key, value in overlay.items():
+            if value is not _UNSET:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({dict(self)})'
+
+    def copy(self) -> dict:
+        return dict(self)
+
+
+def install_env_overlay():
+    """
+    replaces os.environ with an EnvOverlay, once per process
+    """
+    if not isinstance(os.environ, EnvOverlay):
+        os.environ = EnvOverlay(os.environ)
+
+
+def uninstall_env_overlay():
+    """
+    puts back the os.environ that install_env_overlay replaced
+    """
+    if isinstance(os.environ, EnvOverlay):
+        os.environ = os.environ.environ
@@ -6,3 +6,8 @@
 assert_no_missing_calls = True
 assert_no_extra_calls = True
 http_req_wildcard_fields = {"query"}
+recycle_sut = False
+retain_stores = False
+capture = 'full'
+capture_size = None
+virtual_time = False
@@ -1,29 +1,68 @@
-from typing import Any, Callable, Hashable
+from typing import Any, Callable, Collection, Hashable, Optional
 
 from pytest_factory.logger import get_logger
 
 logger = get_logger(__name__)
 
+# the longest that the description of a test double, factory or request may be in an exception message
+MAX_REPR_LENGTH = 2000
+
+
+def capped_repr(obj: Any, limit: int = MAX_REPR_LENGTH) -> str:
+    """
+    :return: str(obj), cut to limit characters so that a large factory or response list does not flood the log
+    """
+    text = str(obj)
+    if len(text) <= limit:
+        return text
+    return f'{text[:limit]}... ({len(text) - limit} more characters)'
+
 
 class PytestFactoryBaseException(Exception):
     """
     base exception for exceptions that occur within the framework. not to be used directly; inherit from this class instead
     NOTE __init__() will ALSO log out the exception description (i.e. self.log_msg) so you don't need to do it as a
     separate action!
+
+    the description is only formatted when it is read, e.g. when a handler emits the log record, since the exception
+    itself is the message that is logged
     """
 
-    def __init__(self, log_error: bool = True, *args, **kwargs):
+    def __init__(self, log_error: bool = True, *args, log: bool = True, **kwargs):
         """
         :param log_msg: str message to send to logger;
         :param log_error: bool, if True (default) sends log_msg to logger.error, else logger.warning;
         note this does NOT determine if exception is raised or not! that must be decided by the user
+        :param log: if False, the exception is not logged until emit is called, e.g. by a Store that logs a warning
+            once for many occurrences
+        """
+        self.log_error = log_error
+        self._msg_args = args
+        self._msg_kwargs = kwargs
+        self._log_msg: Optional[str] = None
+        if log:
+            self.emit()
+
+    @property
+    def log_msg(self) -> str:
+        if self._log_msg is None:
+            if self.log_error:
+                self._log_msg = self.get_error_msg(*self._msg_args, **self._msg_kwargs)
+            else:
+                self._log_msg = self.get_warning_msg(*self._msg_args, **self._msg_kwargs)
+        return self._log_msg
+
+    def emit(self, suffix: str = ''):
+        """
+        logs this exception to logger.error, or logger.warning if not log_error
+
+        :param suffix: appended to the description in the log record only
         """
-        if log_error:
-            self.log_msg = self.get_error_msg(*args, **kwargs)
-            logger.error(msg=self.log_msg)
+        msg = f'{self}{suffix}' if suffix else self
+        if self.log_error:
+            logger.error(msg=msg)
         else:
-            self.log_msg = self.get_warning_msg(*args, **kwargs)
-            logger.warning(msg=self.log_msg)
+            logger.warning(msg=msg)
 
     def get_warning_msg(self, *args, **kwargs) -> str:
         return self.get_error_msg()
@@ -54,7 +93,7 @@ class MissingHandlerException(PytestFactoryBaseException):
 
 class TypeTestDoubleException(PytestFactoryBaseException):
     def get_error_msg(self, response: Any, request_module_name: str) -> str:
-        log_msg = f'TypeTestDoubleException: cannot convert test double {str(response)}' \
+        log_msg = f'TypeTestDoubleException: cannot convert test double {capped_repr(response)}' \
                   f' of type {type(response)} into type expected by module {request_module_name}'
         return log_msg
 
@@ -72,6 +111,31 @@ class RequestNormalizationException(PytestFactoryBaseException):
         return log_msg
 
 
+class LazyResponseException(PytestFactoryBaseException):
+    def get_error_msg(self, source: Any, *_, **__) -> str:
+        log_msg = f'LazyResponseException: async response source {source} suspended while a synchronous adapter ' \
+                  f'pulled its next response! only asynchronous adapters, e.g. aiohttp, can await a source that ' \
+                  f'suspends'
+        return log_msg
+
+
+class AmbiguousTestException(PytestFactoryBaseException):
+    def get_error_msg(self, tests: Collection[str], *_, **__) -> str:
+        log_msg = f'AmbiguousTestException: this thread is not running in the context of a test, and there are ' \
+                  f'{len(tests)} scoped tests running concurrently: {capped_repr(sorted(tests))}! start the thread ' \
+                  f'with contextvars.copy_context().run or asyncio.to_thread, so that it runs in the context of its ' \
+                  f'test'
+        return log_msg
+
+
+class VirtualClockException(PytestFactoryBaseException):
+    def get_error_msg(self, loop: Any, *_, **__) -> str:
+        log_msg = f'VirtualClockException: virtual time requires an asyncio event loop, not ' \
+                  f'{type(loop).__qualname__}! the clock reads the internals of asyncio.BaseEventLoop to tell when ' \
+                  f'the loop is idle'
+        return log_msg
+
+
 class MissingFactoryException(PytestFactoryBaseException):
     def get_error_msg(self, factory_name: str, *_, **__) -> str:
         log_msg = f'MissingFactoryException: this test case is missing the requested factory: {factory_name}! '
@@ -101,7 +165,7 @@ class MissingTestDoubleException(PytestFactoryBaseException):
 class UnCalledTestDoubleException(PytestFactoryBaseException):
     def get_error_msg(self, uncalled_test_doubles: dict) -> str:
         return f"UnCalledTestDoubleException: the following test doubles were NOT used in " \
-               f"this test: {uncalled_test_doubles}"
+               f"this test: {capped_repr(uncalled_test_doubles)}"
 
     def get_warning_msg(self, uncalled_test_doubles: dict):
         warning_msg = " if this is not expected, set assert_no_missing_calls to True"
@@ -111,8 +175,8 @@ class UnCalledTestDoubleException(PytestFactoryBaseException):
 class OverCalledTestDoubleException(PytestFactoryBaseException):
     def get_error_msg(self, mock_responses: list, req_obj: Any) -> str:
         return f'OverCalledTestDoubleException: expected only {len(mock_responses)} ' \
-               f'calls to {req_obj}! got {mock_responses.count}!'
+               f'calls to {capped_repr(req_obj)}! got {mock_responses.count}!'
 
     def get_warning_msg(self, mock_responses: list, req_obj: Any) -> str:
-        warning_msg = f" will repeat last response: \"{mock_responses[-1][1]}\""
+        warning_msg = f" will repeat last response: \"{capped_repr(mock_responses.response(-1))}\""
         return self.get_error_msg(mock_responses=mock_responses, req_obj=req_obj) + warning_msg
@@ -2,12 +2,13 @@ import functools
 import inspect
 import sys
 from asyncio import iscoroutine, iscoroutinefunction
-from typing import Callable, Optional, Union
+from typing import Callable, Optional, Union, Iterable, Tuple
 
-from pytest_factory.framework.base_types import BaseMockRequest, BASE_RESPONSE_TYPE
+from pytest_factory.framework.base_types import BaseMockRequest, BASE_RESPONSE_TYPE, SutBuilder
 from pytest_factory.framework.parse_configs import DEFAULT_FOLDER_NAME
 from pytest_factory.framework.exceptions import MissingHandlerException
 from pytest_factory.framework.mall import MALL
+from pytest_factory.framework.store import Store
 
 
 def make_factory(req_obj: Union[BaseMockRequest, str],
@@ -25,7 +26,8 @@ def make_factory(req_obj: Union[BaseMockRequest, str],
     :param req_obj: used as key to map to mock responses; either a BaseMockRequest type object or a string
     :param response: test double or list of test doubles - generally a string or Message;
         should be None if the test double is the request;
-        if a list of responses, this factory will return each response in order
+        if a list of responses, this factory will return each response in order;
+        if a generator, iterator or async iterator, the responses are pulled from it on demand
     :param factory_name: name of the factory that create test doubles for the
         returned Callable (TestClass or test_method_or_function; defaults to name of function that called this
         function
@@ -41,58 +43,30 @@ def make_factory(req_obj: Union[BaseMockRequest, str],
     def register_test_func(pytest_func: Callable) -> Callable:
         """
         is executed during pytest collection; the store is bound to the test case at this time
-        if response is not None, and store.sut is not yet assigned, this factory will create the
-        system-under-test (SUT).
+        if response is None, this factory registers a SutBuilder that will create the system-under-test (SUT) when
+        the test first reads store.sut
         """
-
-        if iscoroutine(pytest_func) or iscoroutinefunction(pytest_func):
-            @functools.wraps(pytest_func)
-            async def pytest_func_wrapper(*args, **kwargs):
-                """
-                is executed during pytest run; executes setup, then the test function, finally teardown
-                """
-                resp = setup() if setup else None
-                await pytest_func(*args, **kwargs)
-                if teardown:
-                    teardown(resp=resp)
-        else:
-            @functools.wraps(pytest_func)
-            def pytest_func_wrapper(*args, **kwargs):
-                """
-                is executed during pytest run; executes setup, then the test function, finally teardown
-                """
-                resp = setup() if setup else None
-                pytest_func(*args, **kwargs)
-                if teardown:
-                    teardown(resp=resp)
-
-        test_name = pytest_func.__name__
-        module_parts = pytest_func.__module__.split('.')
-        if len(module_parts) > 1:
-            test_dir = module_parts[-2]
-        elif len(module_parts) == 1:
-            p = MALL.get_full_path()
-            p_list = list(p.rglob(module_parts[0]+'.py'))
-            test_dir = p_list[0].parent.name
-        else:
-            test_dir = DEFAULT_FOLDER_NAME
-        store = MALL.get_store(test_name=test_name, test_dir=test_dir)
+        pytest_func_wrapper = wrap_test_func(pytest_func=pytest_func, setup=setup, teardown=teardown)
+        store = get_test_func_store(pytest_func=pytest_func)
         response_is_sut = False
         if response is None:
             response_is_sut = True
             if hasattr(req_obj, 'sut_callable') and req_obj.sut_callable:
                 sut_callable = req_obj.sut_callable
             else:
-                sut_callable = MALL.sut_callable
+                sut_callable = MALL.config.sut_callable
             if not sut_callable:
                 raise MissingHandlerException
             if hasattr(req_obj, 'HANDLER_NAME'):
                 key = req_obj.HANDLER_NAME
                 constructor = MALL.get_constructor(handler_type=key)
-                sut = constructor(sut_callable=sut_callable, req_obj=req_obj)
+                recycler = MALL.get_recycler(handler_type=key) if MALL.config.recycle_sut else None
+                build = functools.partial(constructor, sut_callable=sut_callable, req_obj=req_obj)
+                release = functools.partial(recycler, sut_callable=sut_callable) if recycler else None
             else:
-                sut = sut_callable(req_obj)
-            final_response = sut
+                build = functools.partial(sut_callable, req_obj)
+                release = None
+            final_response = SutBuilder(build=build, release=release)
         else:
             final_response = response
         store.update(factory_name=factory_name,
@@ -107,6 +81,91 @@ def make_factory(req_obj: Union[BaseMockRequest, str],
     return callable_wrapper
 
 
+def make_bulk_factory(exchanges: Iterable[Tuple[Union[BaseMockRequest, str], BASE_RESPONSE_TYPE]],
+                      setup: Optional[Callable] = None,
+                      teardown: Optional[Callable] = None,
+                      factory_name: Optional[str] = None) -> Callable:
+    """
+    Creates a factory that adds many test doubles to the store in one pass, e.g. from a table of recorded or generated
+    exchanges. Unlike make_factory, every exchange must have a response, so a bulk factory cannot create the
+    system-under-test.
+
+    See http.py mock_http_server_table for an example of usage.
+
+    :param exchanges: pairs of req_obj and response, see make_factory; if two req_obj match, the first one wins
+    :param factory_name: see make_factory
+    :param setup: see make_factory
+    :param teardown: see make_factory
+    :return: the test class or test function that is being decorated
+    """
+    factory_name = factory_name if factory_name else sys._getframe(1).f_code.co_name
+    if factory_name == '<module>':
+        factory_name = 'make_bulk_factory'
+    exchanges = list(exchanges)
+
+    def register_test_func(pytest_func: Callable) -> Callable:
+        """
+        is executed during pytest collection; adds every exchange to the store bound to the test case
+        """
+        pytest_func_wrapper = wrap_test_func(pytest_func=pytest_func, setup=setup, teardown=teardown)
+        store = get_test_func_store(pytest_func=pytest_func)
+        for req_obj, response in exchanges:
+            store.update(factory_name=factory_name, req_obj=req_obj, response=response)
+
+        return pytest_func_wrapper
+
+    def callable_wrapper(callable_obj: Callable) -> Callable:
+        return apply_func_recursive(target=callable_obj,
+                                    test_func_wrapper=register_test_func)
+
+    return callable_wrapper
+
+
+def wrap_test_func(pytest_func: Callable, setup: Optional[Callable] = None,
+                   teardown: Optional[Callable] = None) -> Callable:
+    """
+    :return: the test function wrapped so that setup is executed before it and teardown after it
+    """
+    if iscoroutine(pytest_func) or iscoroutinefunction(pytest_func):
+        @functools.wraps(pytest_func)
+        async def pytest_func_wrapper(*args, **kwargs):
+            """
+            is executed during pytest run; executes setup, then the test function, finally teardown
+            """
+            resp = setup() if setup else None
+            await pytest_func(*args, **kwargs)
+            if teardown:
+                teardown(resp=resp)
+    else:
+        @functools.wraps(pytest_func)
+        def pytest_func_wrapper(*args, **kwargs):
+            """
+            is executed during pytest run; executes setup, then the test function, finally teardown
+            """
+            resp = setup() if setup else None
+            pytest_func(*args, **kwargs)
+            if teardown:
+                teardown(resp=resp)
+    return pytest_func_wrapper
+
+
+def get_test_func_store(pytest_func: Callable) -> Store:
+    """
+    :return: the Store of the test function being collected
+    """
+    test_name = pytest_func.__name__
+    module_parts = pytest_func.__module__.split('.')
+    if len(module_parts) > 1:
+        test_dir = module_parts[-2]
+    elif len(module_parts) == 1:
+        p = MALL.get_full_path()
+        p_list = list(p.rglob(module_parts[0]+'.py'))
+        test_dir = p_list[0].parent.name
+    else:
+        test_dir = DEFAULT_FOLDER_NAME
+    return MALL.get_store(test_name=test_name, test_dir=test_dir)
+
+
 def apply_func_recursive(test_func_wrapper: Callable, target: Callable) -> Callable:
     """
     if target is a class, this method will iterate and invoke func on
@@ -1,17 +1,23 @@
 from __future__ import annotations
 from enum import Enum
-from typing import Optional, Dict
+from functools import lru_cache
+from typing import Optional, Dict, Tuple, NamedTuple, Union, FrozenSet, Iterable, Any
 from urllib.parse import urlparse, parse_qs
 
 from pytest_factory.framework.base_types import BaseMockRequest, BaseMockResponse
+from pytest_factory.framework.routing import WILDCARD
 from pytest_factory.framework.mall import MALL
-from pytest_factory.framework.default_configs import http_req_wildcard_fields as default_http_req_wildcard_fields
+from pytest_factory.framework.parse_configs import ConfigSnapshot
 
 
 class MockHttpResponse(BaseMockResponse):
+    delay: Optional[float] = None
+    timeout_after: Optional[float] = None
+
     def __init__(self, body: Optional[bytes] = None, status: Optional[int] = None,
                  headers: Optional[Dict[str, str]] = None, exchange_id: Optional[str] = None,
-                 timestamp: Optional[str] = None):
+                 timestamp: Optional[str] = None, delay: Optional[float] = None,
+                 timeout_after: Optional[float] = None):
         """
         :param body: body in bytes
         :param status: HTTP status code
@@ -19,11 +25,21 @@ class MockHttpResponse(BaseMockResponse):
         :param exchange_id: the exchange_id of the MockHttpRequest corresponding to this object
         :param timestamp: if provided, when the HTTP response that this object represents was received,
             otherwise defaults to datetime.utcnow()
+        :param delay: seconds that the adapter waits before returning this response, i.e. the latency of the
+            depended-on-component. if the request was made with a shorter timeout, the adapter raises the timeout
+            error of its package after that timeout instead
+        :param timeout_after: if provided, the depended-on-component never answers, and the adapter raises the timeout
+            error of its package after this many seconds, or after the timeout of the request if that is shorter
         """
-        self.kwargs = {k: v for k, v in locals().items() if k != 'self'}
+        self.kwargs = {k: v for k, v in locals().items()
+                       if k != 'self' and (k not in {'delay', 'timeout_after'} or v is not None)}
         self.body = body or b''
         self.status = status or 200
         self.headers = headers or {}
+        if delay is not None:
+            self.delay = delay
+        if timeout_after is not None:
+            self.timeout_after = timeout_after
         super().__init__(exchange_id=exchange_id, timestamp=timestamp)
 
 
@@ -38,6 +54,46 @@ class HTTP_METHODS(Enum):
     OPTIONS = 'options'
 
 
+URL_CACHE_SIZE = 1024
+
+QUERY_TYPE = Union[str, FrozenSet[Tuple[str, Tuple[str, ...]]]]
+
+
+class HttpSignature(NamedTuple):
+    """
+    the normalized parts of an HTTP request that MockHttpRequest.compare checks
+    """
+    method: str
+    scheme: str
+    netloc: str
+    params: str
+    fragment: str
+    query: QUERY_TYPE
+    path: Tuple[str, ...]
+
+
+URL_FIELDS = ('scheme', 'netloc', 'params', 'fragment', 'query')
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def parse_url(url: str) -> Tuple[str, str, str, str, QUERY_TYPE, Tuple[str, ...]]:
+    """
+    parses url into the parts named by URL_FIELDS followed by the path segments; cached because the system-under-test
+    usually calls the same urls many times
+    """
+    url_parts = urlparse(url)
+    if url_parts.query == WILDCARD:
+        query = WILDCARD
+    else:
+        query = frozenset((k, tuple(v)) for k, v in parse_qs(url_parts.query).items())
+    return (url_parts.scheme, url_parts.netloc, url_parts.params, url_parts.fragment, query,
+            tuple(url_parts.path.split('/')))
+
+
+def _is_wildcard_match(field: str, this_val: Any, that_val: Any, wildcard_fields: Iterable[str]) -> bool:
+    return this_val == WILDCARD or that_val == WILDCARD or field in wildcard_fields and (not this_val or not that_val)
+
+
 class MockHttpRequest(BaseMockRequest):
     """
     HTTP request class representing simulated and actual inbound and outbound requests.
@@ -69,35 +125,54 @@ class MockHttpRequest(BaseMockRequest):
         self.body = body
         self.headers = headers or {}
 
-    @staticmethod
-    def _urlparse_to_dict(uri: str) -> dict:
-        url_parts = urlparse(uri)
-        url_component_dict = {key: getattr(url_parts, key) for key in ("scheme", "netloc", "params", "fragment")}
-        url_component_dict["query"] = url_parts.query if url_parts.query == "*" else parse_qs(url_parts.query)
-        for index, path_part in enumerate(url_parts.path.split('/')):
-            url_component_dict[f"path_{index}"] = path_part
-        return url_component_dict
+    @property
+    def signature(self) -> HttpSignature:
+        """
+        computed from method and url the first time it is needed, after which it is reused for every comparison
+        """
+        signature = getattr(self, '_signature', None)
+        if signature is None:
+            signature = HttpSignature(self.method, *parse_url(self.url))
+            self._signature = signature
+        return signature
 
-    def compare(self, other: MockHttpRequest) -> bool:
+    def get_route(self) -> Tuple[str, ...]:
+        signature = self.signature
+        return (signature.method, signature.scheme, signature.netloc, signature.params, signature.fragment,
+                signature.query, *signature.path)
+
+    def get_compare_kwargs(self, config: Optional[ConfigSnapshot] = None) -> Dict[str, Any]:
+        config = config or MALL.config
+        return {'wildcard_fields': config.http_req_wildcard_fields}
+
+    def compare(self, other: MockHttpRequest, wildcard_fields: Optional[Iterable[str]] = None) -> bool:
         """
         compares this HTTP request to another
+
+        :param other: the actual request, or a url that this request's url must contain
+        :param wildcard_fields: the url fields that match anything when empty on either side; if None, reads the
+            http_req_wildcard_fields configuration
         """
         if isinstance(other, str):
             substr_index = self.url.find(other)
             return substr_index > -1
 
-        if self.method != other.method:
+        this, that = self.signature, other.signature
+        if this.method != that.method:
             return False
 
-        this_dict = self._urlparse_to_dict(self.url)
-        that_dict = self._urlparse_to_dict(other.url)
+        if wildcard_fields is None:
+            wildcard_fields = self.get_compare_kwargs()['wildcard_fields']
+
+        for index, field in enumerate(URL_FIELDS, start=1):
+            this_val, that_val = this[index], that[index]
+            if this_val != that_val and not _is_wildcard_match(field, this_val, that_val, wildcard_fields):
+                return False
 
-        for key, this_val in this_dict.items():
-            wildcard_fields = MALL.http_req_wildcard_fields or default_http_req_wildcard_fields
-            if this_val == "*" or that_dict[key] == "*" or key in wildcard_fields \
-                    and (not this_val or not that_dict[key]):
-                continue
-            elif this_val != that_dict[key]:
+        that_path = that.path
+        for index, this_val in enumerate(this.path):
+            that_val = that_path[index] if index < len(that_path) else None
+            if this_val != that_val and not _is_wildcard_match(f"path_{index}", this_val, that_val, wildcard_fields):
                 return False
 
         return True
@@ -1,20 +1,33 @@
 import os
+from contextlib import contextmanager
+from functools import lru_cache
+from threading import Lock
 from pytest import Item
 from pathlib import Path
-from typing import Dict, Any, Optional, Callable, Iterable, Union, List
+from typing import Dict, Any, Optional, Callable, Iterable, Union, List, Set, Mapping, Tuple, Iterator
 from importlib import import_module
 
-from pytest_factory.framework.store import Store, is_plugin
+from pytest_factory.framework.context import (CURRENT_TEST, CURRENT_TEST_DIR, install_env_overlay, reset_env_overlay,
+                                              set_env_overlay)
+from pytest_factory.framework.store import Store, StoreSummary, is_plugin
+from pytest_factory.framework.routing import PluginRouter
 from pytest_factory import logger
-from pytest_factory.framework.exceptions import ConfigException
-from pytest_factory.framework.parse_configs import prep_stores_update_local, DEFAULT_FOLDER_NAME
-from pytest_factory.framework.default_configs import (assert_no_missing_calls as default_assert_no_missing_calls,
-                                                      assert_no_extra_calls as default_assert_no_extra_calls)
+from pytest_factory.framework.exceptions import AmbiguousTestException, ConfigException
+from pytest_factory.framework.parse_configs import prep_stores_update_local, prep_all_sections, resolve_config, \
+    ConfigSnapshot, DEFAULT_FOLDER_NAME
 
 logger = logger.get_logger(__name__)
 
+# the number of tests with uncalled test doubles listed in the terminal summary
+REPORT_TESTS = 10
 
+
+@lru_cache(maxsize=None)
 def import_from_str_path(path: str) -> Callable:
+    """
+    :param path: the import path of a module, or of a member of a module
+    :return: the module or member; resolved once per path for the session
+    """
     path_parts = path.split('.')
     import_path = '.'.join(path_parts[:-1])
     import_callable = path_parts[-1]
@@ -34,10 +47,19 @@ class Mall:
 
     def __init__(self):
         self._by_test: Dict[str, Store] = {}
+        self._items_by_test: Dict[str, int] = {}
+        self.summaries: Dict[str, StoreSummary] = {}
+        self._failed_tests: Set[str] = set()
         self._by_dir: Dict[str, Dict] = {}
-        self._backup_env_vars: Dict[str, str] = {}
-        self._current_test: Optional[str] = None
-        self._current_test_dir: Optional[str] = None
+        self._configs: Dict[Optional[str], ConfigSnapshot] = {}
+        self._plugin_routers: Dict[Optional[str], PluginRouter] = {}
+        self._all_sections: Optional[Dict[str, Dict[str, Any]]] = None
+        self.defer_stocking: bool = False
+        self.env_overlay: bool = False
+        self._lock = Lock()
+        self._last_test: Optional[str] = None
+        self._last_test_dir: Optional[str] = None
+        self._scoped_tests: List[Tuple[str, Optional[str]]] = []
         self._monkey_patch_configs: Dict[str, Dict[str, Union[Callable, Dict[str, Callable]]]] = {}
         self.memory = []
 
@@ -45,35 +67,218 @@ class Mall:
         if name not in vars(self).keys():
             return self._get_prop(name)
 
+    @property
+    def _current_test(self) -> Optional[str]:
+        """
+        the name of the test whose Store get_store() returns, in the current context. a context that has not set one,
+        e.g. a thread of a thread pool, gets the test of the only scoped context, or the test that was set last if
+        there is none. if several scoped contexts are active, it raises AmbiguousTestException
+        """
+        return CURRENT_TEST.get() or self._fallback_test()[0]
+
+    @_current_test.setter
+    def _current_test(self, test_name: Optional[str]):
+        CURRENT_TEST.set(test_name)
+        self._last_test = test_name
+
+    @property
+    def _current_test_dir(self) -> Optional[str]:
+        """
+        the directory of the current test, which selects its configuration; see _current_test
+        """
+        return CURRENT_TEST_DIR.get() or self._fallback_test()[1]
+
+    @_current_test_dir.setter
+    def _current_test_dir(self, test_dir: Optional[str]):
+        CURRENT_TEST_DIR.set(test_dir)
+        self._last_test_dir = test_dir
+
+    def _fallback_test(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        :return: the test and test directory of a context that has set neither, see _current_test
+        """
+        scoped_tests = self._scoped_tests
+        if not scoped_tests:
+            return self._last_test, self._last_test_dir
+        if len(scoped_tests) == 1:
+            return scoped_tests[0]
+        raise AmbiguousTestException(tests=[test_name for test_name, _ in scoped_tests])
+
+    @contextmanager
+    def scoped(self, test_name: str, test_dir: Optional[str] = None) -> Iterator[Store]:
+        """
+        makes test_name the current test in this context until exit, e.g. in each of several asyncio tasks that run
+        the systems-under-test of different tests concurrently in one event loop; the test that was current before is
+        current again afterwards. a thread that does not inherit the context, e.g. one of loop.run_in_executor, only
+        gets this test while no other scoped context is active; start it with contextvars.copy_context().run or
+        asyncio.to_thread instead
+
+        :param test_name: the name of the test
+        :param test_dir: the directory of the test; defaults to the current one
+        :return: the Store of the test
+        """
+        test_dir = test_dir or self._current_test_dir
+        test_token = CURRENT_TEST.set(test_name)
+        dir_token = CURRENT_TEST_DIR.set(test_dir)
+        scoped_test = (test_name, test_dir)
+        with self._lock:
+            self._scoped_tests.append(scoped_test)
+        try:
+            yield self.get_store()
+        finally:
+            with self._lock:
+                self._scoped_tests.remove(scoped_test)
+            CURRENT_TEST_DIR.reset(dir_token)
+            CURRENT_TEST.reset(test_token)
+
     def get_constructor(self, handler_type: str) -> Callable:
         return self._monkey_patch_configs.get(handler_type, {}).get('constructor')
 
+    def get_recycler(self, handler_type: str) -> Optional[Callable]:
+        return self._monkey_patch_configs.get(handler_type, {}).get('recycler')
+
     def load_monkeypatch_configs(self, callable_obj: Any,
                                  patch_members: Dict[str, Any],
-                                 constructor: Optional[Callable] = None):
+                                 constructor: Optional[Callable] = None,
+                                 recycler: Optional[Callable] = None,
+                                 clear: Optional[Callable] = None):
         key = callable_obj.__name__
         patch_configs = self._monkey_patch_configs.get(key)
         if patch_configs:
             self._monkey_patch_configs[key].get('patch_methods').update(patch_members)
             if constructor:
                 self._monkey_patch_configs[key]['constructor'] = constructor
+            if recycler:
+                self._monkey_patch_configs[key]['recycler'] = recycler
+            if clear:
+                self._monkey_patch_configs[key]['clear'] = clear
         else:
             self._monkey_patch_configs[callable_obj.__name__] = {
                 'callable': callable_obj,
                 'patch_methods': patch_members,
-                'constructor': constructor
+                'constructor': constructor,
+                'recycler': recycler,
+                'clear': clear
             }
 
     def get_monkeypatch_configs(self) -> Iterable:
         return self._monkey_patch_configs.values()
 
+    def clear_monkeypatch_caches(self):
+        """
+        drops whatever the constructors and recyclers of the monkeypatches kept between tests, e.g. at the end of the
+        session
+        """
+        for configs in self._monkey_patch_configs.values():
+            if configs.get('clear'):
+                configs['clear']()
+
     def _get_prop(self, key: str) -> Any:
-        prop = self._by_dir.get(self._current_test_dir, {}).get(key)
-        if self._current_test_dir == 'tests':
-            return prop
-        elif prop is None:
-            prop = self._by_dir.get('tests', {}).get(key)
-        return prop
+        return self.config.values.get(key)
+
+    @property
+    def config(self) -> ConfigSnapshot:
+        """
+        the effective configuration of the current test directory; it is resolved the first time it is read after
+        the configuration of any directory changes
+        """
+        config = self._configs.get(self._current_test_dir)
+        if config is None:
+            config = resolve_config(by_dir=self._by_dir, test_dir=self._current_test_dir)
+            self._configs[self._current_test_dir] = config
+        return config
+
+    def update_configs(self, conf: Dict[str, Dict[str, Any]]):
+        """
+        :param conf: parsed sections of config.ini by directory name, to add to or replace those of this Mall
+        """
+        self._by_dir.update(conf)
+        self._clear_configs()
+
+    def set_config(self, key: str, value: Any):
+        """
+        sets a configuration of the current test directory, or of the "tests" section if the directory has none
+        """
+        self.set_configs({key: value})
+
+    def set_configs(self, values: Mapping[str, Any]):
+        """
+        sets several configurations as set_config does; the effective configuration is only resolved again if any of
+        them changed
+        """
+        dir_conf = self._by_dir.get(self._current_test_dir) or self._by_dir.get(DEFAULT_FOLDER_NAME)
+        changed = {key: value for key, value in values.items() if dir_conf.get(key) is not value}
+        if changed:
+            dir_conf.update(changed)
+            self._clear_configs()
+
+    def read_configs(self, test_dir: str) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: the "tests" section of config.ini and the section of test_dir, if any; from the sections that were
+            handed to this Mall (see set_all_sections) if there are any, rather than parsing config.ini again
+        """
+        if self._all_sections is None:
+            return prep_stores_update_local(dir_name=test_dir)
+        return {section: dict(self._all_sections[section]) for section in {DEFAULT_FOLDER_NAME, test_dir}
+                if section in self._all_sections}
+
+    def get_all_sections(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: every section of config.ini, parsed once, e.g. on the pytest-xdist controller to hand to its workers
+        """
+        if self._all_sections is None:
+            self._all_sections = prep_all_sections()
+        return self._all_sections
+
+    def set_all_sections(self, sections: Dict[str, Dict[str, Any]]):
+        """
+        :param sections: every section of config.ini, already parsed, e.g. by the pytest-xdist controller
+        """
+        self._all_sections = sections
+
+    def merge_summaries(self, summaries: Iterable[Mapping[str, Any]]):
+        """
+        adds the StoreSummary of each test that ran elsewhere, e.g. on a pytest-xdist worker, to summaries
+        """
+        for summary in summaries:
+            summary = StoreSummary(**summary)
+            self.summaries[summary.test_path] = summary
+
+    def summary_lines(self, n_tests: int = REPORT_TESTS) -> List[str]:
+        """
+        :param n_tests: the number of tests with uncalled test doubles that are listed, most uncalled first
+        :return: the lines of the terminal summary of summaries, i.e. of every test that is done, including those that
+            ran on pytest-xdist workers: the calls to the test doubles of each factory, and the tests that left test
+            doubles uncalled
+        """
+        if not self.summaries:
+            return []
+        calls: Dict[str, int] = {}
+        messages = 0
+        uncalled_tests = []
+        for summary in self.summaries.values():
+            for factory_name, count in summary.calls.items():
+                calls[factory_name] = calls.get(factory_name, 0) + count
+            messages += summary.messages
+            if summary.uncalled:
+                uncalled_tests.append(summary)
+        by_factory = ', '.join(f'{factory_name} {count}' for factory_name, count in sorted(calls.items()))
+        lines = [f'{len(self.summaries)} tests, {sum(calls.values())} calls to test doubles'
+                 f'{f" ({by_factory})" if by_factory else ""}, {messages} messages']
+        if uncalled_tests:
+            uncalled_tests.sort(key=lambda summary: (-sum(summary.uncalled.values()), summary.test_path))
+            lines.append(f'{len(uncalled_tests)} tests left test doubles uncalled:')
+            for summary in uncalled_tests[:n_tests]:
+                uncalled = ', '.join(f'{factory_name} {count}'
+                                     for factory_name, count in sorted(summary.uncalled.items()))
+                lines.append(f'{summary.test_path}: {uncalled}{" (failed)" if summary.failed else ""}')
+            if len(uncalled_tests) > n_tests:
+                lines.append(f'... and {len(uncalled_tests) - n_tests} more')
+        return lines
+
+    def _clear_configs(self):
+        self._configs.clear()
+        self._plugin_routers.clear()
 
     def get_full_path(self, new_file_name: Optional[str] = None):
         if self._config_path:
@@ -86,24 +291,24 @@ class Mall:
         return p
 
     @property
-    def env_vars(self) -> Dict[str, Any]:
-        return self._get_prop('env_vars') or {}
+    def env_vars(self) -> Mapping[str, Any]:
+        return self.config.env_vars
 
     @property
-    def imports(self):
-        return [x.replace(' ', '') for x in self._get_prop('imports').split(',')]
+    def imports(self) -> Tuple[str, ...]:
+        return self.config.imports
 
     @property
     def sut_callable(self) -> Callable:
-        return self._get_prop('sut_callable')
+        return self.config.sut_callable
 
     @property
     def assert_no_missing_calls(self) -> bool:
-        return self._get_prop('assert_no_missing_calls') or default_assert_no_missing_calls
+        return self.config.assert_no_missing_calls
 
     @property
     def assert_no_extra_calls(self) -> bool:
-        return self._get_prop('assert_no_extra_calls') or default_assert_no_extra_calls
+        return self.config.assert_no_extra_calls
 
     def stock(self, test_dir: Optional[str] = None):
         """
@@ -117,49 +322,124 @@ class Mall:
     @property
     def plugins(self) -> Dict[str, Callable]:
         return_dict = {}
-        sub_dict = self._by_dir.get(self._current_test_dir) or {}
-        search_dict = {**self._by_dir.get(DEFAULT_FOLDER_NAME), **sub_dict}
-        for _, v in search_dict.items():
+        for v in self.config.values.values():
             if is_plugin(v):
                 plugin_urls: List[str] = v.PLUGIN_URL if isinstance(v.PLUGIN_URL, list) else [v.PLUGIN_URL]
-                for url in plugin_urls:  # TODO this may not be the cleanest solution if there are alot of these - will clutter mock_http_server
+                for url in plugin_urls:
                     return_dict[url] = v
         return return_dict
 
+    @property
+    def plugin_router(self) -> PluginRouter:
+        """
+        the plugins of the current test directory compiled into a PluginRouter; it is built once per directory, until
+        the configuration changes
+        """
+        router = self._plugin_routers.get(self._current_test_dir)
+        if router is None:
+            router = self._plugin_routers[self._current_test_dir] = PluginRouter(self.plugins)
+        return router
+
     def get_store(self, item: Optional[Item] = None, test_name: Optional[str] = None,
                   test_dir: Optional[str] = None) -> Store:
         """
         :param item: pytest.Item
         :return: the Store associated with the given Item; a new Store if
             a Store has not already been created for this test
+
+        without arguments, this resolves the Store of the current test of this context (see _current_test and
+        scoped), from any task or thread; e.g. a system-under-test that calls its depended-on-components from a
+        thread pool. the current test is set and read, and its Store created, under a lock, so that threads never see
+        half of a test switch or make two Stores
         """
-        self._current_test = item.name if item else test_name or self._current_test
-        self._current_test_dir = item.path.parent.name if item else test_dir or self._current_test_dir
-        key = '.'.join([self._current_test_dir, self._current_test])
-        store = self._by_test.get(key)
-        if not store:
-            store = Store(test_path=key)
-            self._by_test[key] = store
+        with self._lock:
+            if item or test_name:
+                self._current_test = item.name if item else test_name
+            if item or test_dir:
+                self._current_test_dir = item.path.parent.name if item else test_dir
+            key = '.'.join([self._current_test_dir, self._current_test])
+            store = self._by_test.get(key)
+            if not store:
+                config = self.config
+                store = Store(test_path=key, capture=config.capture, capture_size=config.capture_size,
+                              defer=self.defer_stocking)
+                self._by_test[key] = store
+            if item or test_name:
+                store.config = self.config
+        if item:
+            store.stock()
         return store
 
+    @staticmethod
+    def get_store_key(item: Item) -> str:
+        return '.'.join([item.path.parent.name, item.name])
+
+    def expect_items(self, items: Iterable[Item]):
+        """
+        counts the collected items that will use each Store, since items with the same name in the same directory
+        share one
+        """
+        for item in items:
+            key = self.get_store_key(item)
+            self._items_by_test[key] = self._items_by_test.get(key, 0) + 1
+
+    def check_out(self, item: Item, failed: bool = False):
+        """
+        invoked after the teardown of each test: once every item that uses its Store is done, the Store is replaced
+        with a StoreSummary so that its test doubles, system-under-test and messages can be garbage collected, and the
+        file its messages were spilled to, if any, is deleted. set retain_stores to true in config.ini to keep every
+        Store, and its spill file, for debugging
+
+        :param item: the pytest.Item that is done
+        :param failed: if True, the test failed
+        """
+        key = self.get_store_key(item)
+        if key in self._by_test:
+            self._by_test[key].flush_warnings()
+        if failed:
+            self._failed_tests.add(key)
+        remaining = self._items_by_test.get(key, 1) - 1
+        if remaining > 0:
+            self._items_by_test[key] = remaining
+            return
+        self._items_by_test.pop(key, None)
+        if self.config.retain_stores:
+            return
+        store = self._by_test.pop(key, None)
+        if store is not None:
+            store.messages.close(delete=True)
+            self.summaries[key] = store.summarize(failed=key in self._failed_tests)
+
 
 MALL = Mall()
 
 
 class Stocker:
+    """
+    while entered, the environment variables of config.ini are set in the process environment, and the imports of
+    config.ini are resolved. with the factory_env_overlay ini option (MALL.env_overlay), the environment variables are
+    an overlay on os.environ in the current context instead (see EnvOverlay), so that concurrent scoped tests can
+    each have their own
+    """
     def __init__(self, test_dir: str):
         conf = None
         if MALL._current_test_dir != test_dir:
             MALL._current_test_dir = test_dir
-            conf = prep_stores_update_local(dir_name=test_dir)
-            MALL._by_dir.update(conf)
+            conf = MALL.read_configs(test_dir=test_dir)
+            MALL.update_configs(conf)
         self.conf = conf.get(DEFAULT_FOLDER_NAME) if conf else MALL._by_dir.get(MALL._current_test_dir)
+        self._env_token = None
+        self._env_backup: Dict[str, Optional[str]] = {}
 
     def __enter__(self):
-        env_vars = MALL.env_vars or {}
-        MALL._backup_env_vars.update({k: os.getenv(k) for k, v in env_vars.items()})
-        for k, v in env_vars.items():
-            os.environ[k] = v
+        env_vars = MALL.env_vars
+        if env_vars and MALL.env_overlay:
+            install_env_overlay()
+            self._env_token = set_env_overlay(env_vars)
+        elif env_vars:
+            for k, v in env_vars.items():
+                self._env_backup.setdefault(k, os.environ.get(k))
+                os.environ[k] = v
         if self.conf and self.conf.get('imports'):
             import_str = self.conf.get('imports')
             import_keys = set(import_str.replace(' ', '').split(','))
@@ -167,16 +447,17 @@ class Stocker:
             import_keys.update(sub_imports)
         else:
             import_keys = MALL.imports
+        values = MALL.config.values
+        imported = {}
         for key in import_keys:
-            module_path = getattr(MALL, key)
+            module_path = values.get(key)
             if not module_path:
                 test_dir = MALL._current_test_dir
                 msg = f"could not find module path for key: {key} in section: {test_dir} of config.ini"
                 raise ConfigException(log_msg=msg)
-            kallable = import_from_str_path(module_path) if isinstance(module_path, str) else module_path
-
-            dir_conf = MALL._by_dir.get(MALL._current_test_dir) or MALL._by_dir.get(DEFAULT_FOLDER_NAME)
-            dir_conf[key] = kallable
+            if isinstance(module_path, str):
+                imported[key] = import_from_str_path(module_path)
+        MALL.set_configs(imported)
         if MALL._current_test:
             store = MALL.get_store()
             store._opened = True
@@ -186,6 +467,12 @@ class Stocker:
             store = MALL.get_store()
             store._opened = False
 
-        for k, v in MALL._backup_env_vars.items():
-            if v:
+        if self._env_token is not None:
+            reset_env_overlay(self._env_token)
+            self._env_token = None
+        for k, v in self._env_backup.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
                 os.environ[k] = v
+        self._env_backup.clear()
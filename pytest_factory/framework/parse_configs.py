@@ -1,32 +1,183 @@
 import json
+import os
 from configparser import ConfigParser
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Callable, Optional, Any
+from types import MappingProxyType
+from typing import Dict, Callable, Optional, Any, NamedTuple, FrozenSet, Mapping, Tuple, List
 
+import pytest_factory.framework.default_configs as default_configs
 from pytest_factory.framework.exceptions import ConfigException
 
+CONFIG_FILE_NAME = 'config.ini'
+# how many directories below the working directory are searched for config.ini
+CONFIG_SEARCH_DEPTH = 4
+# directories of installed packages, which never hold the config.ini of the project but can be huge; hidden
+# directories are skipped too
+CONFIG_SEARCH_SKIP = {'node_modules', '__pycache__', 'site-packages', 'venv'}
 
-def get_config_parser(path: Optional[str] = None) -> ConfigParser:
-    config = ConfigParser()
+CONFIG_CACHE_FILE_NAME = 'config_cache.json'
+
+_SECTIONS_BY_FILE: Dict[Tuple[str, int, int], Dict[str, Dict[str, Any]]] = {}
+_cache_dir: Optional[Path] = None
+
+
+def get_config_path(path: Optional[str] = None) -> Path:
+    """
+    :param path: the path of config.ini, or a glob pattern for it relative to the working directory or its parent; if
+        not given, config.ini is found by find_config_path
+    :return: the resolved path of config.ini
+    """
+    if path is None:
+        return find_config_path(str(Path.cwd()))
+    if Path(path).is_file():
+        return Path(path).resolve()
     p = Path()
-    path = path or '**/config.ini'
     p_list = list(p.glob(path))
     if len(p_list) < 1:
         path = '../' + path
         p_list = list(p.glob(path))
     if len(p_list) < 1:
         raise ConfigException(log_msg=f'{path} is missing from project!')
-    config_path = p_list[0]
+    return p_list[0].resolve()
+
+
+@lru_cache(maxsize=None)
+def find_config_path(cwd: str, max_depth: int = CONFIG_SEARCH_DEPTH) -> Path:
+    """
+    finds config.ini once per working directory, see search_config_path
+
+    :param cwd: the working directory
+    :param max_depth: see CONFIG_SEARCH_DEPTH
+    :return: the resolved path of config.ini
+    """
+    config_path = search_config_path(cwd=cwd, max_depth=max_depth)
+    if config_path is None:
+        raise ConfigException(log_msg=f'{CONFIG_FILE_NAME} is missing from project! searched {cwd}, its parents and '
+                                      f'{max_depth} directories below it')
+    return config_path
+
+
+def search_config_path(cwd: str, max_depth: int = CONFIG_SEARCH_DEPTH) -> Optional[Path]:
+    """
+    looks for a config.ini that has a [tests] section, i.e. one of pytest-factory rather than of another tool: first in
+    cwd and its parents, the nearest one winning, then breadth-first at most max_depth directories below cwd, where it
+    must be the only one at the shallowest depth that has one. sibling directories of cwd are never searched
+
+    :param cwd: the working directory
+    :param max_depth: see CONFIG_SEARCH_DEPTH
+    :return: the resolved path of config.ini, or None if there is none
+    """
+    start = Path(cwd).resolve()
+    for directory in (start, *start.parents):
+        candidate = directory.joinpath(CONFIG_FILE_NAME)
+        if _is_config(candidate):
+            return candidate
+    candidates = _search_down(root=start, max_depth=max_depth)
+    if len(candidates) > 1:
+        paths = ', '.join(str(candidate) for candidate in candidates)
+        raise ConfigException(log_msg=f'found more than one {CONFIG_FILE_NAME} at the same depth below {start}: '
+                                      f'{paths}! run pytest from the directory of the one to use')
+    return candidates[0] if candidates else None
+
+
+def _is_config(path: Path) -> bool:
+    try:
+        with open(path) as f:
+            return any(line.strip() == f'[{DEFAULT_FOLDER_NAME}]' for line in f)
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def _search_down(root: Path, max_depth: int) -> List[Path]:
+    """
+    :return: the config.ini files in the shallowest directories below root that have one
+    """
+    level = [root]
+    for depth in range(1, max_depth + 1):
+        next_level: List[Path] = []
+        for directory in level:
+            try:
+                with os.scandir(directory) as entries:
+                    children = sorted(entry.name for entry in entries if entry.is_dir(follow_symlinks=False)
+                                      and entry.name[0] != '.' and entry.name not in CONFIG_SEARCH_SKIP)
+            except OSError:
+                continue
+            next_level.extend(directory.joinpath(name) for name in children)
+        candidates = [directory.joinpath(CONFIG_FILE_NAME) for directory in next_level
+                      if _is_config(directory.joinpath(CONFIG_FILE_NAME))]
+        if candidates:
+            return candidates
+        level = next_level
+    return []
+
+
+def get_config_parser(path: Optional[str] = None) -> ConfigParser:
+    config = ConfigParser()
+    config_path = get_config_path(path=path)
     config.read(config_path)
-    config_path = config_path.resolve()
     config.set(DEFAULT_FOLDER_NAME, '_config_path', str(config_path))
     return config
 
 
+def set_config_cache_dir(cache_dir: Optional[Path]):
+    """
+    :param cache_dir: if given, the parsed sections of config.ini are also kept in a json file in this directory, so
+        that the next session does not parse config.ini again unless it changed
+    """
+    global _cache_dir
+    _cache_dir = cache_dir
+
+
+def read_all_sections(path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    parses every section of config.ini, once for as long as the file is not modified. the result is shared: copy a
+    section before changing it
+
+    :param path: see get_config_path
+    :return: the parsed sections by directory name
+    """
+    config_path = get_config_path(path=path)
+    stat = config_path.stat()
+    key = (str(config_path), stat.st_mtime_ns, stat.st_size)
+    sections = _SECTIONS_BY_FILE.get(key)
+    if sections is None:
+        sections = _read_cache_file(key=key)
+        if sections is None:
+            conf = get_config_parser(path=path)
+            sections = {DEFAULT_FOLDER_NAME: parse_section(conf=conf)}
+            sections.update({section: parse_section(conf=conf, section=section) for section in conf.sections()})
+            _write_cache_file(key=key, sections=sections)
+        _SECTIONS_BY_FILE[key] = sections
+    return sections
+
+
+def _read_cache_file(key: Tuple[str, int, int]) -> Optional[Dict[str, Dict[str, Any]]]:
+    if _cache_dir is None:
+        return None
+    try:
+        with open(_cache_dir.joinpath(CONFIG_CACHE_FILE_NAME)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cached.get('sections') if tuple(cached.get('key') or ()) == key else None
+
+
+def _write_cache_file(key: Tuple[str, int, int], sections: Dict[str, Dict[str, Any]]):
+    if _cache_dir is None:
+        return
+    try:
+        with open(_cache_dir.joinpath(CONFIG_CACHE_FILE_NAME), 'w') as f:
+            json.dump({'key': key, 'sections': sections}, f)
+    except (OSError, TypeError):
+        pass
+
+
 CONFIG_MAP = {
     'tuples': lambda x: x.split(","),
     'imports': lambda x: x,
     'bools': lambda x: x.lower() == 'true',
+    'ints': lambda x: int(x),
     'dicts': lambda x: json.loads(x)
 }
 
@@ -73,12 +224,92 @@ def parse_section(conf: ConfigParser, section: str = DEFAULT_FOLDER_NAME) -> Dic
 def prep_stores_update_local(dir_name: Optional[str] = DEFAULT_FOLDER_NAME,
                              path: Optional[str] = None) -> Dict[str, Any]:
     """Prep config values"""
-    conf_dict = {}
-    conf = get_config_parser(path=path)
-    conf_dict[DEFAULT_FOLDER_NAME] = parse_section(conf=conf)
+    sections = read_all_sections(path=path)
+    conf_dict = {DEFAULT_FOLDER_NAME: dict(sections[DEFAULT_FOLDER_NAME])}
 
-    if dir_name in conf.sections():
-        sub_dict = parse_section(conf=conf, section=dir_name)
-        conf_dict[dir_name] = sub_dict
+    if dir_name in sections:
+        conf_dict[dir_name] = dict(sections[dir_name])
 
     return conf_dict
+
+
+def prep_all_sections(path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    parses every section of config.ini at once, e.g. on the pytest-xdist controller to hand to all of its workers
+
+    :return: the parsed sections by directory name, see prep_stores_update_local
+    """
+    return {section: dict(values) for section, values in read_all_sections(path=path).items()}
+
+
+class ConfigSnapshot(NamedTuple):
+    """
+    the effective configuration of one test directory: its section of config.ini over the "tests" section, over the
+    defaults in default_configs. it is resolved once per directory, so that hot paths read plain attributes instead of
+    looking up each section in turn. values holds every configuration of the directory, including the ones that only
+    the user's code knows about
+    """
+    test_dir: Optional[str]
+    assert_no_missing_calls: bool
+    assert_no_extra_calls: bool
+    assert_reproduction_as_success: bool
+    http_req_wildcard_fields: FrozenSet[str]
+    recycle_sut: bool
+    retain_stores: bool
+    capture: str
+    capture_size: Optional[int]
+    virtual_time: bool
+    sut_callable: Any
+    env_vars: Mapping[str, str]
+    imports: Tuple[str, ...]
+    values: Mapping[str, Any]
+
+
+def resolve_config(by_dir: Dict[str, Dict[str, Any]], test_dir: Optional[str]) -> ConfigSnapshot:
+    """
+    :param by_dir: the parsed sections of config.ini, by directory name
+    :param test_dir: the name of the test directory
+    :return: the effective configuration of test_dir
+    """
+    values = dict(by_dir.get(DEFAULT_FOLDER_NAME) or {})
+    if test_dir != DEFAULT_FOLDER_NAME:
+        values.update({k: v for k, v in (by_dir.get(test_dir) or {}).items() if v is not None})
+
+    def get(key: str) -> Any:
+        value = values.get(key)
+        return getattr(default_configs, key, None) if value is None else value
+
+    def get_bool(key: str) -> bool:
+        """
+        the framework's bools do not need to be listed in bools: a string is parsed as bools would
+        """
+        value = get(key)
+        return CONFIG_MAP['bools'](value) if isinstance(value, str) else bool(value)
+
+    def get_int(key: str) -> Optional[int]:
+        value = get(key)
+        if not isinstance(value, str):
+            return value
+        try:
+            return CONFIG_MAP['ints'](value)
+        except ValueError:
+            raise ConfigException(log_msg=f'{key} in config.ini must be an integer, not "{value}"!')
+
+    imports = values.get('imports')
+    return ConfigSnapshot(
+        test_dir=test_dir,
+        assert_no_missing_calls=get_bool('assert_no_missing_calls'),
+        assert_no_extra_calls=get_bool('assert_no_extra_calls'),
+        assert_reproduction_as_success=get_bool('assert_reproduction_as_success'),
+        http_req_wildcard_fields=frozenset(get('http_req_wildcard_fields')),
+        recycle_sut=get_bool('recycle_sut'),
+        retain_stores=get_bool('retain_stores'),
+        capture=get('capture'),
+        capture_size=get_int('capture_size'),
+        virtual_time=get_bool('virtual_time'),
+        sut_callable=get('sut_callable'),
+        env_vars=MappingProxyType(dict(get('env_vars') or {})),
+        imports=tuple(x.strip() for x in imports.split(',')) if imports else (),
+        values=MappingProxyType(values)
+    )
+
@@ -0,0 +1,264 @@
+"""
+the profiler behind the --factory-profile option of the pytest plugin: how much of the runtime of a suite is spent in
+pytest-factory itself, by phase, per test and per test directory
+
+while the Profiler is off, nothing is wrapped, so the only overhead is a check in the plugin's hooks and fixtures
+"""
+import functools
+import inspect
+import json
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pytest_factory.framework.exceptions import MissingFactoryException, MissingTestDoubleException
+from pytest_factory.framework.mall import Stocker
+from pytest_factory.framework.store import Store
+
+COLLECTION = '<collection>'
+
+# phases that run inside another phase, so they do not add to the total. the stocking of the test doubles of a test
+# during collection also adds to the collect phase of its test directory
+NESTED_PHASES = {'stock', 'lookup', 'plugin_dispatch'}
+
+PHASES = ('collect', 'stock', 'stocker_enter', 'stocker_exit', 'register_plugins', 'patch_callables',
+          'get_next_response', 'lookup', 'plugin_dispatch', 'check_uncalled')
+
+# the number of slowest tests shown in the terminal summary; the json file has every test
+REPORT_TESTS = 10
+
+
+class Profiler:
+    """
+    accumulates the seconds and calls of each phase per test, keyed by the test's Store key, i.e.
+    '<test directory>.<test name>'. the Stocker and the Store are timed by wrapping their methods while enabled; the
+    plugin's hooks and fixtures time themselves with measure
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.current: Optional[str] = None
+        # the key of the collection entry of the test file being collected, if any
+        self.collecting: Optional[str] = None
+        self.timings: Dict[Tuple[str, str], List[float]] = {}
+        self.misses: Dict[str, int] = {}
+        self._lock = Lock()
+        self._patches: List[Tuple[Any, str, Any]] = []
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self._wrap(Stocker, '__init__', 'collect', only_collecting=True)
+        self._wrap(Stocker, '__enter__', 'stocker_enter')
+        self._wrap(Stocker, '__exit__', 'stocker_exit')
+        self._wrap(Store, 'update', 'stock', test_of=_store_key)
+        self._wrap(Store, 'register_plugins', 'register_plugins', test_of=_store_key)
+        self._wrap(Store, 'get_next_response', 'get_next_response', test_of=_store_key, count_misses=True)
+        self._wrap(Store, 'aget_next_response', 'get_next_response', test_of=_store_key, count_misses=True)
+        self._wrap(Store, '_get_matching_key', 'lookup', test_of=_store_key)
+        self._wrap(Store, '_get_plugin_responses', 'plugin_dispatch')
+        self._wrap(Store, 'check_no_uncalled_test_doubles', 'check_uncalled', test_of=_store_key)
+
+    def disable(self):
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches.clear()
+        self.enabled = False
+
+    def _wrap(self, owner: type, name: str, phase: str, test_of: Optional[Callable[[tuple], str]] = None,
+              count_misses: bool = False, only_collecting: bool = False):
+        """
+        while a test file is collected, the time spent in the Stocker and in stocking test doubles is the collect
+        phase of the file; only_collecting methods are not timed otherwise
+        """
+        original = vars(owner)[name]
+        is_static = isinstance(original, staticmethod)
+        func = original.__func__ if is_static else original
+
+        def done(test: Optional[str], start: float):
+            seconds = perf_counter() - start
+            if self.collecting:
+                if owner is Stocker or phase == 'stock':
+                    # one call per file: the Stocker that is made for it
+                    self.record(test=self.collecting, phase='collect', seconds=seconds, calls=int(name == '__init__'))
+                if owner is Stocker:
+                    return
+            elif only_collecting:
+                return
+            self.record(test=test, phase=phase, seconds=seconds)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed(*args, **kwargs):
+                test = test_of(args) if test_of else self.current
+                start = perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except (MissingFactoryException, MissingTestDoubleException):
+                    if count_misses:
+                        self.miss(test=test)
+                    raise
+                finally:
+                    done(test=test, start=start)
+                if count_misses and result is None:
+                    self.miss(test=test)
+                return result
+        else:
+            @functools.wraps(func)
+            def timed(*args, **kwargs):
+                test = test_of(args) if test_of else self.current
+                start = perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except (MissingFactoryException, MissingTestDoubleException):
+                    if count_misses:
+                        self.miss(test=test)
+                    raise
+                finally:
+                    done(test=test, start=start)
+                if count_misses and result is None:
+                    self.miss(test=test)
+                return result
+
+        self._patches.append((owner, name, original))
+        setattr(owner, name, staticmethod(timed) if is_static else timed)
+
+    def record(self, test: Optional[str], phase: str, seconds: float, calls: int = 1):
+        key = (test or COLLECTION, phase)
+        with self._lock:
+            timing = self.timings.get(key)
+            if timing is None:
+                self.timings[key] = [seconds, calls]
+            else:
+                timing[0] += seconds
+                timing[1] += calls
+
+    def miss(self, test: Optional[str], n: int = 1):
+        test = test or COLLECTION
+        with self._lock:
+            self.misses[test] = self.misses.get(test, 0) + n
+
+    def collect(self, test_dir: str) -> ContextManager:
+        """
+        :return: a context manager while which a test file of test_dir is collected, see _wrap; it does nothing while
+            the Profiler is off
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._collect(collection=f'{test_dir}.{COLLECTION}')
+
+    @contextmanager
+    def _collect(self, collection: str) -> Iterator[None]:
+        self.collecting = collection
+        try:
+            yield
+        finally:
+            self.collecting = None
+
+    def measure(self, phase: str, test: Optional[str] = None) -> '_Measure':
+        """
+        :return: a context manager that records the time spent inside it as phase of test (or the current test)
+        """
+        return _Measure(profiler=self, phase=phase, test=test or self.current)
+
+    def by_test(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: the seconds and calls of each phase, the total seconds and the misses, by test
+        """
+        tests: Dict[str, Dict[str, Any]] = {}
+        for (test, phase), (seconds, calls) in self.timings.items():
+            entry = tests.setdefault(test, {'total': 0.0, 'misses': self.misses.get(test, 0), 'phases': {}})
+            entry['phases'][phase] = {'seconds': seconds, 'calls': calls}
+            if phase not in NESTED_PHASES:
+                entry['total'] += seconds
+        return tests
+
+    def by_dir(self) -> Dict[str, Dict[str, Any]]:
+        """
+        :return: the same as by_test, summed per test directory
+        """
+        dirs: Dict[str, Dict[str, Any]] = {}
+        for test, entry in self.by_test().items():
+            dir_entry = dirs.setdefault(test.split('.')[0], {'total': 0.0, 'misses': 0, 'phases': {}})
+            dir_entry['total'] += entry['total']
+            dir_entry['misses'] += entry['misses']
+            for phase, timing in entry['phases'].items():
+                dir_timing = dir_entry['phases'].setdefault(phase, {'seconds': 0.0, 'calls': 0})
+                dir_timing['seconds'] += timing['seconds']
+                dir_timing['calls'] += timing['calls']
+        return dirs
+
+    def report_lines(self, n_tests: int = REPORT_TESTS) -> List[str]:
+        """
+        :return: the lines of the terminal summary: the phases per test directory, then those of the slowest tests.
+            each phase is shown as <name> <milliseconds>/<calls>, and nested phases are in parentheses
+        """
+        def row(name: str, entry: Dict[str, Any]) -> str:
+            cells = []
+            for phase in PHASES:
+                timing = entry['phases'].get(phase)
+                if timing:
+                    cell = f'{phase} {timing["seconds"] * 1000:.2f}/{timing["calls"]}'
+                    cells.append(f'({cell})' if phase in NESTED_PHASES else cell)
+            misses = f' {entry["misses"]} misses' if entry['misses'] else ''
+            return f'{name}: {entry["total"] * 1000:.2f} ms{misses} | ' + ', '.join(cells)
+
+        by_dir = sorted(self.by_dir().items(), key=lambda item: -item[1]['total'])
+        by_test = sorted(self.by_test().items(), key=lambda item: -item[1]['total'])[:n_tests]
+        total = sum(entry['total'] for _, entry in by_dir)
+        lines = [f'time spent in pytest-factory: {total * 1000:.2f} ms', '', 'by test directory:']
+        lines.extend(row(name, entry) for name, entry in by_dir)
+        lines.extend(['', f'slowest {len(by_test)} tests:'])
+        lines.extend(row(name, entry) for name, entry in by_test)
+        return lines
+
+    def write(self, path: Union[str, Path]):
+        """
+        writes the timings per test and per directory to path as json
+        """
+        with open(path, 'w') as f:
+            json.dump({'by_dir': self.by_dir(), 'by_test': self.by_test()}, f, indent=2)
+
+    def dump(self) -> List[List[Any]]:
+        """
+        :return: the timings and misses as json-serializable rows, e.g. to send from a pytest-xdist worker
+        """
+        rows: List[List[Any]] = [[test, phase, seconds, calls] for (test, phase), (seconds, calls)
+                                 in self.timings.items()]
+        rows.extend([test, None, 0.0, n] for test, n in self.misses.items())
+        return rows
+
+    def merge(self, rows: Iterable[List[Any]]):
+        """
+        adds the rows of dump from another Profiler
+        """
+        for test, phase, seconds, calls in rows:
+            if phase is None:
+                self.miss(test=test, n=calls)
+            else:
+                self.record(test=test, phase=phase, seconds=seconds, calls=calls)
+
+
+class _Measure:
+    __slots__ = ('profiler', 'phase', 'test', 'start')
+
+    def __init__(self, profiler: Profiler, phase: str, test: Optional[str]):
+        self.profiler = profiler
+        self.phase = phase
+        self.test = test
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, exc_type, exc_val, traceback):
+        self.profiler.record(test=self.test, phase=self.phase, seconds=perf_counter() - self.start)
+
+
+def _store_key(args: tuple) -> str:
+    return args[0]._test_name
+
+
+PROFILER = Profiler()
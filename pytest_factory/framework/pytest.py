@@ -1,12 +1,26 @@
 """
 pytest integration hooks
 
-import path to this file must be in pytest_plugins in conftest.py
+installing pytest-factory registers this file through the pytest11 entry point; without installing it, the import
+path to this file must be in pytest_plugins in conftest.py
 
 """
+from pathlib import Path
+
 import pytest
 
+from pytest_factory.framework.context import uninstall_env_overlay
+from pytest_factory.framework.exceptions import ConfigException
 from pytest_factory.framework.mall import MALL, DEFAULT_FOLDER_NAME
+from pytest_factory.logger import start_queue_logging, stop_queue_logging
+from pytest_factory.framework.parse_configs import search_config_path, set_config_cache_dir
+from pytest_factory.framework.profile import PROFILER
+
+CALL_FAILED = pytest.StashKey[bool]()
+
+XDIST_CONFIG_KEY = 'pytest_factory_config'
+XDIST_SUMMARIES_KEY = 'pytest_factory_summaries'
+XDIST_PROFILE_KEY = 'pytest_factory_profile'
 
 
 @pytest.fixture()
@@ -18,24 +32,161 @@ def store(request):
     """
     store = MALL.get_store(item=request.node)
     with MALL.stock():
-        store.register_plugins(plugins=MALL.plugins)
+        store.register_plugins(plugins=MALL.plugin_router)
         yield store
+    store.release_sut()
 
 
 @pytest.fixture(autouse=True)
 def patch_callables(monkeypatch, request):
     """
     we are grabbing request here because it appears to be the first time we can positively identify which test we are
-    running and need to set the "_current_test" MALL property
+    running and need to set the "_current_test" MALL property. after the test, the MALL evicts its Store
     """
+    if PROFILER.enabled:
+        PROFILER.current = MALL.get_store_key(request.node)
+        with PROFILER.measure('patch_callables'):
+            _patch_callables(monkeypatch=monkeypatch, item=request.node)
+        yield
+        with PROFILER.measure('patch_callables'):
+            MALL.check_out(item=request.node, failed=request.node.stash.get(CALL_FAILED, False))
+        PROFILER.current = None
+        return
+    _patch_callables(monkeypatch=monkeypatch, item=request.node)
+    yield
+    MALL.check_out(item=request.node, failed=request.node.stash.get(CALL_FAILED, False))
 
-    MALL.get_store(item=request.node)
+
+def _patch_callables(monkeypatch, item):
+    MALL.get_store(item=item)
     for configs in MALL.get_monkeypatch_configs():
         callable_obj = configs.get('callable')
         for member_name, member_patch in configs.get('patch_methods').items():
             monkeypatch.setattr(callable_obj, member_name, member_patch, raising=False)
 
 
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """
+    remembers if the test failed so that its StoreSummary can say so
+    """
+    outcome = yield
+    report = outcome.get_result()
+    if report.when == 'call':
+        item.stash[CALL_FAILED] = report.failed
+
+
+def pytest_collection_finish(session):
+    MALL.expect_items(items=session.items)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('pytest-factory')
+    group.addoption('--factory-profile', action='store_true', default=False,
+                    help='report the time spent in pytest-factory itself per test directory and for the slowest tests: '
+                         'collection, Stocker enter/exit, register_plugins, the patch_callables fixture, '
+                         'Store.get_next_response (with its lookups, misses and plugin dispatch) and '
+                         'check_no_uncalled_test_doubles')
+    group.addoption('--factory-profile-json', default=None, metavar='PATH',
+                    help='with --factory-profile, also write the time spent in pytest-factory per test and per test '
+                         'directory to PATH as json')
+    parser.addini('factory_config_cache', type='bool', default=False,
+                  help='keep the parsed config.ini in the pytest cache directory, so that later runs only parse it '
+                       'again once it changes')
+    parser.addini('factory_async_logging', type='bool', default=False,
+                  help='write the JSON log records of pytest-factory from a background thread')
+    parser.addini('factory_env_overlay', type='bool', default=False,
+                  help='keep the env_vars of config.ini in an overlay on os.environ per context, so that tests that '
+                       'run concurrently in one event loop each see their own, instead of setting them in the process '
+                       'environment; subprocesses and os.environb do not see the overlay')
+
+
+def pytest_configure(config):
+    """
+    the parsed config.ini may be kept in the pytest cache directory, see the factory_config_cache ini option, and log
+    records may be written from a background thread, see the factory_async_logging ini option. the env_vars of
+    config.ini are an overlay per context with the factory_env_overlay ini option. --factory-profile turns on the
+    PROFILER
+
+    on a pytest-xdist worker, the MALL reads config.ini from the sections parsed by the controller, and only stocks
+    the Store of a test once the test runs on this worker
+    """
+    if config.getini('factory_config_cache') and getattr(config, 'cache', None) is not None:
+        set_config_cache_dir(config.cache.mkdir('pytest_factory'))
+    if config.getini('factory_async_logging'):
+        start_queue_logging()
+    MALL.env_overlay = config.getini('factory_env_overlay')
+    if config.getoption('factory_profile'):
+        PROFILER.enable()
+    workerinput = getattr(config, 'workerinput', None)
+    if workerinput is None:
+        return
+    MALL.defer_stocking = True
+    if workerinput.get(XDIST_CONFIG_KEY) is not None:
+        MALL.set_all_sections(workerinput[XDIST_CONFIG_KEY])
+
+
+def pytest_unconfigure(config):
+    stop_queue_logging()
+    PROFILER.disable()
+    uninstall_env_overlay()
+    MALL.clear_monkeypatch_caches()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """
+    reports what the MALL kept of the Store of each test, and the profile if --factory-profile is given
+    """
+    summary_lines = MALL.summary_lines()
+    if summary_lines:
+        terminalreporter.write_sep('=', 'pytest-factory summary')
+        for line in summary_lines:
+            terminalreporter.write_line(line)
+    if not PROFILER.enabled:
+        return
+    terminalreporter.write_sep('=', 'pytest-factory profile')
+    for line in PROFILER.report_lines():
+        terminalreporter.write_line(line)
+    json_path = config.getoption('factory_profile_json')
+    if json_path:
+        PROFILER.write(json_path)
+        terminalreporter.write_line(f'pytest-factory profile written to {json_path}')
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """
+    pytest-xdist controller: parses config.ini once for all workers. if there is no config.ini, or more than one, the
+    workers look for it themselves, and only fail if a test needs it, as they would without pytest-xdist
+    """
+    try:
+        sections = MALL.get_all_sections() if search_config_path(str(Path.cwd())) else None
+    except ConfigException:
+        sections = None
+    node.workerinput[XDIST_CONFIG_KEY] = sections
+
+
+def pytest_sessionfinish(session):
+    """
+    pytest-xdist worker: sends the StoreSummary of each test it ran, and its profile if any, to the controller
+    """
+    workeroutput = getattr(session.config, 'workeroutput', None)
+    if workeroutput is not None:
+        workeroutput[XDIST_SUMMARIES_KEY] = [summary._asdict() for summary in MALL.summaries.values()]
+        if PROFILER.enabled:
+            workeroutput[XDIST_PROFILE_KEY] = PROFILER.dump()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """
+    pytest-xdist controller: merges the StoreSummary of each test that ran on the worker, and its profile if any
+    """
+    workeroutput = getattr(node, 'workeroutput', {})
+    MALL.merge_summaries(summaries=workeroutput.get(XDIST_SUMMARIES_KEY, ()))
+    PROFILER.merge(rows=workeroutput.get(XDIST_PROFILE_KEY, ()))
+
+
 @pytest.hookimpl(hookwrapper=True)
 def pytest_collect_file(file_path, path, parent):
     """
@@ -51,7 +202,7 @@ def pytest_collect_file(file_path, path, parent):
         test_dir = parts[-2]
     file_name = parts[-1]
     if test_dir and len(file_name) >= 7 and 'test' in [file_name[:4], file_name[-7:-3]]:
-        with MALL.stock(test_dir=test_dir):
+        with PROFILER.collect(test_dir=test_dir), MALL.stock(test_dir=test_dir):
             outcome = yield
     else:
         outcome = yield
@@ -0,0 +1,220 @@
+"""
+the routing index that lets a Factory find candidate test doubles for an actual request without comparing the request
+against every key in the Factory, and the router that dispatches requests to plugins by url prefix
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Sequence, Tuple, Mapping
+from urllib.parse import parse_qsl, urlsplit
+
+WILDCARD = '*'
+
+RouteEntry = Tuple[int, Any]
+
+
+def is_wild(segment: Hashable) -> bool:
+    """
+    a segment that is empty or "*" may match any value, so the index must always treat it as a possible match;
+    the final decision is left to the compare method of the key
+    """
+    return not segment or segment == WILDCARD
+
+
+class _Node:
+    __slots__ = ('children', 'wild', 'entries')
+
+    def __init__(self):
+        self.children: Dict[Hashable, _Node] = {}
+        self.wild: Optional[_Node] = None
+        self.entries: List[RouteEntry] = []
+
+
+class RouteIndex:
+    """
+    a trie of route segments. each indexed key is stored with its insertion order so that the caller can restore
+    first-match semantics among the candidates returned by match()
+
+    a route is a sequence of hashable segments, e.g. (method, scheme, netloc, params, fragment, query, *path_parts).
+    an indexed route may match any actual route that it is a prefix of, because keys do not compare the segments
+    that come after their own last segment
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, route: Sequence[Hashable], order: int, key: Any):
+        node = self._root
+        for segment in route:
+            if is_wild(segment):
+                if node.wild is None:
+                    node.wild = _Node()
+                node = node.wild
+            else:
+                child = node.children.get(segment)
+                if child is None:
+                    child = node.children[segment] = _Node()
+                node = child
+        node.entries.append((order, key))
+        self._size += 1
+
+    def match(self, route: Sequence[Hashable]) -> List[RouteEntry]:
+        """
+        :param route: the route of the actual request
+        :return: the (order, key) entries of every indexed route that may match route, in no particular order
+        """
+        return self._walk(route=route, match_longer=False)
+
+    def overlapping(self, route: Sequence[Hashable]) -> List[RouteEntry]:
+        """
+        the inverse of match(): used to find existing keys that a new key would also match
+
+        :param route: the route of a new key
+        :return: the (order, key) entries of every indexed route that route may match, in no particular order
+        """
+        return self._walk(route=route, match_longer=True)
+
+    def _walk(self, route: Sequence[Hashable], match_longer: bool) -> List[RouteEntry]:
+        found: List[RouteEntry] = []
+        nodes = [self._root]
+        for segment in route:
+            next_nodes = []
+            for node in nodes:
+                found.extend(node.entries)
+                if is_wild(segment):
+                    next_nodes.extend(node.children.values())
+                else:
+                    child = node.children.get(segment)
+                    if child is not None:
+                        next_nodes.append(child)
+                if node.wild is not None:
+                    next_nodes.append(node.wild)
+            if not next_nodes:
+                return found
+            nodes = next_nodes
+
+        # route is exhausted: longer indexed routes can still match if the rest of their segments are wild, or always
+        # if route is the one that will be compared against them
+        while nodes:
+            next_nodes = []
+            for node in nodes:
+                found.extend(node.entries)
+                if match_longer:
+                    next_nodes.extend(node.children.values())
+                if node.wild is not None:
+                    next_nodes.append(node.wild)
+            nodes = next_nodes
+        return found
+
+
+@lru_cache(maxsize=1024)
+def split_url(url: str) -> Optional[Tuple[str, ...]]:
+    """
+    :return: the scheme, host and non-empty path segments of url, or None if url has no scheme and host
+    """
+    url_parts = urlsplit(url)
+    if not url_parts.scheme or not url_parts.netloc:
+        return None
+    return (url_parts.scheme, url_parts.netloc, *(part for part in url_parts.path.split('/') if part))
+
+
+@lru_cache(maxsize=1024)
+def split_url_leaf(url: str) -> Tuple[FrozenSet[Tuple[str, str]], str]:
+    """
+    :return: the query parameters and the fragment of url, which split_url leaves out
+    """
+    url_parts = urlsplit(url)
+    return frozenset(parse_qsl(url_parts.query, keep_blank_values=True)), url_parts.fragment
+
+
+class _PrefixNode:
+    __slots__ = ('children', 'value', 'leaves')
+
+    def __init__(self):
+        self.children: Dict[str, _PrefixNode] = {}
+        self.value: Any = None
+        # the plugins whose url has a query or fragment: (query parameters, fragment, plugin)
+        self.leaves: List[Tuple[FrozenSet[Tuple[str, str]], str, Any]] = []
+
+    def match_leaf(self, url: str) -> Optional[Any]:
+        if not self.leaves:
+            return None
+        query, fragment = split_url_leaf(url)
+        for leaf_query, leaf_fragment, plugin in self.leaves:
+            if leaf_query <= query and (not leaf_fragment or leaf_fragment == fragment):
+                return plugin
+        return None
+
+
+class PluginRouter:
+    """
+    a trie of plugin urls keyed by scheme, host and path segments, so that dispatching an actual request to a plugin
+    is one walk down the trie, however many plugins there are. the plugin with the longest url that prefixes the url
+    of the request wins
+
+    a plugin url with a query or a fragment is a leaf: it only serves requests to the same path (not to paths below it)
+    whose query has every parameter of its query, and the same fragment if it has one. it wins over a plugin at the same
+    path without a query
+
+    a plugin url without a scheme and host cannot be split, so it is matched as a substring of the url of the request
+    if no url in the trie matches
+    """
+
+    def __init__(self, plugins: Optional[Mapping[str, Any]] = None):
+        """
+        :param plugins: the plugins by url
+        """
+        self._root = _PrefixNode()
+        self._unsplit: List[Tuple[str, Any]] = []
+        self._size = 0
+        for url, plugin in (plugins or {}).items():
+            self.add(url=url, plugin=plugin)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, url: str, plugin: Any):
+        self._size += 1
+        segments = split_url(url)
+        if segments is None:
+            self._unsplit.append((url, plugin))
+            return
+        node = self._root
+        for segment in segments:
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _PrefixNode()
+            node = child
+        query, fragment = split_url_leaf(url)
+        if query or fragment:
+            node.leaves.append((query, fragment, plugin))
+        else:
+            node.value = plugin
+
+    def match(self, url: Optional[str]) -> Optional[Any]:
+        """
+        :param url: the url of the actual request
+        :return: the plugin that serves url, or None
+        """
+        if not isinstance(url, str):
+            return None
+        found = None
+        node = self._root
+        segments = split_url(url)
+        for segment in segments or ():
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.value is not None:
+                found = node.value
+        else:
+            if segments:
+                found = node.match_leaf(url) or found
+        if found is None:
+            for plugin_url, plugin in self._unsplit:
+                if url.find(plugin_url) > -1:
+                    return plugin
+        return found
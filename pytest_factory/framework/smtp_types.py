@@ -20,7 +20,7 @@ class SMTPRequest(BaseMockRequest):
         self.kwargs = {**kwargs, **{'from_addr': from_addr, 'to_addrs': to_addrs, 'host': host}}
         super().__init__(exchange_id=exchange_id, timestamp=timestamp)
 
-    def compare(self, other) -> bool:
+    def compare(self, other, **_) -> bool:
         attr_name = 'host' if self.host else 'to_addrs'
         if isinstance(other, Sequence) or isinstance(other, str):
             return getattr(self, attr_name) == other
@@ -1,51 +1,179 @@
 from __future__ import annotations
-from typing import Dict, Optional, Any, Union, List, Callable, Set
+from typing import Dict, Optional, Any, Union, List, Callable, Set, Tuple, Hashable, NamedTuple
 from functools import cached_property
+from threading import Lock
+from time import perf_counter
 from pytest import Item
 
 import pytest_factory.framework.exceptions as exceptions
 from pytest_factory.framework.base_types import Factory, BaseMockRequest, MOCK_RESPONSES_TYPE, ROUTING_TYPE, \
-    compare_unknown_types, TrackedResponses
+    TrackedResponses, SutBuilder
+from pytest_factory.framework.bench import BenchResult, drive, summarize
+from pytest_factory.framework.capture import MessageLog
+from pytest_factory.framework.clock import VirtualClock
+from pytest_factory.framework.routing import PluginRouter
+from pytest_factory.framework.parse_configs import ConfigSnapshot
 from pytest_factory.framework.default_configs import (assert_no_missing_calls as default_assert_no_missing_calls,
-                                                      assert_no_extra_calls as default_assert_no_extra_calls)
+                                                      assert_no_extra_calls as default_assert_no_extra_calls,
+                                                      capture as default_capture)
+
+
+PLUGIN_FACTORY_NAME = 'mock_http_server'
 
 
 def is_plugin(kallable: Callable) -> bool:
     return hasattr(kallable, 'get_plugin_responses')
 
 
+class StoreSummary(NamedTuple):
+    """
+    what the Mall keeps of a Store once its test is done, for reporting at the end of the session
+    """
+    test_path: str
+    calls: Dict[str, int]
+    uncalled: Dict[str, int]
+    messages: int
+    failed: bool = False
+
+
 class Store:
     """
     stores test doubles for a given test method
     """
 
-    def __init__(self, test_path: str):
+    def __init__(self, test_path: str, capture: Optional[str] = None, capture_size: Optional[int] = None,
+                 defer: bool = False):
         """
         :param test_path: the full name of the test this Store belongs to
+        :param capture: the capture policy for messages, see set_capture_policy
+        :param capture_size: see set_capture_policy
+        :param defer: if True, test doubles added by update are only kept until stock is called, e.g. on a
+            pytest-xdist worker that collects every test but only runs some of them
         """
+        self.config: Optional[ConfigSnapshot] = None
         self._test_name = test_path
         self._sut_callable: Optional[Callable] = None
         self._sut_factory: Optional[Factory] = None
+        self._sut: Any = None
         self.assert_no_extra_calls: bool = default_assert_no_extra_calls
         self.assert_no_missing_calls: bool = default_assert_no_missing_calls
         self.factory_names: Set[str] = set()
-        self.messages = []
+        self.messages = MessageLog(mode=capture or default_capture, size=capture_size)
         self._opened: bool = False
+        self._route_cache: Dict[Tuple[str, Hashable], Any] = {}
+        self._uncalled: Dict[str, int] = {}
+        self._plugins: Optional[PluginRouter] = None
+        self.virtual_time: Optional[bool] = None
+        self.clock: Optional[VirtualClock] = None
+        self._bench: bool = False
+        self._lock = Lock()
+        self._deferred: Optional[List[Dict[str, Any]]] = [] if defer else None
+        self._warnings: Dict[int, List] = {}
 
     @property
     def sut(self) -> object:
         """
-        the system-under-test
+        the system-under-test; if its factory registered a SutBuilder, it is built the first time it is read
         """
         if not self._sut_factory and self._opened:
             raise exceptions.MissingHandlerException
         if not self._sut_factory:
             return None
+        if self._sut is None:
+            try:
+                _sut = self._sut_factory.get_sut
+            except AttributeError as _:
+                return None
+            self._sut = _sut.build() if isinstance(_sut, SutBuilder) else _sut
+        return self._sut
+
+    def summarize(self, failed: bool = False) -> StoreSummary:
+        """
+        :param failed: if True, the test this Store belongs to failed
+        :return: the number of calls made to each factory of test doubles, and the number of responses left uncalled
+        """
+        calls = {}
+        for factory_name in self.factory_names:
+            factory = getattr(self, factory_name, None)
+            if factory is None or factory is self._sut_factory:
+                continue
+            calls[factory_name] = sum(responses.count for responses in factory.values() if not is_plugin(responses))
+        uncalled = {factory_name: count for factory_name, count in self._uncalled.items() if count}
+        return StoreSummary(test_path=self._test_name, calls=calls, uncalled=uncalled, messages=self.messages.total,
+                            failed=failed)
+
+    def release_sut(self):
+        """
+        drops the reference to the system-under-test once its test is done, so that it is not kept alive for the rest
+        of the session. a SutBuilder with a release function gets it back, e.g. to recycle it for the next test
+        """
+        _sut, self._sut = self._sut, None
+        if _sut is None or not self._sut_factory:
+            return
+        builder = self._sut_factory.get_sut
+        if isinstance(builder, SutBuilder) and builder.release:
+            builder.release(_sut)
+
+    def set_capture_policy(self, mode: str, size: Optional[int] = None):
+        """
+        sets how much of the Messages exchanged during this test are kept in messages; call it before the exchanges,
+        since it starts a new, empty MessageLog. the default for all tests can be set with capture and capture_size in
+        config.ini
+
+        :param mode: off, counts, ring or full, see MessageLog
+        :param size: the number of messages kept by ring, or kept in memory by full before older ones are spilled to
+            disk
+        """
+        self.messages.close(delete=True)
+        self.messages = MessageLog(mode=mode, size=size)
+
+    async def bench(self, n: int = 1000, concurrency: int = 1, result_path: Optional[str] = None,
+                    **kwargs) -> BenchResult:
+        """
+        measures the throughput and latency of the system-under-test against the test doubles in this Store, by
+        calling run_test on n systems-under-test, concurrency at a time. each run gets its own system-under-test from
+        the factory of this test (recycled if recycle_sut is set), and the responses of each test double start over
+        once they run out, except for lazy sources
+
+        while benchmarking, messages are not captured, uncalled test doubles are not checked and virtual time is off,
+        since the runs in flight would each patch the event loop with their own VirtualClock; afterwards the messages
+        and the calls to each test double are as they were before
+
+        the runs share one cursor per test double: concurrent runs take its responses in the order in which they call
+        it, so a run may not get the responses in the order that a single run_test would
+
+        :param n: the number of runs
+        :param concurrency: the number of runs in flight at a time
+        :param result_path: if given, the result is also written to this path as json
+        :param kwargs: passed to each run_test, e.g. response_parser; virtual_time is ignored
+        :return: the throughput and latency percentiles
+        """
+        builder = self._sut_factory.get_sut if self._sut_factory else None
+        if not isinstance(builder, SutBuilder):
+            raise exceptions.MissingHandlerException
+        kwargs.pop('virtual_time', None)
+        responses = [r for factory_name in self.factory_names
+                     for r in getattr(self, factory_name).values() if isinstance(r, TrackedResponses)]
+        counts = [r.count for r in responses]
+        uncalled = dict(self._uncalled)
+        messages, virtual_time = self.messages, self.virtual_time
+        self.messages = MessageLog(mode='off')
+        self._bench = True
         try:
-            _sut = self._sut_factory.get_sut
-        except AttributeError as _:
-            return None
-        return _sut
+            start = perf_counter()
+            latencies = await drive(build=builder.build, run=lambda sut: sut.run_test(virtual_time=False, **kwargs),
+                                    release=builder.release, n=n, concurrency=concurrency)
+            seconds = perf_counter() - start
+        finally:
+            self._bench = False
+            self.messages, self.virtual_time = messages, virtual_time
+            self._uncalled = uncalled
+            for r, count in zip(responses, counts):
+                r.count = count
+        result = summarize(test_path=self._test_name, latencies=latencies, concurrency=concurrency, seconds=seconds)
+        if result_path:
+            result.write(result_path)
+        return result
 
     def shop(self, **kwargs) -> Shopper:
         """
@@ -65,18 +193,58 @@ class Store:
         :param response: the output from the depended-on-component or the system-under-test itself
         :param response_is_sut: if True, response is the system-under-test
         """
+        if self._deferred is not None:
+            self._deferred.append({'req_obj': req_obj, 'factory_name': factory_name, 'response': response,
+                                   'response_is_sut': response_is_sut})
+            return
         exchange_id = req_obj.exchange_id if hasattr(req_obj, 'exchange_id') else None
         responses = TrackedResponses.from_any(exchange_id=exchange_id, response=response)
         self.factory_names.add(factory_name)
+        self._route_cache.clear()
         if not hasattr(self, factory_name) or getattr(self, factory_name) is None:
-            new_factory = Factory(req_obj=req_obj, responses=responses)
+            factory = Factory(req_obj=req_obj, responses=responses, config=self.config)
             if response_is_sut:
-                self._sut_factory = new_factory
-            setattr(self, factory_name, new_factory)
+                self._sut_factory = factory
+            setattr(self, factory_name, factory)
         else:  # store already has test doubles from this factory
-            old_factory = getattr(self, factory_name)
-            if not old_factory.get(req_obj):
-                old_factory[req_obj] = responses
+            factory = getattr(self, factory_name)
+            factory.config = self.config
+            factory[req_obj] = responses
+        if not response_is_sut and factory.get(req_obj) is responses:
+            responses.factory_name = factory_name
+            self._uncalled[factory_name] = self._uncalled.get(factory_name, 0) + responses.uncalled
+
+    def stock(self):
+        """
+        adds the test doubles that were deferred, see defer
+        """
+        deferred, self._deferred = self._deferred, None
+        for kwargs in deferred or ():
+            self.update(**kwargs)
+
+    def warn(self, source: Any, exception: exceptions.PytestFactoryBaseException):
+        """
+        holds a warning until flush_warnings, so that a warning about the same source, e.g. the responses of an
+        endpoint that is called too often, is logged once per test however often it occurs
+
+        :param source: what the warning is about
+        :param exception: the warning, created with log=False
+        """
+        with self._lock:
+            warning = self._warnings.get(id(source))
+            if warning is None:
+                self._warnings[id(source)] = [exception, 1]
+            else:
+                warning[1] += 1
+
+    def flush_warnings(self):
+        """
+        logs each warning held by warn once, saying how often it occurred if more than once
+        """
+        with self._lock:
+            warnings, self._warnings = self._warnings, {}
+        for exception, n in warnings.values():
+            exception.emit(suffix=f' (occurred {n} times in this test)' if n > 1 else '')
 
     def get_next_response(self, factory_name: str,
                           req_obj: BaseMockRequest) -> Any:
@@ -86,18 +254,42 @@ class Store:
 
         if it runs out of uncalled responses, it will raise OverCalledTestDoubleException
         unless Store.assert_no_extra_calls is False. otherwise it will log
-        warnings to logger.
+        one warning to logger per endpoint called too often, see warn.
 
         if not response can be found, this indicates a user error in setting up factories such that the expected
         test double was not generated. this will log errors to logger and raise an MissingTestDoubleException if
         the factory exists but test double does not, or MissingFactoryException if the factory also does not exist
 
+        the key that a request signature resolved to is remembered until test doubles are added to this Store, so
+        repeated calls to the same endpoint skip the lookup. this assumes that the signature of req_obj (if it has one)
+        covers everything that the compare method of the keys checks
+
         :param factory_name: name of the first factory used to create the response test double
         :param req_obj: the request made by the RequestHandler represented as a
             BaseMockRequest
         :return: the next available mock response corresponding to the given
             req_obj
         """
+        mock_responses = self._get_mock_responses(factory_name=factory_name, req_obj=req_obj)
+        if mock_responses is None:
+            return None
+        next_response, called = mock_responses.dequeue(replay=self._bench)
+        return self._use_response(factory_name=factory_name, req_obj=req_obj, mock_responses=mock_responses,
+                                  next_response=next_response, called=called)
+
+    async def aget_next_response(self, factory_name: str, req_obj: BaseMockRequest) -> Any:
+        """
+        get_next_response for asynchronous adapters: if the responses of the test double are an async iterator, its
+        next response is awaited, so that it may await anything, e.g. asyncio.sleep, I/O or an asyncio.Queue
+        """
+        mock_responses = self._get_mock_responses(factory_name=factory_name, req_obj=req_obj)
+        if mock_responses is None:
+            return None
+        next_response, called = await mock_responses.adequeue(replay=self._bench)
+        return self._use_response(factory_name=factory_name, req_obj=req_obj, mock_responses=mock_responses,
+                                  next_response=next_response, called=called)
+
+    def _get_mock_responses(self, factory_name: str, req_obj: BaseMockRequest) -> Optional[MOCK_RESPONSES_TYPE]:
         if not hasattr(self, factory_name):
             ex = exceptions.MissingFactoryException(factory_name=factory_name)
             if self.assert_no_missing_calls:
@@ -106,26 +298,27 @@ class Store:
                 return None
         factory = getattr(self, factory_name)
         mock_responses = None
-        for k, v in factory.items():
-            compare_result = compare_unknown_types(k, req_obj)
-            if compare_result:
-                if is_plugin(v):
-                    try:
-                        mock_responses = v.get_plugin_responses(req_obj=req_obj)
-                    except exceptions.PytestFactoryBaseException as ex:
-                        raise ex
-                    except Exception as ex:
-                        raise exceptions.UnhandledPluginException(plugin_name=v.__qualname__, exception=ex)
-                else:
-                    mock_responses = v
-                break
+        key = self._get_matching_key(factory_name=factory_name, factory=factory, req_obj=req_obj)
+        if key is not None:
+            v = factory[key]
+        elif self._plugins and factory_name == PLUGIN_FACTORY_NAME:
+            v = self._plugins.match(getattr(req_obj, 'url', None))
+        else:
+            v = None
+        if v is not None:
+            mock_responses = self._get_plugin_responses(plugin=v, req_obj=req_obj) if is_plugin(v) else v
 
         if mock_responses is None:
             ex = exceptions.MissingTestDoubleException(req_obj=req_obj)
             if self.assert_no_missing_calls:
                 raise ex
-            return mock_responses
-        next_response = mock_responses.mark_and_retrieve_next()
+        return mock_responses
+
+    def _use_response(self, factory_name: str, req_obj: BaseMockRequest, mock_responses: MOCK_RESPONSES_TYPE,
+                      next_response: Any, called: int) -> Any:
+        if called and mock_responses.factory_name in self._uncalled:
+            with self._lock:
+                self._uncalled[mock_responses.factory_name] -= called
         if isinstance(next_response, Callable):
             try:
                 final_response = next_response(req_obj)
@@ -140,20 +333,46 @@ class Store:
             final_response = self._check_overcalled_test_doubles(req_obj=req_obj, mock_responses=mock_responses)
         return final_response
 
+    def _get_matching_key(self, factory_name: str, factory: Factory, req_obj: BaseMockRequest) -> Optional[Any]:
+        signature = getattr(req_obj, 'signature', None)
+        if signature is None:
+            return factory.get_matching_key(req_obj, config=self.config)
+        cache_key = (factory_name, signature)
+        key = self._route_cache.get(cache_key)
+        if key is None:
+            key = factory.get_matching_key(req_obj, config=self.config)
+            if key is not None:
+                self._route_cache[cache_key] = key
+        return key
+
+    @staticmethod
+    def _get_plugin_responses(plugin: Any, req_obj: BaseMockRequest) -> Optional[MOCK_RESPONSES_TYPE]:
+        try:
+            return plugin.get_plugin_responses(req_obj=req_obj)
+        except exceptions.PytestFactoryBaseException as ex:
+            raise ex
+        except Exception as ex:
+            raise exceptions.UnhandledPluginException(plugin_name=plugin.__qualname__, exception=ex)
+
     def _check_overcalled_test_doubles(self, req_obj: BaseMockRequest, mock_responses: MOCK_RESPONSES_TYPE) -> Any:
-        final_response = mock_responses[-1][1]
+        final_response = mock_responses.response(-1)
         exception = exceptions.OverCalledTestDoubleException(mock_responses=mock_responses,
                                                              req_obj=req_obj,
-                                                             log_error=self.assert_no_extra_calls)
+                                                             log_error=self.assert_no_extra_calls,
+                                                             log=self.assert_no_extra_calls)
         if self.assert_no_extra_calls:
             raise exception
+        self.warn(source=mock_responses, exception=exception)
         return final_response
 
-    def register_plugins(self, plugins: Dict[str, Callable]):
-        if hasattr(self, 'mock_http_server'):
-            self.mock_http_server.update(plugins)
-        else:
-            setattr(self, 'mock_http_server', plugins)
+    def register_plugins(self, plugins: Union[PluginRouter, Dict[str, Callable]]):
+        """
+        :param plugins: the plugins by url, which serve requests to mock_http_server that none of its test doubles
+            match
+        """
+        self._plugins = plugins if isinstance(plugins, PluginRouter) else PluginRouter(plugins)
+        if not hasattr(self, PLUGIN_FACTORY_NAME):
+            setattr(self, PLUGIN_FACTORY_NAME, Factory(config=self.config))
 
     @cached_property
     def _get_test_doubles(self) -> Dict[str, ROUTING_TYPE]:
@@ -166,7 +385,12 @@ class Store:
         """
         checks if this Store has any test_doubles that have not been called the
         number of times expected by default, it will log warnings to logger
+
+        the Store keeps a running count of uncalled responses per factory, so the test doubles are only walked when
+        some of them were not called and the exception message has to be built
         """
+        if not any(self._uncalled.values()):
+            return
         uncalled_test_doubles = {}
 
         for test_double, response_dict in self._get_test_doubles.items():
@@ -176,8 +400,7 @@ class Store:
             for key, responses in response_dict.items():
                 if is_plugin(responses):
                     continue
-                uncalled_responses = [resp[1]
-                                      for resp in responses if not resp[0]]
+                uncalled_responses = responses.uncalled_responses()
                 if uncalled_responses:
                     uncalled_test_double_endpoints[key] = uncalled_responses
             if uncalled_test_double_endpoints:
@@ -195,9 +418,15 @@ class Shopper:
     1. capture input to SUT
     2. yield to test execution, during which DOC I/O are captured
     3. capture SUT output
+    if the store has virtual_time, the test executes with store.clock, a VirtualClock
     """
-    def __init__(self, response_attr: str, request_attr: str, store: Store, *_, **kwargs):
+    def __init__(self, response_attr: str, request_attr: str, store: Store, *_, sut: Any = None, **kwargs):
+        """
+        :param sut: the system-under-test being run, if not store.sut, e.g. one of many while benchmarking
+        """
         self.store = store
+        self.sut = sut
+        self.clock: Optional[VirtualClock] = None
         self.response_attr = response_attr
         self.request_attr = request_attr
         for k, v in kwargs.items():
@@ -205,13 +434,25 @@ class Shopper:
                 setattr(self.store, k, v)
 
     def __enter__(self):
-        sut_input = getattr(self.store.sut, self.request_attr)
+        if self.sut is None:
+            self.sut = self.store.sut
+        sut_input = getattr(self.sut, self.request_attr)
         self.store.messages.append(sut_input)
+        virtual_time = self.store.virtual_time
+        if virtual_time is None and self.store.config:
+            virtual_time = self.store.config.virtual_time
+        if virtual_time:
+            self.clock = self.store.clock = VirtualClock().__enter__()
         return self.store
 
     def __exit__(self, exc_type, exc_val, traceback):
-        response = exc_val if exc_val else getattr(self.store.sut, self.response_attr)
+        if self.clock:
+            self.clock.__exit__(exc_type, exc_val, traceback)
+        response = exc_val if exc_val else getattr(self.sut, self.response_attr)
         self.store.messages.append(response)
-        if len(self.store.messages) % 2 != 0:
+        self.store.messages.flush()
+        if self.store.messages.total % 2 != 0:
             raise exceptions.RecorderException(log_msg='failed to record even number of messages!')
-        self.store.check_no_uncalled_test_doubles()
+        self.store.flush_warnings()
+        if not self.store._bench:
+            self.store.check_no_uncalled_test_doubles()
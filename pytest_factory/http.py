@@ -1,13 +1,17 @@
-from typing import Optional, Callable, AnyStr
+import csv
+import json
+from pathlib import Path
+from typing import Optional, Callable, AnyStr, Iterable, Mapping, Any, List, Tuple, Dict
 
-from pytest_factory.framework.factory import make_factory
+from pytest_factory.framework.factory import make_factory, make_bulk_factory
 from pytest_factory.framework.base_types import Union, MAGIC_TYPE
 from pytest_factory.framework.http_types import MockHttpRequest, MockHttpResponse
 from pytest_factory.framework.exceptions import RequestNormalizationException
 
 
 def mock_http_server(response: MAGIC_TYPE[Union[Exception, AnyStr, MockHttpResponse]] = None,
-                     req_obj: Optional[MockHttpRequest] = None, **kwargs) -> Callable:
+                     req_obj: Optional[MockHttpRequest] = None, latency: Optional[float] = None,
+                     timeout_after: Optional[float] = None, **kwargs) -> Callable:
     """
     decorate your test method or class with this factory to generate test doubles for an HTTP depended-on
     component
@@ -25,7 +29,15 @@ def mock_http_server(response: MAGIC_TYPE[Union[Exception, AnyStr, MockHttpRespo
             request and response (like id of requested asset)
         - for raising Exceptions conditioned on content of the request
         - for more sophisticated behavior, consider creating a plugin instead
+    can also be a generator, iterator or async iterator of responses (e.g. for simulating a paginated feed), which will
+    be pulled from on demand; see TrackedResponses
     :param req_obj: MockHttpRequest if kwargs not provided
+    :param latency: seconds that each response takes to arrive; see MockHttpResponse.delay
+    :param timeout_after: if provided, the depended-on-component never answers and each call times out after this many
+        seconds; see MockHttpResponse.timeout_after
+    latency and timeout_after apply to str, bytes and MockHttpResponse responses (including those in a list); set them
+    on the MockHttpResponse returned by a callable or a lazy source instead. run the test in virtual time so that the
+    waits are simulated, see VirtualClock
     :param method: if req_obj not provided, HTTP method for creating MockHttpRequest
     :param path: if req_obj not provided, url path for creating MockHttpRequest
     :param kwargs: see help(MockHttpRequest.__init__) if not passing req_obj
@@ -35,8 +47,88 @@ def mock_http_server(response: MAGIC_TYPE[Union[Exception, AnyStr, MockHttpRespo
         expected_request = req_obj or MockHttpRequest(**kwargs)
     except Exception as ex:
         raise RequestNormalizationException(req_obj_cls=MockHttpRequest, ex=ex, **kwargs)
+    if latency is not None or timeout_after is not None:
+        response = _set_timing(response=response, latency=latency, timeout_after=timeout_after)
     if isinstance(response, str):
         response = response.encode()
     if isinstance(response, bytes):
         response = MockHttpResponse(body=response)
     return make_factory(req_obj=expected_request, response=response)
+
+
+def _set_timing(response: Any, latency: Optional[float], timeout_after: Optional[float]) -> Any:
+    if isinstance(response, list):
+        return [_set_timing(response=r, latency=latency, timeout_after=timeout_after) for r in response]
+    if response is None or isinstance(response, (str, bytes)):
+        response = MockHttpResponse(body=_to_bytes(response or b''))
+    if isinstance(response, MockHttpResponse):
+        kwargs = {k: v for k, v in response.kwargs.items() if k != '__class__'}
+        if latency is not None:
+            kwargs['delay'] = latency
+        if timeout_after is not None:
+            kwargs['timeout_after'] = timeout_after
+        return MockHttpResponse(**kwargs)
+    return response
+
+
+TABLE_SOURCE_TYPE = Union[str, Path, Iterable[Mapping[str, Any]]]
+
+
+def mock_http_server_table(source: TABLE_SOURCE_TYPE) -> Callable:
+    """
+    decorate your test method or class with this factory to generate many test doubles for HTTP depended-on
+    components in one pass, e.g. from a contract fixture generated from a partner API catalog
+
+    :param source: see read_http_table
+    :return: the test class or function being decorated
+    """
+    return make_bulk_factory(exchanges=read_http_table(source=source), factory_name=MockHttpRequest.FACTORY_NAME)
+
+
+def read_http_table(source: TABLE_SOURCE_TYPE) -> List[Tuple[MockHttpRequest, MockHttpResponse]]:
+    """
+    reads rows of HTTP exchanges as test doubles. if two rows have the same request signature, the first row wins
+
+    :param source: path to a .jsonl or .csv file, or an iterable of rows. each row is a mapping with the request
+        fields url (required), method, body and headers, and the response fields response (the body), status and
+        response_headers. in a .csv file, headers and response_headers must be json strings
+    :return: the test doubles as pairs of MockHttpRequest and MockHttpResponse
+    """
+    rows = _read_table_rows(Path(source)) if isinstance(source, (str, Path)) else source
+    exchanges: Dict[Any, Tuple[MockHttpRequest, MockHttpResponse]] = {}
+    for row in rows:
+        request_kwargs = {'url': row.get('url'), 'method': row.get('method') or 'get'}
+        if row.get('body'):
+            request_kwargs['body'] = _to_bytes(row['body'])
+        if row.get('headers'):
+            request_kwargs['headers'] = _to_dict(row['headers'])
+        try:
+            req_obj = MockHttpRequest(**request_kwargs)
+            signature = req_obj.signature
+        except Exception as ex:
+            raise RequestNormalizationException(req_obj_cls=MockHttpRequest, ex=ex, **request_kwargs)
+        if signature in exchanges:
+            continue
+        status = row.get('status')
+        response = MockHttpResponse(body=_to_bytes(row.get('response') or b''),
+                                    status=int(status) if status else None,
+                                    headers=_to_dict(row.get('response_headers')))
+        exchanges[signature] = (req_obj, response)
+    return list(exchanges.values())
+
+
+def _read_table_rows(path: Path) -> Iterable[Mapping[str, Any]]:
+    with open(path, newline='') as f:
+        if path.suffix == '.csv':
+            return list(csv.DictReader(f))
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _to_bytes(x: AnyStr) -> bytes:
+    return x if isinstance(x, bytes) else x.encode()
+
+
+def _to_dict(x: Optional[Union[str, Mapping[str, str]]]) -> Optional[Dict[str, str]]:
+    if not x:
+        return None
+    return json.loads(x) if isinstance(x, str) else dict(x)
@@ -0,0 +1,165 @@
+"""
+the schemas of the Messages in a Recording: for each class, by its import path, the type of each of its fields. both
+formats of Recording are decoded with them in one typed pass, rather than by guessing the type of each value from its
+string, and each class is imported once however many messages of it there are
+
+classes are registered by import path so that registering them does not import their packages, e.g. tornado
+"""
+from ast import literal_eval
+from enum import Enum
+from functools import lru_cache
+from importlib import import_module
+from json import JSONDecodeError, loads
+from typing import Any, Dict, Optional
+
+import pytest_factory.framework.base_types as types
+
+
+class FieldType(Enum):
+    STR = 'str'
+    BYTES = 'bytes'
+    CLASS = 'class'
+    JSON = 'json'
+
+
+def infer_type(s: Any):
+    """
+    :return: the value of a field that has no field type, guessed from the string Writable.serialize wrote for it
+    """
+    if type(s) in types.ALLOWED_TYPES and not isinstance(s, str):
+        return s
+    r = {
+        'None': None,
+        'True': True,
+        'False': False
+    }.get(s, Exception)
+    if r is not Exception:
+        return r
+    if len(s) > 2 and s[:2] in {'b"', "b'"}:
+        return s[2:-1].encode()
+    try:
+        d = loads(s)
+        return d
+    except JSONDecodeError as _:
+        try:
+            return float(s) if len(s.split('.')) == 2 else int(s)
+        except ValueError as _:
+            return s
+
+
+@lru_cache(maxsize=None)
+def resolve_class(path: str) -> type:
+    """
+    :return: the class at the import path; resolved once per path
+    """
+    module_name, _, name = path.rpartition('.')
+    if not module_name:
+        return getattr(import_module('builtins'), name)
+    return getattr(import_module(module_name), name)
+
+
+class Codec:
+    """
+    the field types of one class. fields that are not in the schema, e.g. the extra kwargs of a MockHttpRequest,
+    are decoded as they were before there were schemas
+    """
+    __slots__ = ('path', 'fields')
+
+    def __init__(self, path: str, fields: Optional[Dict[str, FieldType]] = None):
+        self.path = path
+        self.fields = fields or {}
+
+    @property
+    def cls(self) -> type:
+        return resolve_class(self.path)
+
+    def decode_legacy(self, kwargs: Dict[str, Any]) -> Any:
+        """
+        :param kwargs: the fields of an object as Writable.serialize wrote them, i.e. with bytes as "b'...'" strings,
+            classes as their import paths and anything else that JSON cannot hold as its str
+        :return: the object
+        """
+        fields = self.fields
+        typed_kwargs = {}
+        for k, v in kwargs.items():
+            field_type = fields.get(k)
+            if field_type is None:
+                typed_kwargs[k] = infer_type(v)
+            elif v is None or not isinstance(v, str) or field_type is FieldType.STR:
+                typed_kwargs[k] = v
+            elif field_type is FieldType.BYTES:
+                typed_kwargs[k] = v[2:-1].encode() if v[:2] in {'b"', "b'"} else v
+            elif field_type is FieldType.CLASS:
+                typed_kwargs[k] = resolve_class(v)
+            else:
+                typed_kwargs[k] = _decode_legacy_json(v)
+        return self.cls(**typed_kwargs)
+
+
+def _decode_legacy_json(s: str) -> Any:
+    """
+    :return: the value of a JSON field that Writable.serialize wrote as its str, e.g. a list or a dict-like object
+    """
+    try:
+        return loads(s)
+    except JSONDecodeError:
+        pass
+    try:
+        return literal_eval(s)
+    except (ValueError, SyntaxError):
+        return s
+
+
+CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(path: str, fields: Dict[str, FieldType]) -> Codec:
+    """
+    :param path: the import path of the class, e.g. 'pytest_factory.framework.http_types.MockHttpRequest'
+    :param fields: the type of each keyword argument of the class that it serializes
+    """
+    codec = CODECS[path] = Codec(path=path, fields=fields)
+    return codec
+
+
+def get_codec(path: str) -> Codec:
+    """
+    :return: the Codec registered for the class at path or, for any other class, e.g. an exception, one without
+        field types, which is kept so that the class is still resolved once
+    """
+    codec = CODECS.get(path)
+    if codec is None:
+        codec = CODECS[path] = Codec(path=path)
+    return codec
+
+
+_HTTP_REQUEST_FIELDS = {
+    'url': FieldType.STR,
+    'method': FieldType.STR,
+    'body': FieldType.BYTES,
+    'headers': FieldType.JSON,
+    'allow_redirects': FieldType.JSON,
+    'exchange_id': FieldType.STR,
+    'timestamp': FieldType.STR
+}
+
+register_codec('pytest_factory.framework.http_types.MockHttpRequest', _HTTP_REQUEST_FIELDS)
+register_codec('pytest_factory.framework.http_types.MockHttpResponse', {
+    'body': FieldType.BYTES,
+    'status': FieldType.JSON,
+    'headers': FieldType.JSON,
+    'exchange_id': FieldType.STR,
+    'timestamp': FieldType.STR,
+    'delay': FieldType.JSON,
+    'timeout_after': FieldType.JSON
+})
+register_codec('pytest_factory.monkeypatch.tornado.TornadoRequest',
+               {**_HTTP_REQUEST_FIELDS, 'sut_callable': FieldType.CLASS})
+register_codec('pytest_factory.framework.smtp_types.SMTPRequest', {
+    'from_addr': FieldType.STR,
+    'to_addrs': FieldType.JSON,
+    'host': FieldType.STR,
+    'exchange_id': FieldType.STR,
+    'timestamp': FieldType.STR
+})
+register_codec('pytest_factory.lifecycle.recording.LiveException', {})
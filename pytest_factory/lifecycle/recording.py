@@ -1,11 +1,17 @@
 from __future__ import annotations
-from json import loads, dumps, JSONDecodeError
-from importlib import import_module
+import re
+from json import loads, dumps
 from typing import Any, List, Optional, Union, Tuple
 from datetime import datetime
 
 import pytest_factory.framework.base_types as types
 from pytest_factory.framework.exceptions import RecorderException
+from pytest_factory.lifecycle import codecs, wire
+# infer_type moved to codecs; it is imported here as well for code that imported it from this module
+from pytest_factory.lifecycle.codecs import infer_type  # noqa: F401
+
+# "<class 'a.b.C'>", optionally followed by ": " and the kwargs of the object as json
+_SERIALIZED_CLASS = re.compile(r"<class '([\w.]+)'>(?:: (.*))?\Z", re.DOTALL)
 
 
 class LiveException(types.Writable, Exception):
@@ -16,52 +22,20 @@ class LiveException(types.Writable, Exception):
     pass
 
 
-def infer_type(s: Any):
-    if type(s) in types.ALLOWED_TYPES and not isinstance(s, str):
-        return s
-    r = {
-        'None': None,
-        'True': True,
-        'False': False
-    }.get(s, Exception)
-    if r is not Exception:
-        return r
-    if len(s) > 2 and s[:2] in {'b"', "b'"}:
-        return s[2:-1].encode()
-    try:
-        d = loads(s)
-        return d
-    except JSONDecodeError as _:
-        if len(s.split('.')) == 2:
-            return float(s)
-        try:
-            return int(s)
-        except ValueError as _:
-            return s
-
-
 def deserialize(path) -> types.BASE_RESPONSE_TYPE[types.Message]:
     """
-    deserialize object of unknown type from serialization
+    deserialize object of unknown type from serialization, i.e. from what Writable.serialize or str(<class>) returned
     """
-    if not isinstance(path, str) or path[:6] != '<class':
+    if not isinstance(path, str):
         return path
-    path_parts = path.split('\'')[1].split('.')
-    kwargs = None
-    if len(path.split(':')) > 1:
-        kwarg_str = ':'.join(path.split(':')[1:]).strip(' ')
-        kwargs = {k: infer_type(v) for k, v in loads(kwarg_str).items()}
-    if len(path_parts) > 1:
-        name = '.'.join(path_parts[0:-1])
-        module = import_module(name=name)
-        kallable = getattr(module, path_parts[-1])
-    elif len(path_parts) == 1:
-        kallable = __builtins__.get(path_parts[0])
-    else:
-        raise Exception
+    match = _SERIALIZED_CLASS.match(path)
+    if not match:
+        return path
+    codec = codecs.get_codec(match.group(1))
+    kwargs = loads(match.group(2)) if match.group(2) else None
     if kwargs:
-        return kallable(**kwargs)
-    return kallable
+        return codec.decode_legacy(kwargs)
+    return codec.cls
 
 
 class Recording(types.Message):
@@ -88,6 +62,26 @@ class Recording(types.Message):
 
     @classmethod
     def deserialize(cls, b_a: bytes) -> Recording:
+        """
+        :param b_a: a Recording serialized in the compact format or, as before it, in the legacy JSON format
+        """
+        if wire.is_compact(b_a):
+            return cls._deserialize_compact(b_a)
+        return cls._deserialize_legacy(b_a)
+
+    @classmethod
+    def _deserialize_compact(cls, b_a: bytes) -> Recording:
+        index, blobs = wire.decode(b_a)
+        recording = Recording(
+            incident_type=wire.decode_value(index['incident_type'], blobs),
+            sut_exchange=tuple(wire.decode_value(x, blobs) for x in index['sut_exchange']),
+            doc_exchanges=[tuple(wire.decode_value(x, blobs) for x in exchange) for exchange in index['doc_exchanges']]
+        )
+        recording.created_at = datetime.fromisoformat(index['created_at'])
+        return recording
+
+    @classmethod
+    def _deserialize_legacy(cls, b_a: bytes) -> Recording:
         r = loads(b_a.decode())
         incident_type_str = r['incident_type']
         incident_type = deserialize(incident_type_str)
@@ -127,7 +121,27 @@ class Recording(types.Message):
     def last(self) -> types.BASE_RESPONSE_TYPE[types.Message]:
         return self.sut_exchange[1]
 
-    def serialize(self) -> bytes:
+    def serialize(self, compression: Optional[str] = None, legacy: bool = False) -> bytes:
+        """
+        :param compression: 'gzip', 'lzma' or None; see pytest_factory.lifecycle.wire
+        :param legacy: if True, the JSON format of earlier versions of pytest-factory, which can only hold bodies that
+            are UTF-8 and cannot be compressed
+        :return: this Recording in the compact format of pytest_factory.lifecycle.wire. an incident_type that is an
+            Exception is serialized as its class, as it was in the legacy format
+        """
+        if legacy:
+            return self._serialize_legacy()
+        incident_type = self.incident_type if isinstance(self.incident_type, type) else type(self.incident_type)
+        encoder = wire.Encoder()
+        index = {
+            'incident_type': encoder.encode(incident_type),
+            'sut_exchange': [encoder.encode(x) for x in self.sut_exchange],
+            'doc_exchanges': [[encoder.encode(x) for x in exchange] for exchange in self.doc_exchanges],
+            'created_at': self.created_at.isoformat()
+        }
+        return wire.encode(index=index, blobs=encoder.blobs, compression=compression)
+
+    def _serialize_legacy(self) -> bytes:
         sut_exchange = self.sut_exchange
         if self.raises:
             sut_exchange = (sut_exchange[0].serialize(), str(sut_exchange[1]))
@@ -0,0 +1,171 @@
+"""
+the compact wire format of a Recording (version 2; version 1 is the JSON of Recording.serialize(legacy=True)):
+
+    b'PFR' | version: 1 byte | compression: 1 byte | body, compressed as the compression byte says
+
+    body = index length: 4 bytes, big-endian | index: utf-8 JSON | blobs: raw bytes
+
+the index holds the incident type and the exchanges. each message in it is {"c": class, "f": fields}, where the
+fields that are bytes are in "b" as [offset, length] into the blobs rather than in "f", so that bodies keep their
+exact bytes and are neither escaped nor re-encoded, and the fields that are classes are in "t" as their import paths.
+anything that is not a message is {"x": class}, {"e": exception class, "a": args}, {"b": [offset, length]} or
+{"v": JSON value}. bytes nested in a field, e.g. in a dict, are {"$b64": base64}
+"""
+import gzip
+import lzma
+import struct
+from base64 import b64decode, b64encode
+from collections.abc import Mapping
+from functools import lru_cache
+from json import dumps, loads
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest_factory.framework.base_types as types
+from pytest_factory.framework.exceptions import RecorderException
+from pytest_factory.lifecycle.codecs import get_codec
+
+MAGIC = b'PFR'
+VERSION = 2
+
+COMPRESSIONS = {None: 0, 'gzip': 1, 'lzma': 2}
+_COMPRESS = {1: gzip.compress, 2: lzma.compress}
+_DECOMPRESS = {1: gzip.decompress, 2: lzma.decompress}
+
+_INDEX_LENGTH = struct.Struct('>I')
+_JSON_TYPES = (str, int, float, bool, type(None), list, tuple, dict)
+_BYTES_TYPES = {bytes, bytearray}
+_SKIPPED_FIELDS = {'__class__', 'kwargs'}
+
+
+def is_compact(b_a: bytes) -> bool:
+    return b_a[:len(MAGIC)] == MAGIC
+
+
+@lru_cache(maxsize=None)
+def get_class_path(kallable: type) -> str:
+    return f'{kallable.__module__}.{kallable.__qualname__}'
+
+
+class Encoder:
+    def __init__(self):
+        self.blobs: List[bytes] = []
+        self.size = 0
+
+    def blob(self, b: bytes) -> List[int]:
+        size = len(b)
+        ref = [self.size, size]
+        self.blobs.append(b)
+        self.size += size
+        return ref
+
+    def encode(self, x: Any) -> Dict[str, Any]:
+        if isinstance(x, types.Writable):
+            return self.encode_message(x)
+        if isinstance(x, type):
+            return {'x': get_class_path(x)}
+        if isinstance(x, BaseException):
+            return {'e': get_class_path(type(x)), 'a': [a if isinstance(a, _JSON_TYPES) else str(a) for a in x.args]}
+        if type(x) in _BYTES_TYPES:
+            return {'b': self.blob(bytes(x))}
+        return {'v': x if isinstance(x, _JSON_TYPES) else str(x)}
+
+    def encode_message(self, message: types.Writable) -> Dict[str, Any]:
+        encoded: Dict[str, Any] = {'c': get_class_path(type(message))}
+        fields, blobs, classes = {}, {}, {}
+        kwargs = message.kwargs if hasattr(message, 'kwargs') else vars(message)
+        for k, v in kwargs.items():
+            if k in _SKIPPED_FIELDS or v is message:
+                continue
+            # by exact type first, since most fields are of the JSON types
+            t = type(v)
+            if t in _BYTES_TYPES:
+                blobs[k] = self.blob(bytes(v))
+            elif t in _JSON_TYPES:
+                fields[k] = v
+            elif isinstance(v, type):
+                classes[k] = get_class_path(v)
+            elif isinstance(v, Mapping):
+                fields[k] = dict(v)
+            else:
+                fields[k] = v
+        encoded['f'] = fields
+        if blobs:
+            encoded['b'] = blobs
+        if classes:
+            encoded['t'] = classes
+        return encoded
+
+
+def _default(x: Any) -> Any:
+    if isinstance(x, (bytes, bytearray)):
+        return {'$b64': b64encode(x).decode('ascii')}
+    if isinstance(x, Mapping):
+        return dict(x)
+    return str(x)
+
+
+def _object_hook(d: Dict[str, Any]) -> Any:
+    if len(d) == 1 and '$b64' in d:
+        return b64decode(d['$b64'])
+    return d
+
+
+def encode(index: Dict[str, Any], blobs: List[bytes], compression: Optional[str] = None) -> bytes:
+    if compression not in COMPRESSIONS:
+        raise RecorderException(log_msg=f'compression must be one of {sorted(filter(None, COMPRESSIONS))} or None! '
+                                        f'got: {compression}')
+    index_bytes = dumps(index, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+    body = b''.join([_INDEX_LENGTH.pack(len(index_bytes)), index_bytes, *blobs])
+    compression_id = COMPRESSIONS[compression]
+    if compression_id:
+        body = _COMPRESS[compression_id](body)
+    return MAGIC + bytes([VERSION, compression_id]) + body
+
+
+def decode(b_a: bytes) -> Tuple[Dict[str, Any], memoryview]:
+    """
+    :return: the index and the blobs of a Recording in the compact format
+    """
+    if not is_compact(b_a) or len(b_a) < len(MAGIC) + 2:
+        raise RecorderException(log_msg='not a Recording in the compact format!')
+    version, compression_id = b_a[len(MAGIC)], b_a[len(MAGIC) + 1]
+    if version != VERSION:
+        raise RecorderException(log_msg=f'cannot read version {version} of the Recording format; '
+                                        f'this version of pytest-factory reads version {VERSION}')
+    if compression_id not in _DECOMPRESS and compression_id != 0:
+        raise RecorderException(log_msg=f'unknown compression of Recording: {compression_id}')
+    body = b_a[len(MAGIC) + 2:]
+    if compression_id:
+        body = _DECOMPRESS[compression_id](body)
+    (index_length,) = _INDEX_LENGTH.unpack_from(body)
+    start = _INDEX_LENGTH.size
+    index = loads(bytes(body[start:start + index_length]).decode(), object_hook=_object_hook)
+    return index, memoryview(body)[start + index_length:]
+
+
+def decode_value(encoded: Dict[str, Any], blobs: memoryview) -> Any:
+    if 'c' in encoded:
+        return decode_message(encoded, blobs)
+    if 'x' in encoded:
+        return get_codec(encoded['x']).cls
+    if 'e' in encoded:
+        return get_codec(encoded['e']).cls(*encoded['a'])
+    if 'b' in encoded:
+        return _slice(blobs, encoded['b'])
+    return encoded['v']
+
+
+def decode_message(encoded: Dict[str, Any], blobs: memoryview) -> Any:
+    kwargs = encoded['f']
+    if 'b' in encoded:
+        for k, ref in encoded['b'].items():
+            kwargs[k] = _slice(blobs, ref)
+    if 't' in encoded:
+        for k, path in encoded['t'].items():
+            kwargs[k] = get_codec(path).cls
+    return get_codec(encoded['c']).cls(**kwargs)
+
+
+def _slice(blobs: memoryview, ref: List[int]) -> bytes:
+    offset, length = ref
+    return bytes(blobs[offset:offset + length])
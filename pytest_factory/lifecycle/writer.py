@@ -1,8 +1,6 @@
 import re
 from pathlib import Path
-
-from black import format_str, FileMode
-from jinja2 import Template
+from typing import Optional
 
 from pytest_factory.framework.mall import MALL
 from pytest_factory.lifecycle.recording import Recording
@@ -23,12 +21,19 @@ class Writer:
         sut_callable = recording.first.sut_callable
         self.handler_path, self.handler_name = sut_callable.__module__, sut_callable.__name__
 
-    def write_test(self, output_path: Path):
+    def write_test(self, output_path: Path, data_path: Optional[Path] = None):
         """
         writes a test module that reproduces the recorded session
+
+        :param output_path: the path of the test module
+        :param data_path: the path of the file the response of the system-under-test is written to, unless it raised;
+            test_factory_tests/actual_response next to config.ini if not given
         """
+        # black and jinja2 are slow to import and only needed here
+        from black import format_str, FileMode
+        from jinja2 import Template
 
-        new_data_path = MALL.get_full_path("test_factory_tests/actual_response")
+        new_data_path = data_path or MALL.get_full_path("test_factory_tests/actual_response")
         template_path = get_package_path("template.py.jinja")
         with open(output_path, "w") as test_file:
             with open(template_path) as template_file:
@@ -48,7 +53,7 @@ class Writer:
                     'status',
                     'body'
                 },
-                'assert_reproduction_as_success': MALL.assert_reproduction_as_success
+                'assert_reproduction_as_success': MALL.config.assert_reproduction_as_success
             }
 
             test_module_str = template.render(**inputs)
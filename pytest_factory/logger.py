@@ -1,5 +1,8 @@
 import logging
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import List, Optional
 
 from pythonjsonlogger import jsonlogger
 
@@ -26,8 +29,73 @@ def get_python_version():
         raise Exception('Python 3 only')
 
 
+# every logger from get_logger shares one JSON handler; while queue logging is on, they share one QueueHandler instead
+_stream_handler: Optional[logging.Handler] = None
+_queue_handler: Optional[QueueHandler] = None
+_queue_listener: Optional[QueueListener] = None
+_loggers: List[logging.Logger] = []
+
+
+def get_stream_handler(version: int = get_python_version()) -> logging.Handler:
+    """
+    :return: the JSON StreamHandler shared by every logger from get_logger, created on first use
+    """
+    global _stream_handler
+    if _stream_handler is None:
+        _stream_handler = logging.StreamHandler()
+        if version >= 8:
+            formatter = CustomJsonFormatter(
+                "asctime;levelname;message;filename;lineno", validate=False
+            )
+        else:
+            formatter = CustomJsonFormatter("asctime;levelname;message;filename;lineno")
+        _stream_handler.setFormatter(formatter)
+    return _stream_handler
+
+
+def _get_handler(version: int = get_python_version()) -> logging.Handler:
+    return _queue_handler or get_stream_handler(version=version)
+
+
+def _swap_handlers(old: logging.Handler, new: logging.Handler):
+    for logger in _loggers:
+        if old in logger.handlers:
+            logger.removeHandler(old)
+        if new not in logger.handlers:
+            logger.addHandler(new)
+
+
+def start_queue_logging():
+    """
+    hands the records of every logger from get_logger to a QueueListener, so that JSON formatting and writing to the
+    stream happen on the listener's thread rather than in the test. handlers that propagation reaches, e.g. pytest's
+    caplog, still receive every record right away
+    """
+    global _queue_handler, _queue_listener
+    if _queue_listener is not None:
+        return
+    queue = SimpleQueue()
+    _queue_handler = QueueHandler(queue)
+    _queue_listener = QueueListener(queue, get_stream_handler())
+    _queue_listener.start()
+    _swap_handlers(old=get_stream_handler(), new=_queue_handler)
+
+
+def stop_queue_logging():
+    """
+    writes every queued record and goes back to writing records in the thread that logs them
+    """
+    global _queue_handler, _queue_listener
+    if _queue_listener is None:
+        return
+    _queue_listener.stop()
+    _swap_handlers(old=_queue_handler, new=get_stream_handler())
+    _queue_handler = _queue_listener = None
+
+
 def get_logger(name, level=logging.DEBUG, version=get_python_version()):
-    """Sets up a json logger.
+    """Sets up a json logger. every logger shares one handler, so calling this again for the same name does not
+    write each record twice.
 
     Parameters
     ----------
@@ -51,14 +119,10 @@ def get_logger(name, level=logging.DEBUG, version=get_python_version()):
     logger = logging.getLogger(name)
     logger.setLevel(level=level)
 
-    log_handler = logging.StreamHandler()
-    if version >= 8:
-        formatter = CustomJsonFormatter(
-            "asctime;levelname;message;filename;lineno", validate=False
-        )
-    elif version == 7:
-        formatter = CustomJsonFormatter("asctime;levelname;message;filename;lineno")
-    log_handler.setFormatter(formatter)
-    logger.addHandler(log_handler)
+    log_handler = _get_handler(version=version)
+    if log_handler not in logger.handlers:
+        logger.addHandler(log_handler)
+    if logger not in _loggers:
+        _loggers.append(logger)
     logger.propagate = True
     return logger
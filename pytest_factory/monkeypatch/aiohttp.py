@@ -1,10 +1,12 @@
 import json
+from typing import Any, Callable, Coroutine, Generator, Optional
 
-from aiohttp import ClientSession, ClientResponse
+from aiohttp import ClientSession, ClientResponse, ClientTimeout, ServerTimeoutError
 
 from pytest_factory.monkeypatch.utils import update_monkey_patch_configs, get_generic_caller
 from pytest_factory.framework.exceptions import TypeTestDoubleException
 from pytest_factory.http import MockHttpRequest, MockHttpResponse
+from pytest_factory.framework.http_types import HTTP_METHODS
 from pytest_factory.framework.base_types import ANY_MOCK_RESPONSE
 
 
@@ -18,10 +20,31 @@ class MockClientResponse(ClientResponse):
 
 def _request_callable(*_, **kwargs) -> MockHttpRequest:
     qwargs = {k: v for k, v in kwargs.items() if k in {'url', 'method', 'headers'}}
+    qwargs['url'] = str(qwargs['url'])
+    if 'method' in qwargs:
+        qwargs['method'] = qwargs['method'].lower()
     mhr = MockHttpRequest(**qwargs)
     return mhr
 
 
+def _timeout_callable(*_, timeout: Any = None, **__) -> Optional[float]:
+    """
+    :return: the shortest of the total and read timeouts that the caller set; aiohttp takes a ClientTimeout or a number
+    """
+    if isinstance(timeout, ClientTimeout):
+        timeouts = [t for t in (timeout.total, timeout.sock_read) if t]
+        return min(timeouts) if timeouts else None
+    return timeout
+
+
+def _timeout_exception(req_obj: MockHttpRequest, seconds: float) -> ServerTimeoutError:
+    """
+    ServerTimeoutError is both an aiohttp.ClientError and an asyncio.TimeoutError, so the system-under-test can catch
+    either
+    """
+    return ServerTimeoutError(f'{req_obj.url} did not respond in {seconds} seconds')
+
+
 MOCK_RESP_TYPE = ANY_MOCK_RESPONSE[ClientResponse]
 
 
@@ -59,12 +82,51 @@ def _response_callable(*_, mock_response: MOCK_RESP_TYPE, **kwargs) -> ClientRes
     return response
 
 
-new_method = get_generic_caller(method_name='request',
-                                request_callable=_request_callable,
-                                response_callable=_response_callable)
+class MockRequestContextManager:
+    """
+    like the object returned by ClientSession.request, this can be awaited for the response or used as an async
+    context manager
+    """
+    __slots__ = ('_coro', '_response')
+
+    def __init__(self, coro: Coroutine[Any, Any, ClientResponse]):
+        self._coro = coro
+        self._response: Optional[ClientResponse] = None
+
+    def __await__(self) -> Generator[Any, None, ClientResponse]:
+        return self._coro.__await__()
+
+    async def __aenter__(self) -> ClientResponse:
+        self._response = await self._coro
+        return await self._response.__aenter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._response.__aexit__(exc_type, exc_val, exc_tb)
+
+
+_async_caller = get_generic_caller(request_callable=_request_callable,
+                                   response_callable=_response_callable,
+                                   is_async=True,
+                                   timeout_callable=_timeout_callable,
+                                   timeout_exception=_timeout_exception)
+
+
+def request(self: ClientSession, method: str, url: str, **kwargs) -> MockRequestContextManager:
+    kwargs.setdefault('timeout', self.timeout)
+    return MockRequestContextManager(_async_caller(method=method, url=url, **kwargs))
+
+
+def _get_verb(method: str) -> Callable:
+    def verb(self: ClientSession, url: str, **kwargs) -> MockRequestContextManager:
+        return request(self, method=method, url=url, **kwargs)
+
+    verb.__name__ = method
+    return verb
+
 
 patch_members = {
-    'request': new_method
+    'request': request,
+    **{method.value: _get_verb(method.value) for method in HTTP_METHODS}
 }
 
 update_monkey_patch_configs(callable_obj=ClientSession, patch_members=patch_members)
@@ -5,7 +5,7 @@ in store
 import requests
 from requests.structures import CaseInsensitiveDict
 import json
-from typing import Union
+from typing import Optional, Union
 
 from pytest_factory.framework.http_types import HTTP_METHODS
 from pytest_factory.http import MockHttpRequest, MockHttpResponse
@@ -66,6 +66,19 @@ def _request_callable(method_name: str, *args, **kwargs) -> MockHttpRequest:
     return req_obj
 
 
+def _timeout_callable(*_, **kwargs) -> Optional[float]:
+    """
+    :return: the read timeout that the caller set, which bounds how long it waits for the response; requests takes
+        either one timeout or a (connect, read) tuple
+    """
+    timeout = kwargs.get('timeout')
+    return timeout[1] if isinstance(timeout, tuple) else timeout
+
+
+def _timeout_exception(req_obj: MockHttpRequest, seconds: float) -> requests.Timeout:
+    return requests.ReadTimeout(f'{req_obj.url} did not respond in {seconds} seconds')
+
+
 MOCK_RESP_TYPE = Union[None, requests.Response, bytes, str, dict, Exception]
 
 
@@ -102,7 +115,9 @@ new_methods = {}
 for method in HTTP_METHODS:
     new_method = get_generic_caller(method_name=method.value,
                                     request_callable=_request_callable,
-                                    response_callable=_response_callable)
+                                    response_callable=_response_callable,
+                                    timeout_callable=_timeout_callable,
+                                    timeout_exception=_timeout_exception)
 
     new_methods[method.value] = new_method
 
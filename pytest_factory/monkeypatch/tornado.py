@@ -1,6 +1,6 @@
 import inspect
 import json
-from typing import Callable, Optional, Union, Any
+from typing import Callable, Optional, Union, Any, Dict, List
 
 import requests
 from tornado.web import Application, RequestHandler
@@ -24,10 +24,64 @@ def connection(): pass
 setattr(connection, 'set_close_callback', lambda _: None)
 
 
+# the most recycled handlers kept per sut_callable; more are left to the garbage collector
+MAX_POOLED_HANDLERS = 8
+
+_APPLICATIONS: Dict[Callable, Application] = {}
+_HANDLER_POOL: Dict[Callable, List[RequestHandler]] = {}
+
+
+def get_application(sut_callable: Callable) -> Application:
+    """
+    :return: the Application shared by every handler made from sut_callable
+    """
+    application = _APPLICATIONS.get(sut_callable)
+    if application is None:
+        application = _APPLICATIONS[sut_callable] = Application()
+    return application
+
+
 def constructor(req_obj: MockHttpRequest, sut_callable: Callable) -> RequestHandler:
+    """
+    makes the handler for a test, reusing a recycled handler of the same sut_callable if there is one
+    """
     request = HTTPServerRequest(method=req_obj.method, uri=req_obj.url, body=req_obj.body, headers=req_obj.headers)
     request.connection = connection
-    return sut_callable(application=Application(), request=request)
+    application = get_application(sut_callable)
+    pool = _HANDLER_POOL.get(sut_callable)
+    if pool:
+        handler = pool.pop()
+        handler.__init__(application=application, request=request)
+        return handler
+    return sut_callable(application=application, request=request)
+
+
+def recycler(sut: RequestHandler, sut_callable: Callable):
+    """
+    resets a handler whose test is done and pools it for the next test of the same sut_callable, up to
+    MAX_POOLED_HANDLERS of them
+
+    the reset clears the __dict__ of the handler, i.e. every attribute set on the instance, and constructor then runs
+    __init__ (and so initialize) on it again. nothing else is reset: state kept in class attributes, in __slots__ or in
+    the shared Application survives. a handler class with such state can define reset(), which is called before the
+    __dict__ is cleared; if it returns False, or the handler has no __dict__, the handler is not pooled
+    """
+    pool = _HANDLER_POOL.setdefault(sut_callable, [])
+    if len(pool) >= MAX_POOLED_HANDLERS or not hasattr(sut, '__dict__'):
+        return
+    reset = getattr(sut, 'reset', None)
+    if reset is not None and reset() is False:
+        return
+    vars(sut).clear()
+    pool.append(sut)
+
+
+def clear():
+    """
+    drops the Applications and the pooled handlers, so that the next session starts over
+    """
+    _APPLICATIONS.clear()
+    _HANDLER_POOL.clear()
 
 
 def read_from_write_buffer(buffer) -> Optional[bytes]:
@@ -54,7 +108,7 @@ class TornadoRequest(MockHttpRequest):
         :param kwargs: additional properties of an HTTP request e.g. headers, body, etc.
         """
         if sut_callable is None:
-            sut_callable = MALL.sut_callable
+            sut_callable = MALL.config.sut_callable
         self.sut_callable = import_from_str_path(sut_callable) if isinstance(sut_callable, str) else sut_callable
         qwargs = {
             'method': method,
@@ -98,7 +152,8 @@ class TornadoMonkeyPatches(RequestHandler):
 
     async def run_test(self, assert_no_missing_calls: bool = None,
                        assert_no_extra_calls: bool = None,
-                       response_parser: Optional[Callable] = None) -> Union[Any, requests.Response]:
+                       response_parser: Optional[Callable] = None,
+                       virtual_time: bool = None) -> Union[Any, requests.Response]:
         """
         this method will be bound to the RequestHandler, which is why it must receive the parameter 'self',
         and provides a way to advance the state of the RequestHandler while returning the response to the
@@ -112,11 +167,16 @@ class TornadoMonkeyPatches(RequestHandler):
         a test double more times than it has responses; will issue warnings instead via logger
         :param response_parser: a function that receives a requests.Response object and parses it for the data that the test
         needs to make an assertion against (e.g. some data within the Response.content)
+        :param virtual_time: if set to True, the handler runs with store.clock, a VirtualClock, so that sleeping, the
+        timers of the IOLoop and the latency and timeouts of test doubles do not wait in real time; see VirtualClock
+        for what it patches. this can also be set in config.ini by setting virtual_time to true
         :return:
         """
         store = MALL.get_store()
         with store.shop(assert_no_extra_calls=assert_no_extra_calls,
                         assert_no_missing_calls=assert_no_missing_calls,
+                        virtual_time=virtual_time,
+                        sut=self,
                         request_attr='request',
                         response_attr='_response') as _:
             method_name = self.request.method.lower()
@@ -145,4 +205,4 @@ patch_members = {'run_test': TornadoMonkeyPatches.run_test,
                  'finish': TornadoMonkeyPatches.finish,
                  '_transforms': []}
 update_monkey_patch_configs(callable_obj=RequestHandler, patch_members=patch_members,
-                            constructor=constructor)
+                            constructor=constructor, recycler=recycler, clear=clear)
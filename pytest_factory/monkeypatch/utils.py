@@ -1,10 +1,29 @@
-from typing import Callable, Dict, Optional, Any
+import asyncio
+import time
+from typing import Callable, Dict, Optional, Any, Tuple
 
+from pytest_factory.framework.base_types import BaseMockRequest
 from pytest_factory.framework.mall import MALL
+from pytest_factory.framework.store import Store
+
+
+def get_wait(mock_response: Any, timeout: Optional[float] = None) -> Tuple[float, bool]:
+    """
+    :param mock_response: the test double for the response, see MockHttpResponse.delay and timeout_after
+    :param timeout: the seconds that the system-under-test is willing to wait for the response, if it set any
+    :return: the seconds that the adapter waits before it responds, and whether it then raises a timeout error instead
+    """
+    timeout_after = getattr(mock_response, 'timeout_after', None)
+    wait = timeout_after if timeout_after is not None else getattr(mock_response, 'delay', None) or 0
+    if timeout is not None and timeout < wait:
+        return timeout, True
+    return wait, timeout_after is not None
 
 
 def get_generic_caller(request_callable: Callable, method_name: Optional[str] = None,
-                       response_callable: Optional[Callable] = None, is_async=False) -> Callable:
+                       response_callable: Optional[Callable] = None, is_async=False,
+                       timeout_callable: Optional[Callable[..., Optional[float]]] = None,
+                       timeout_exception: Optional[Callable[[BaseMockRequest, float], Exception]] = None) -> Callable:
     """
     this method will redefine the method with method_name in the module being
     monkeypatched while including in the new method the name of test function
@@ -20,21 +39,44 @@ def get_generic_caller(request_callable: Callable, method_name: Optional[str] =
     :param response_callable: class of the response object or function that
         will return one
     :param is_async: must set to True if the monkeypatched method is async
+    :param timeout_callable: function that takes the arguments of the monkeypatched method and returns the timeout in
+        seconds that the caller set, if any
+    :param timeout_exception: function that takes the request object and the seconds waited and returns the exception
+        that the monkeypatched method raises when the request times out; defaults to TimeoutError
+    the caller waits out the delay of each response that has one (time.sleep, or asyncio.sleep if is_async), so that in
+    virtual time the wait is simulated, see VirtualClock
     :return: the method that will replace the old one in the module being
         monkeypatched
     """
 
-    def generic_caller(*args, **kwargs) -> Any:
-        """
-        this method replaces method_name in the module being monkeypatched
-        """
+    def get_mock_response(*args, **kwargs) -> Tuple[Store, BaseMockRequest, Any]:
         if method_name:
             kwargs['method_name'] = method_name
 
         req_obj = request_callable(*args, **kwargs)
         store = MALL.get_store()
         mock_response = store.get_next_response(factory_name=req_obj.FACTORY_NAME, req_obj=req_obj)
+        return store, req_obj, mock_response
+
+    async def aget_mock_response(*args, **kwargs) -> Tuple[Store, BaseMockRequest, Any]:
+        if method_name:
+            kwargs['method_name'] = method_name
+
+        req_obj = request_callable(*args, **kwargs)
+        store = MALL.get_store()
+        mock_response = await store.aget_next_response(factory_name=req_obj.FACTORY_NAME, req_obj=req_obj)
+        return store, req_obj, mock_response
+
+    def get_timeout_wait(req_obj: BaseMockRequest, mock_response: Any, *args, **kwargs) -> Tuple[float, Any]:
+        timeout = timeout_callable(*args, **kwargs) if timeout_callable else None
+        wait, timed_out = get_wait(mock_response=mock_response, timeout=timeout)
+        if not timed_out:
+            return wait, None
+        if timeout_exception:
+            return wait, timeout_exception(req_obj, wait)
+        return wait, TimeoutError(f'no response to {req_obj} after {wait} seconds')
 
+    def respond(store: Store, req_obj: BaseMockRequest, mock_response: Any, *args, **kwargs) -> Any:
         if isinstance(mock_response, Exception):
             raise mock_response
 
@@ -43,9 +85,32 @@ def get_generic_caller(request_callable: Callable, method_name: Optional[str] =
         store.messages.extend([req_obj, mock_response])
         return mock_response
 
+    def generic_caller(*args, **kwargs) -> Any:
+        """
+        this method replaces method_name in the module being monkeypatched
+        """
+        store, req_obj, mock_response = get_mock_response(*args, **kwargs)
+        wait, timeout_ex = get_timeout_wait(req_obj, mock_response, *args, **kwargs)
+        if wait:
+            time.sleep(wait)
+        if timeout_ex:
+            raise timeout_ex
+        return respond(store, req_obj, mock_response, *args, **kwargs)
+
     if is_async:
         async def async_generic_caller(*args, **kwargs) -> Any:
-            return generic_caller(*args, **kwargs)
+            """
+            the test double is dequeued when the request is made, and the response is only returned after its delay,
+            so that concurrent requests are in flight at the same time like they would be against the real
+            depended-on-component. responses that are an async iterator are awaited, see Store.aget_next_response
+            """
+            store, req_obj, mock_response = await aget_mock_response(*args, **kwargs)
+            wait, timeout_ex = get_timeout_wait(req_obj, mock_response, *args, **kwargs)
+            if wait:
+                await asyncio.sleep(wait)
+            if timeout_ex:
+                raise timeout_ex
+            return respond(store, req_obj, mock_response, *args, **kwargs)
 
         return async_generic_caller
     else:
@@ -55,7 +120,9 @@ def get_generic_caller(request_callable: Callable, method_name: Optional[str] =
 
 def update_monkey_patch_configs(callable_obj: Any,
                                 patch_members: Dict[str, Any],
-                                constructor: Optional[Callable] = None):
+                                constructor: Optional[Callable] = None,
+                                recycler: Optional[Callable] = None,
+                                clear: Optional[Callable] = None):
     """
     Call this method at the bottom of your non HQ mock module to set up the fixtures.
     :param callable_obj: class or module that will have its method monkeypatched
@@ -63,6 +130,11 @@ def update_monkey_patch_configs(callable_obj: Any,
         and the values are the replacement member
     :param constructor: method that returns a new callable_obj if callable_obj is a class and not a module and
     the resulting object is a test double needed for this test suite
+    :param recycler: method that takes back an object made by constructor once its test is done, so that constructor
+    can reuse it; only used if recycle_sut is set to true in config.ini
+    :param clear: method that drops whatever constructor and recycler keep between tests; called at the end of the
+    pytest session
     :return:
     """
-    MALL.load_monkeypatch_configs(callable_obj=callable_obj, patch_members=patch_members, constructor=constructor)
+    MALL.load_monkeypatch_configs(callable_obj=callable_obj, patch_members=patch_members, constructor=constructor,
+                                  recycler=recycler, clear=clear)
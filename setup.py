@@ -44,4 +44,9 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     python_requires='>=3.7',
+    entry_points={
+        # the name is the import path, so that a conftest.py that also lists it in pytest_plugins does not register
+        # the plugin twice
+        "pytest11": ["pytest_factory.framework.pytest = pytest_factory.framework.pytest"],
+    },
 )
@@ -0,0 +1,25 @@
+import json
+
+from benchmarks.run import BenchmarkResult, compare, main, run, to_json
+
+
+def test_run_workload():
+    results = run(names=['tracked_responses'], max_size=10, repeat=1)
+    assert [result.key for result in results] == ['tracked_responses[10]']
+    assert results[0].seconds > 0 and results[0].relative > 0
+
+
+def test_compare_with_baseline(tmp_path):
+    baseline = to_json([BenchmarkResult(name='compare', size=10, seconds=1.0, relative=1.0),
+                        BenchmarkResult(name='compare', size=1000, seconds=1.0, relative=1.0)])
+    results = [BenchmarkResult(name='compare', size=10, seconds=1.0, relative=1.2),
+               BenchmarkResult(name='compare', size=1000, seconds=1.0, relative=1.3),
+               BenchmarkResult(name='compare', size=100000, seconds=1.0, relative=9.0)]
+    regressions = compare(results, baseline=baseline, threshold=0.25)
+    assert [regression.key for regression in regressions] == ['compare[1000]']
+
+    path = tmp_path.joinpath('baseline.json')
+    with open(path, 'w') as f:
+        json.dump({'tracked_responses[10]': {'seconds': 1.0, 'relative': 1e-9}}, f)
+    assert main(['-k', 'tracked_responses', '--max-size', '10', '--repeat', '1', '--compare', '--retries', '0',
+                 '--baseline', str(path)]) == 1
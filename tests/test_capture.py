@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+from pytest_factory.framework.capture import MessageLog
+from pytest_factory.framework.exceptions import ConfigException
+from pytest_factory.framework.http_types import MockHttpRequest, MockHttpResponse
+
+
+def get_exchanges(n: int):
+    for i in range(n):
+        yield MockHttpRequest(url=f'http://www.test.com/endpoint{i}')
+        yield MockHttpResponse(body=str(i).encode())
+
+
+def test_off():
+    messages = MessageLog(mode='off')
+    messages.extend(get_exchanges(3))
+    assert messages.total == 6
+    assert len(messages) == 0
+
+
+def test_counts():
+    messages = MessageLog(mode='counts')
+    messages.extend(get_exchanges(3))
+    assert messages.counts == {'MockHttpRequest': 3, 'MockHttpResponse': 3}
+    assert len(messages) == 0
+
+
+def test_ring():
+    messages = MessageLog(mode='ring', size=2)
+    messages.extend(get_exchanges(3))
+    assert messages.total == 6
+    assert [message.url if i == 0 else message.body for i, message in enumerate(messages)] == \
+           ['http://www.test.com/endpoint2', b'2']
+
+
+def test_ring_requires_size():
+    with pytest.raises(ConfigException):
+        MessageLog(mode='ring')
+
+
+def test_full_spill():
+    """
+    the input of the system-under-test is spilled on its own line, then one exchange per line, as the Shopper and the
+    monkeypatch adapters append them
+    """
+    messages = MessageLog(mode='full', size=2)
+    messages.append(MockHttpRequest(url='http://www.test.com/sut'))
+    for req_obj, response in zip(*[iter(get_exchanges(3))] * 2):
+        messages.extend([req_obj, response])
+    messages.append(MockHttpResponse(body=b'sut'))
+    messages.close()
+    assert messages.total == 8
+    # at least the last size messages are kept, without splitting an exchange
+    assert len(messages) == 3
+    assert messages[0].url == 'http://www.test.com/endpoint2'
+    assert [message.body for message in messages[1:]] == [b'2', b'sut']
+    with open(messages.spill_path) as f:
+        spilled = [json.loads(line) for line in f]
+    assert len(spilled) == 3
+    assert len(spilled[0]) == 1 and 'sut' in spilled[0][0]
+    for i, exchange in enumerate(spilled[1:]):
+        assert len(exchange) == 2
+        assert f'endpoint{i}' in exchange[0]
+        assert 'MockHttpResponse' in exchange[1] and f'"body": "b\'{i}\'"' in exchange[1]
+    spill_path = messages.spill_path
+    messages.close(delete=True)
+    assert messages.spill_path is None
+    assert not os.path.exists(spill_path)
+
+
+def test_slice():
+    messages = MessageLog()
+    messages.extend(get_exchanges(2))
+    assert [message.body for message in messages[1::2]] == [b'0', b'1']
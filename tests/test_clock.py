@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+from tornado import gen
+
+from pytest_factory.framework.clock import VirtualClock
+from pytest_factory.framework.exceptions import VirtualClockException
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_concurrent_sleeps_overlap():
+    with VirtualClock() as clock:
+        start = time.monotonic()
+        assert await asyncio.gather(asyncio.sleep(30, 'a'), asyncio.sleep(60, 'b')) == ['a', 'b']
+        assert time.monotonic() - start == pytest.approx(60, abs=0.1)
+    assert clock.elapsed == pytest.approx(60, abs=0.1)
+
+
+async def test_sleep_blocks():
+    with VirtualClock() as clock:
+        time.sleep(5)
+        await asyncio.sleep(5)
+    assert clock.elapsed == pytest.approx(10, abs=0.1)
+
+
+async def test_wait_for_timeout():
+    with VirtualClock() as clock:
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.sleep(3600), timeout=10)
+    assert clock.elapsed == pytest.approx(10, abs=0.1)
+
+
+async def test_loop_timer():
+    with VirtualClock() as clock:
+        future = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().call_later(120, future.set_result, 'done')
+        assert await future == 'done'
+    assert clock.elapsed == pytest.approx(120, abs=0.1)
+
+
+async def test_restored():
+    sleep, monotonic = asyncio.sleep, time.monotonic
+    with VirtualClock():
+        assert asyncio.sleep is not sleep
+    assert asyncio.sleep is sleep
+    assert time.monotonic is monotonic
+    assert 'call_at' not in vars(asyncio.get_running_loop())
+
+
+async def test_tornado_sleep():
+    """
+    tornado.gen.sleep schedules a timer on the IOLoop, which reaches the event loop through its call_at
+    """
+    with VirtualClock() as clock:
+        await gen.sleep(90)
+    assert clock.elapsed == pytest.approx(90, abs=0.1)
+
+
+async def test_other_loop(monkeypatch):
+    """
+    an event loop that is not one of asyncio's, e.g. uvloop, is refused before anything is patched
+    """
+    sleep = time.sleep
+    monkeypatch.setattr(asyncio, 'get_running_loop', lambda: OtherLoop())
+    try:
+        with pytest.raises(VirtualClockException):
+            VirtualClock().__enter__()
+    finally:
+        monkeypatch.undo()
+    assert time.sleep is sleep
+
+
+class OtherLoop(asyncio.AbstractEventLoop):
+    pass
@@ -1,5 +1,13 @@
-from pytest_factory.framework.parse_configs import prep_stores_update_local, DEFAULT_FOLDER_NAME
-from pytest_factory.framework.mall import MALL
+import os
+
+import pytest
+
+import pytest_factory.framework.mall as mall
+import pytest_factory.framework.parse_configs as parse_configs
+from pytest_factory.framework.exceptions import ConfigException
+from pytest_factory.framework.parse_configs import prep_stores_update_local, prep_all_sections, resolve_config, \
+    find_config_path, read_all_sections, search_config_path, set_config_cache_dir, DEFAULT_FOLDER_NAME
+from pytest_factory.framework.mall import MALL, Mall, import_from_str_path
 
 
 def test_configs():
@@ -13,3 +21,131 @@ def test_configs():
     assert MALL.string_var == 'BAR'
     MALL._current_test_dir = DEFAULT_FOLDER_NAME
     assert MALL.string_var == 'FOO'
+
+
+def test_resolve_config():
+    by_dir = prep_stores_update_local(dir_name='test_configs')
+    config = resolve_config(by_dir=by_dir, test_dir='test_configs')
+    assert config.values['string_var'] == 'BAR'
+    assert config.http_req_wildcard_fields == {'otherfield'}
+    assert config.env_vars == {'TEST': '404'}
+    assert config.assert_no_extra_calls is False
+    assert config.capture == 'full'
+    assert resolve_config(by_dir=by_dir, test_dir=DEFAULT_FOLDER_NAME).values['string_var'] == 'FOO'
+    with pytest.raises(AttributeError):
+        config.capture = 'off'
+
+
+def test_resolve_config_types():
+    """
+    the bools and ints of the framework do not need to be listed in bools or ints
+    """
+    config = resolve_config(by_dir={DEFAULT_FOLDER_NAME: {
+        'virtual_time': 'false', 'recycle_sut': 'False', 'retain_stores': 'true', 'capture_size': '4'
+    }}, test_dir=DEFAULT_FOLDER_NAME)
+    assert config.virtual_time is False
+    assert config.recycle_sut is False
+    assert config.retain_stores is True
+    assert config.capture_size == 4
+    assert resolve_config(by_dir={DEFAULT_FOLDER_NAME: {'capture_size': 4}}, test_dir=None).capture_size == 4
+    with pytest.raises(ConfigException):
+        resolve_config(by_dir={DEFAULT_FOLDER_NAME: {'capture_size': 'many'}}, test_dir=DEFAULT_FOLDER_NAME)
+
+
+def test_read_configs_from_all_sections(monkeypatch):
+    sections = prep_all_sections()
+    assert {DEFAULT_FOLDER_NAME, 'test_configs', 'test_plugin'} <= sections.keys()
+    monkeypatch.setattr(mall, 'prep_stores_update_local', None)
+    local_mall = Mall()
+    local_mall.set_all_sections(sections)
+    conf = local_mall.read_configs(test_dir='test_configs')
+    assert conf == {DEFAULT_FOLDER_NAME: sections[DEFAULT_FOLDER_NAME], 'test_configs': sections['test_configs']}
+    assert conf['test_configs'] is not sections['test_configs']
+
+
+def test_find_config_path(tmp_path):
+    root = tmp_path.joinpath('project')
+    root.joinpath('a', 'b', 'c').mkdir(parents=True)
+    root.joinpath('a', '.hidden').mkdir()
+    root.joinpath('a', '.hidden', 'config.ini').write_text('[tests]\n')
+    root.joinpath('a', 'b', 'c', 'config.ini').write_text('[tests]\n')
+    assert find_config_path(str(root)) == root.joinpath('a', 'b', 'c', 'config.ini')
+    assert find_config_path(str(root.joinpath('a', 'b', 'c'))) == root.joinpath('a', 'b', 'c', 'config.ini')
+    with pytest.raises(ConfigException):
+        find_config_path(str(root), max_depth=2)
+
+    root.joinpath('a', 'config.ini').write_text('[tests]\n')
+    assert find_config_path(str(root)) == root.joinpath('a', 'b', 'c', 'config.ini'), 'discovery is cached'
+    assert find_config_path(str(root), max_depth=3) == root.joinpath('a', 'config.ini')
+
+
+def test_search_config_path(tmp_path):
+    """
+    the parents of the working directory come first, sibling directories are never searched, a config.ini without a
+    [tests] section is not pytest-factory's and several at the same depth are an error
+    """
+    root = tmp_path.joinpath('project')
+    for directory in ('a/b/c', 'sibling', 'vendor', 'pq/p/tests', 'pq/q/tests', 'r/build'):
+        root.joinpath(directory).mkdir(parents=True)
+    root.joinpath('a', 'config.ini').write_text('[tests]\n')
+    root.joinpath('a', 'b', 'c', 'config.ini').write_text('[tests]\n')
+    root.joinpath('sibling', 'config.ini').write_text('[tests]\n')
+    root.joinpath('vendor', 'config.ini').write_text('[other]\n')
+    assert search_config_path(str(root.joinpath('a', 'b'))) == root.joinpath('a', 'config.ini')
+    assert search_config_path(str(root.joinpath('vendor'))) is None
+    assert search_config_path(str(root.joinpath('pq', 'p'))) is None
+
+    root.joinpath('pq', 'p', 'tests', 'config.ini').write_text('[tests]\n')
+    root.joinpath('pq', 'q', 'tests', 'config.ini').write_text('[tests]\n')
+    assert search_config_path(str(root.joinpath('pq', 'p'))) == root.joinpath('pq', 'p', 'tests', 'config.ini')
+    with pytest.raises(ConfigException):
+        search_config_path(str(root.joinpath('pq')))
+
+    root.joinpath('r', 'build', 'config.ini').write_text('[tests]\n')
+    assert search_config_path(str(root.joinpath('r'))) == root.joinpath('r', 'build', 'config.ini')
+
+
+def test_read_all_sections_cached(tmp_path, monkeypatch):
+    config_path = tmp_path.joinpath('config.ini')
+    config_path.write_text('[tests]\nstring_var = FOO\n[test_cache]\nstring_var = BAR\n')
+    monkeypatch.setattr(parse_configs, '_SECTIONS_BY_FILE', {})
+    sections = read_all_sections(path=str(config_path))
+    assert sections['test_cache']['string_var'] == 'BAR'
+    assert read_all_sections(path=str(config_path)) is sections
+
+    config_path.write_text('[tests]\nstring_var = FOO\n[test_cache]\nstring_var = BAZ\n')
+    os.utime(config_path, ns=(0, 0))
+    assert read_all_sections(path=str(config_path))['test_cache']['string_var'] == 'BAZ'
+
+
+def test_read_all_sections_disk_cache(tmp_path, monkeypatch):
+    config_path = tmp_path.joinpath('config.ini')
+    config_path.write_text('[tests]\nstring_var = FOO\n')
+    monkeypatch.setattr(parse_configs, '_SECTIONS_BY_FILE', {})
+    set_config_cache_dir(tmp_path)
+    try:
+        sections = read_all_sections(path=str(config_path))
+        assert tmp_path.joinpath(parse_configs.CONFIG_CACHE_FILE_NAME).exists()
+        monkeypatch.setattr(parse_configs, '_SECTIONS_BY_FILE', {})
+        monkeypatch.setattr(parse_configs, 'get_config_parser', None)
+        assert read_all_sections(path=str(config_path)) == sections
+    finally:
+        set_config_cache_dir(None)
+
+
+def test_imports_resolved_once(monkeypatch):
+    import_from_str_path.cache_clear()
+    monkeypatch.setattr(MALL, '_current_test_dir', None)
+    with MALL.stock(test_dir='test_configs'):
+        pass
+    misses = import_from_str_path.cache_info().misses
+    assert misses > 0
+    resolved = MALL.config
+    with MALL.stock(test_dir='test_configs'):
+        pass
+    assert MALL.config is resolved
+
+    MALL._current_test_dir = None
+    with MALL.stock(test_dir='test_configs'):
+        pass
+    assert import_from_str_path.cache_info().misses == misses
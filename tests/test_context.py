@@ -0,0 +1,122 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from types import MappingProxyType
+
+import pytest
+
+from pytest_factory.framework.context import (ENV_OVERLAY, EnvOverlay, install_env_overlay, reset_env_overlay,
+                                              set_env_overlay, uninstall_env_overlay)
+from pytest_factory.framework.exceptions import AmbiguousTestException
+from pytest_factory.framework.mall import MALL
+
+
+def set_overlay(env_vars: dict) -> EnvOverlay:
+    install_env_overlay()
+    ENV_OVERLAY.set(MappingProxyType(env_vars))
+    return os.environ
+
+
+def test_env_overlay_scoped_to_context():
+    context = copy_context()
+    environ = context.run(set_overlay, {'PYTEST_FACTORY_OVERLAY': 'on'})
+    assert context.run(os.getenv, 'PYTEST_FACTORY_OVERLAY') == 'on'
+    assert os.getenv('PYTEST_FACTORY_OVERLAY') is None
+    assert 'PYTEST_FACTORY_OVERLAY' not in environ.environ
+
+
+def test_env_overlay_write_through():
+    def write() -> tuple:
+        environ = set_overlay({'PYTEST_FACTORY_OVERLAY': 'on'})
+        os.environ['PYTEST_FACTORY_OVERLAY'] = 'written'
+        written = os.environ['PYTEST_FACTORY_OVERLAY']
+        del os.environ['PYTEST_FACTORY_OVERLAY']
+        return written, 'PYTEST_FACTORY_OVERLAY' in os.environ, environ.environ.get('PYTEST_FACTORY_OVERLAY')
+
+    assert copy_context().run(write) == ('written', False, None)
+
+
+@pytest.mark.asyncio
+async def test_scoped_tasks_run_concurrently():
+    async def run(test_name: str) -> tuple:
+        with MALL.scoped(test_name=test_name) as store:
+            await asyncio.sleep(0)
+            return store, MALL.get_store()
+
+    current = MALL.get_store()
+    (store0, resolved0), (store1, resolved1) = await asyncio.gather(run('test_scoped0'), run('test_scoped1'))
+    assert store0 is resolved0 and store1 is resolved1
+    assert store0 is not store1
+    assert MALL.get_store() is current
+    assert MALL._last_test == current._test_name.split('.')[-1]
+    for store in (store0, store1):
+        MALL._by_test.pop(store._test_name)
+
+
+def test_env_overlay_fallback():
+    """
+    a thread, which starts with an empty context, reads the most recent overlay that is set, until it is reset
+    """
+    def getenv_in_thread(key: str):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(os.getenv, key).result()
+
+    install_env_overlay()
+    context = copy_context()
+    token = context.run(set_env_overlay, {'PYTEST_FACTORY_OVERLAY': 'on'})
+    assert getenv_in_thread('PYTEST_FACTORY_OVERLAY') == 'on'
+    context.run(reset_env_overlay, token)
+    assert getenv_in_thread('PYTEST_FACTORY_OVERLAY') is None
+
+
+def test_uninstall_env_overlay():
+    install_env_overlay()
+    environ = os.environ.environ
+    uninstall_env_overlay()
+    try:
+        assert os.environ is environ
+    finally:
+        install_env_overlay()
+
+
+def test_env_overlay_fallback_ambiguous(caplog):
+    """
+    with more than one overlay set, a thread cannot tell which is its own, so it reads the process environment
+    """
+    install_env_overlay()
+    contexts = [copy_context(), copy_context()]
+    tokens = [context.run(set_env_overlay, {'PYTEST_FACTORY_OVERLAY': value})
+              for context, value in zip(contexts, ['zero', 'one'])]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(os.getenv, 'PYTEST_FACTORY_OVERLAY').result() is None
+    for context, token in zip(contexts, tokens):
+        context.run(reset_env_overlay, token)
+    assert 'env_vars overlays are set' in caplog.text
+
+
+def test_env_overlay_opt_in(monkeypatch):
+    monkeypatch.setattr(MALL, 'env_overlay', True)
+    with MALL.stock():
+        assert isinstance(os.environ, EnvOverlay)
+        assert os.getenv('TEST') == MALL.env_vars['TEST']
+        assert 'TEST' not in os.environ.environ
+    assert os.getenv('TEST') is None
+
+
+@pytest.mark.asyncio
+async def test_scoped_thread():
+    """
+    a thread spawned from a scoped context, without its context, only resolves the Store of that test while no other
+    scoped context is active
+    """
+    loop = asyncio.get_running_loop()
+    with MALL.scoped(test_name='test_scoped0') as store0:
+        assert await loop.run_in_executor(None, MALL.get_store) is store0
+        with MALL.scoped(test_name='test_scoped1') as store1:
+            with pytest.raises(AmbiguousTestException):
+                await loop.run_in_executor(None, MALL.get_store)
+            assert await asyncio.to_thread(MALL.get_store) is store1
+        assert await loop.run_in_executor(None, MALL.get_store) is store0
+    for store in (store0, store1):
+        MALL._by_test.pop(store._test_name)
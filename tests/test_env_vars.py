@@ -1,4 +1,10 @@
+import asyncio
 import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+
 import pytest
 
 from pytest_factory.framework.mall import MALL
@@ -19,3 +25,27 @@ class TestEnvVars:
         assert MALL.env_vars == {'TEST': '42'}
         val = os.getenv('TEST')
         assert val == "42"
+
+    def test_env_vars_in_threads(self, store):
+        """
+        threads that do not inherit the context of the test see its env_vars too
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(os.getenv, 'TEST').result() == '42'
+        thread = Thread(target=lambda: values.append(os.environ.get('TEST')))
+        values = []
+        thread.start()
+        thread.join()
+        assert values == ['42']
+
+    @pytest.mark.asyncio
+    async def test_env_vars_in_executor(self, store):
+        assert await asyncio.get_running_loop().run_in_executor(None, os.getenv, 'TEST') == '42'
+
+    def test_env_vars_in_subprocess(self, store):
+        """
+        env_vars are set in the process environment, unless the factory_env_overlay ini option is set
+        """
+        assert os.environb[b'TEST'] == b'42'
+        result = subprocess.run([sys.executable, '-c', 'import os; print(os.environ["TEST"])'], capture_output=True)
+        assert result.stdout.decode().strip() == '42'
@@ -1,4 +1,4 @@
-from pytest_factory.framework.factory import make_factory, BaseMockRequest
+from pytest_factory.framework.factory import make_factory, BaseMockRequest, SutBuilder
 from pytest_factory.framework.store import Store
 import pytest
 
@@ -40,3 +40,13 @@ def _teardown(resp: str):
 def test_setup(store):
     resp = store.sut.bar()
     assert resp == 42
+
+
+@make_factory(req_obj=MockRequest(42))
+def test_lazy_sut(store):
+    assert isinstance(store._sut_factory.get_sut, SutBuilder)
+    assert store._sut is None
+    assert store.sut is store.sut
+    store.release_sut()
+    assert store._sut is None
+    assert store.sut.bar() == 42
@@ -1,9 +1,14 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from json import JSONDecodeError
 import pytest
 
+import requests
 from requests import Timeout
 
 from pytest_factory.http import mock_http_server, MockHttpResponse as mhr
+from pytest_factory.framework.clock import VirtualClock
 from pytest_factory.framework.exceptions import UnCalledTestDoubleException
 from pytest_factory.monkeypatch.tornado import tornado_handler
 
@@ -49,6 +54,42 @@ class TestHttp:
         resp = await store.sut.run_test()
         assert resp.body.decode() == 'bar'
 
+    @tornado_handler(url='endpoint0?num=3')
+    @mock_http_server(url='http://www.test.com/endpoint0', response=(mhr(body=b) for b in [b'b', b'a', b'r']))
+    async def test_http_call_thrice_generator(self, store):
+        resp = await store.sut.run_test()
+        assert resp.body.decode() == 'bar'
+
+    @tornado_handler(url='endpoint0?num=3')
+    @mock_http_server(url='http://www.test.com/endpoint0', response=[mhr(body=b) for b in [b'b', b'a', b'r']])
+    async def test_http_capture_ring(self, store):
+        store.set_capture_policy(mode='ring', size=2)
+        resp = await store.sut.run_test()
+        assert store.messages.total == 8
+        assert len(store.messages) == 2
+        assert store.messages[1] == resp
+
+    @tornado_handler(url='endpoint0?num=3')
+    @mock_http_server(url='http://www.test.com/endpoint0', response=[mhr(body=b) for b in [b'b', b'a', b'r']])
+    async def test_http_bench(self, store, tmp_path):
+        result = await store.bench(n=200, concurrency=8, result_path=tmp_path.joinpath('bench.json'))
+        assert result.n == 200
+        assert result.ops_per_sec > 0
+        assert result.p50_ms <= result.p95_ms <= result.p99_ms
+        assert json.loads(tmp_path.joinpath('bench.json').read_text())['n'] == 200
+        resp = await store.sut.run_test()
+        assert resp.body.decode() == 'bar'
+        assert store.messages.total == 8
+
+    @tornado_handler(url='endpoint0?num=3')
+    @mock_http_server(url='http://www.test.com/endpoint0', response=[mhr(body=b) for b in [b'b', b'a', b'r']])
+    async def test_http_bench_virtual_time(self, store):
+        result = await store.bench(n=10, concurrency=2, virtual_time=True)
+        assert result.n == 10
+        assert store.virtual_time is None
+        resp = await store.sut.run_test()
+        assert resp.body.decode() == 'bar'
+
     @mock_http_server(url='http://www.test.com/endpoint0', response=lambda x: x.url)
     async def test_http_response_function(self, store):
         resp = await store.sut.run_test()
@@ -63,6 +104,20 @@ class TestHttp:
                "'headers': {}}>")
         assert resp.body.decode() == msg
 
+    @mock_http_server(url='http://www.test.com/endpoint0', response='slow', latency=300)
+    async def test_http_latency_virtual_time(self, store):
+        start = time.perf_counter()
+        resp = await store.sut.run_test(virtual_time=True)
+        assert resp.body.decode() == 'slow'
+        assert store.clock.elapsed >= 300
+        assert time.perf_counter() - start < 1
+
+    @mock_http_server(url='http://www.test.com/endpoint0', timeout_after=120)
+    async def test_http_timeout_after_virtual_time(self, store):
+        resp = await store.sut.run_test(virtual_time=True)
+        assert resp.body.decode() == ('caught RequestException: http://www.test.com/endpoint0 did not respond in '
+                                      '120 seconds')
+
     class TestResponseTracking:
         @tornado_handler(url='endpoint0?num=0')
         async def test_http_no_calls_warning(self, store, caplog):
@@ -135,3 +190,30 @@ class TestQueryParams:
     async def test_http_query_params_misordered_success(self, store):
         resp = await store.sut.run_test()
         assert resp.body.decode() == 'exact match!'
+
+
+def get_with_backoff(url: str, retries: int = 3, timeout: float = 10) -> requests.Response:
+    for attempt in range(retries):
+        try:
+            return requests.get(url=url, timeout=timeout)
+        except Timeout:
+            time.sleep(2 ** attempt)
+    raise Timeout
+
+
+@mock_http_server(url='http://www.test.com/endpoint1',
+                  response=[mhr(timeout_after=60), mhr(body=b'late', delay=30), 'ok'])
+async def test_http_timeout_backoff_virtual_time(store):
+    with VirtualClock() as clock:
+        resp = get_with_backoff('http://www.test.com/endpoint1')
+    assert resp.text == 'ok'
+    assert clock.elapsed == pytest.approx(10 + 1 + 10 + 2)
+
+
+@mock_http_server(url='http://www.test.com/endpoint1', response=[str(i) for i in range(500)])
+async def test_http_thread_pool(store):
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        bodies = list(pool.map(lambda _: requests.get(url='http://www.test.com/endpoint1').text, range(500)))
+    assert sorted(bodies) == sorted(str(i) for i in range(500))
+    assert store.messages.total == 1000
+    assert [message.url for message in store.messages[::2]] == ['http://www.test.com/endpoint1'] * 500
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import pytest
+
+from pytest_factory.http import mock_http_server, mock_http_server_table, read_http_table
+from pytest_factory.framework.base_types import Factory
+from pytest_factory.monkeypatch.tornado import tornado_handler
+
+TABLE_DIR = Path(__file__).parent
+ROWS = [{'url': f'http://www.test.com/endpoint{i}', 'response': f'row {i}'} for i in range(1000)]
+
+
+def test_read_http_table_dedupe():
+    exchanges = read_http_table(TABLE_DIR.joinpath('http_table.jsonl'))
+    assert len(exchanges) == 2
+    (req0, resp0), (req1, resp1) = exchanges
+    assert resp0.body == b'jsonl endpoint0'
+    assert req1.method == 'post'
+    assert resp1.status == 201
+    assert resp1.headers == {'Content-Type': 'text/plain'}
+
+
+def test_read_http_table_csv():
+    exchanges = read_http_table(TABLE_DIR.joinpath('http_table.csv'))
+    assert [resp.status for _, resp in exchanges] == [200, 500]
+
+
+def test_factory_dedupe_by_signature():
+    factory = Factory()
+    for req_obj, response in read_http_table(ROWS + ROWS):
+        factory[req_obj] = response
+    for req_obj, response in read_http_table(ROWS):
+        factory[req_obj] = response
+    assert len(factory) == len(ROWS)
+
+
+@pytest.mark.asyncio
+@tornado_handler(url='endpoint0')
+@mock_http_server_table(ROWS)
+class TestHttpTable:
+    async def test_http_table(self, store):
+        resp = await store.sut.run_test(assert_no_missing_calls=False)
+        assert resp.body.decode() == 'row 0'
+        assert len(store.mock_http_server) == len(ROWS)
+
+    @mock_http_server(url='http://www.test.com/endpoint0', response='override')
+    async def test_http_table_override(self, store):
+        resp = await store.sut.run_test(assert_no_missing_calls=False)
+        assert resp.body.decode() == 'override'
+
+    @mock_http_server_table(TABLE_DIR.joinpath('http_table.csv'))
+    async def test_http_table_csv_first(self, store):
+        resp = await store.sut.run_test(assert_no_missing_calls=False)
+        assert resp.body.decode() == 'csv endpoint0'
@@ -54,3 +54,24 @@ def test_request_compare_wild_url():
     m0 = MockHttpRequest(url='https://www.google.com/maps')
     m1 = MockHttpRequest(url='https://www.google.com/*')
     assert m0.compare(m1)
+
+
+def test_request_signature_normalizes_query():
+    m0 = MockHttpRequest(url='https://www.google.com/maps?a=0&b=1')
+    m1 = MockHttpRequest(url='https://www.google.com/maps?b=1&a=0')
+    assert m0.signature == m1.signature
+    assert hash(m0.signature) == hash(m1.signature)
+    assert m0.signature is m0.signature
+
+
+def test_request_compare_wildcard_fields():
+    m0 = MockHttpRequest(url='https://www.google.com/maps')
+    m1 = MockHttpRequest(url='https://www.google.com/maps?a=b')
+    assert not m0.compare(m1, wildcard_fields=frozenset())
+    assert m0.compare(m1, wildcard_fields=frozenset({'query'}))
+
+
+def test_request_compare_longer_double():
+    m0 = MockHttpRequest(url='https://www.google.com/maps/place')
+    m1 = MockHttpRequest(url='https://www.google.com/maps')
+    assert not m0.compare(m1)
@@ -0,0 +1,41 @@
+import subprocess
+import sys
+from pathlib import Path
+
+# the self time of every pytest_factory module imported with the plugin, in microseconds. the plugin imports in
+# about 50ms here; the budget only catches an adapter, the writer or a heavy dependency creeping back in
+PLUGIN_IMPORT_BUDGET_US = 200_000
+
+LAZY_MODULES = {'pytest_factory.http', 'pytest_factory.framework.factory', 'pytest_factory.lifecycle.writer',
+                'pytest_factory.lifecycle.recorder', 'requests', 'tornado', 'aiohttp', 'black', 'jinja2'}
+
+
+def import_plugin() -> subprocess.CompletedProcess:
+    # pytest is imported first so that only the plugin's own imports are timed
+    code = 'import sys, pytest; import pytest_factory.framework.pytest; print(" ".join(sys.modules))'
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                          check=True, cwd=Path(__file__).parent.parent)
+
+
+def test_plugin_import_is_lazy():
+    result = import_plugin()
+    loaded = set(result.stdout.split())
+    assert 'pytest_factory.framework.pytest' in loaded
+    assert not loaded & LAZY_MODULES
+
+    self_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        if name.strip().startswith('pytest_factory'):
+            self_us += int(self_time)
+    assert 0 < self_us < PLUGIN_IMPORT_BUDGET_US
+
+
+def test_lazy_exports():
+    import pytest_factory
+    from pytest_factory.http import mock_http_server
+
+    assert pytest_factory.mock_http_server is mock_http_server
+    assert 'make_factory' in dir(pytest_factory)
@@ -1,8 +1,14 @@
 from json import JSONDecodeError
 from typing import List
 
+import pytest
+
 from pytest_factory.lifecycle.writer import Recording
 from pytest_factory.framework.base_types import Exchange
+from pytest_factory.framework.exceptions import RecorderException
+from pytest_factory.framework.smtp_types import SMTPRequest
+from pytest_factory.lifecycle import codecs, wire
+from pytest_factory.lifecycle.recording import deserialize, infer_type
 from pytest_factory.http import MockHttpResponse
 from pytest_factory.monkeypatch.tornado import TornadoRequest, MockHttpRequest
 
@@ -35,3 +41,95 @@ class TestRecording:
         serialized_recording = r0.serialize()
         r1 = Recording.deserialize(b_a=serialized_recording)
         assert serialized_recording == r1.serialize()
+
+    def test_serialize_binary_bodies(self):
+        """
+        bodies that are not UTF-8 keep their exact bytes, with or without compression
+        """
+        hp = f"{PassthruTestHandler.__module__}.{PassthruTestHandler.__name__}"
+        body = bytes(range(256)) * 4
+        request = TornadoRequest(method='post', url='/', body=body, sut_callable=hp)
+        de: List[Exchange] = [
+            (MockHttpRequest(url='http://www.test.com/endpoint0', headers={'x-test': 'a'}),
+             MockHttpResponse(body=b'\xff\xfe\x00' + body, headers={'content-type': 'application/pdf'}))
+        ]
+        r0 = Recording(incident_type=JSONDecodeError, sut_exchange=(request, JSONDecodeError), doc_exchanges=de)
+        for compression in (None, 'gzip', 'lzma'):
+            serialized_recording = r0.serialize(compression=compression)
+            r1 = Recording.deserialize(b_a=serialized_recording)
+            assert r1.first.body == body
+            assert r1.first.sut_callable is PassthruTestHandler
+            assert r1.last is JSONDecodeError
+            assert r1.incident_type is JSONDecodeError
+            assert r1.doc_exchanges[0][0].headers == {'x-test': 'a'}
+            assert r1.doc_exchanges[0][1].body == b'\xff\xfe\x00' + body
+            assert r1.doc_exchanges[0][1].headers == {'content-type': 'application/pdf'}
+            assert r1.created_at == r0.created_at
+            assert r1.serialize(compression=compression) == serialized_recording
+        assert len(r0.serialize(compression='gzip')) < len(r0.serialize())
+        with pytest.raises(UnicodeDecodeError):
+            r0.serialize(legacy=True)
+
+    def test_deserialize_legacy(self):
+        hp = f"{PassthruTestHandler.__module__}.{PassthruTestHandler.__name__}"
+        request = TornadoRequest(url='endpoint0', sut_callable=hp)
+        response = MockHttpResponse(status=500, body=b'ERROR: 500')
+        r0 = Recording(incident_type=Exception, sut_exchange=(request, response),
+                       doc_exchanges=[(MockHttpRequest(url='http://www.test.com/endpoint0'), response)])
+        legacy = r0.serialize(legacy=True)
+        assert legacy[:1] == b'{'
+        r1 = Recording.deserialize(b_a=legacy)
+        assert r1.serialize(legacy=True) == legacy
+        assert r1.last.body == b'ERROR: 500'
+        assert len(r0.serialize()) < len(legacy)
+
+    def test_deserialize_unknown_version(self):
+        serialized_recording = bytearray(Recording(incident_type=Exception, sut_exchange=(
+            TornadoRequest(url='endpoint0', sut_callable=PassthruTestHandler), MockHttpResponse())).serialize())
+        serialized_recording[3] = wire.VERSION + 1
+        with pytest.raises(RecorderException):
+            Recording.deserialize(b_a=bytes(serialized_recording))
+
+    def test_deserialize_typed_fields(self):
+        """
+        the fields in the schema of a class keep their types, e.g. a url that looks like a float stays a str
+        """
+        request = MockHttpRequest(url='1.2', body=b'3', headers={'a': 'b'})
+        smtp_request = SMTPRequest(from_addr='a@test.com', to_addrs=['b@test.com', 'c@test.com'], host='1.2')
+        for r0 in (Recording(incident_type=Exception, sut_exchange=(request, MockHttpResponse(body=b'4'))),
+                   Recording(incident_type=Exception, sut_exchange=(smtp_request, MockHttpResponse()))):
+            for legacy in (True, False):
+                r1 = Recording.deserialize(b_a=r0.serialize(legacy=legacy))
+                assert r1.first.kwargs == r0.first.kwargs
+                assert r1.last.body == r0.last.body
+        assert deserialize(request.serialize()).url == '1.2'
+
+    def test_codecs(self):
+        path = f'{SMTPRequest.__module__}.{SMTPRequest.__name__}'
+        assert codecs.get_codec(path).fields['host'] is codecs.FieldType.STR
+        assert codecs.get_codec(path) is codecs.get_codec(path)
+        assert codecs.get_codec(path).cls is SMTPRequest
+        unregistered = codecs.get_codec('json.decoder.JSONDecodeError')
+        assert unregistered.fields == {}
+        assert unregistered.cls is JSONDecodeError
+        hits = codecs.resolve_class.cache_info().hits
+        assert deserialize(str(JSONDecodeError)) is JSONDecodeError
+        assert codecs.resolve_class.cache_info().hits == hits + 1
+
+
+@pytest.mark.parametrize('s, expected', [
+    ('1.5', 1.5),
+    ('1.5.0', '1.5.0'),
+    ('a.b', 'a.b'),
+    ('42', 42),
+    (42, 42),
+    ("b'abc'", b'abc'),
+    ('b"abc"', b'abc'),
+    ('{"a": [1, null]}', {'a': [1, None]}),
+    ('None', None),
+    ('True', True),
+    ('text', 'text'),
+])
+def test_infer_type(s, expected):
+    assert infer_type(s) == expected
+    assert type(infer_type(s)) is type(expected)
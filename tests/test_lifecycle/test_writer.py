@@ -34,3 +34,12 @@ class TestWriter:
         r = Recording(incident_type=Exception, sut_exchange=se, doc_exchanges=de)
         w = Writer(recording=r)
         w.write_test(test_file_path)
+
+    def test_data_path(self, tmp_path):
+        hp = 'tests.test_http.passthru_app.PassthruTestHandler'
+        request = TornadoRequest(url='endpoint0', sut_callable=hp)
+        r = Recording(incident_type=Exception, sut_exchange=(request, MockHttpResponse(status=500, body=b'ERROR')))
+        Writer(recording=r).write_test(tmp_path.joinpath('test_data_path.py'),
+                                       data_path=tmp_path.joinpath('actual_response'))
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['actual_response', 'test_data_path.py']
+        assert 'ERROR' in tmp_path.joinpath('actual_response').read_text()
@@ -0,0 +1,61 @@
+from logging.handlers import QueueHandler
+
+from pytest_factory import logger
+from pytest_factory.framework.exceptions import ConfigException, capped_repr
+from pytest_factory.framework.http_types import MockHttpRequest, MockHttpResponse
+from tests.utils import get_logs, get_store, URL
+
+
+def test_one_handler_per_logger():
+    first = logger.get_logger('tests.test_logger')
+    second = logger.get_logger('tests.test_logger')
+    assert first is second
+    assert first.handlers == [logger.get_stream_handler()]
+
+
+def test_queue_logging(caplog):
+    log = logger.get_logger('tests.test_logger')
+    logger.start_queue_logging()
+    try:
+        assert isinstance(log.handlers[0], QueueHandler)
+        assert logger.get_logger('tests.test_logger.other').handlers == log.handlers
+        log.warning('queued')
+    finally:
+        logger.stop_queue_logging()
+    assert log.handlers == [logger.get_stream_handler()]
+    assert get_logs(caplog) == ['queued']
+
+
+def test_lazy_message():
+    class CountingException(ConfigException):
+        formatted = 0
+
+        def get_error_msg(self, log_msg: str) -> str:
+            CountingException.formatted += 1
+            return log_msg
+
+    exception = CountingException(log_msg='not logged', log=False)
+    assert CountingException.formatted == 0
+    assert str(exception) == 'not logged'
+    assert str(exception) == 'not logged'
+    assert CountingException.formatted == 1
+
+
+def test_capped_repr():
+    assert capped_repr('a' * 10, limit=10) == 'a' * 10
+    assert capped_repr('a' * 15, limit=10) == 'a' * 10 + '... (5 more characters)'
+
+
+def test_overcalls_warned_once(caplog):
+    store = get_store([MockHttpResponse(body=b'a')])
+    store.assert_no_extra_calls = False
+    for _ in range(4):
+        store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL))
+    assert get_logs(caplog) == []
+    store.flush_warnings()
+    actual = get_logs(caplog)
+    assert len(actual) == 1
+    assert 'expected only 1 calls' in actual[0] and 'got 4!' in actual[0]
+    assert actual[0].endswith(' (occurred 3 times in this test)')
+    store.flush_warnings()
+    assert len(get_logs(caplog)) == 1
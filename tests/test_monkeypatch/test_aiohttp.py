@@ -1,9 +1,12 @@
+import asyncio
+
 import pytest
 
-from aiohttp import ClientConnectionError
+from aiohttp import ClientConnectionError, ClientSession, ClientTimeout
 
 from pytest_factory.http import mock_http_server, MockHttpResponse
 from pytest_factory.monkeypatch.tornado import tornado_handler
+from pytest_factory.framework.clock import VirtualClock
 from pytest_factory import logger
 
 logger = logger.get_logger(__name__)
@@ -46,3 +49,43 @@ class TestAioHttp:
                "False, 'url': 'http://www.test.com/endpoint0', 'method': 'get', 'body': b'', "
                "'headers': {}}>")
         assert resp.body.decode() == msg
+
+
+@mock_http_server(url='http://www.test.com/endpoint0', response=MockHttpResponse(body=b'slow', delay=0.05))
+@mock_http_server(url='http://www.test.com/endpoint1', response='fast')
+async def test_concurrent_aio(store):
+    async with ClientSession() as session:
+        responses = await asyncio.gather(session.get('http://www.test.com/endpoint0'),
+                                         session.request('GET', 'http://www.test.com/endpoint1'))
+    assert [await resp.text() for resp in responses] == ['slow', 'fast']
+    assert [message.url for message in store.messages[::2]] == ['http://www.test.com/endpoint1',
+                                                                 'http://www.test.com/endpoint0']
+
+
+@mock_http_server(url='http://www.test.com/endpoint0', method='post', response='posted')
+async def test_async_context_manager_aio(store):
+    async with ClientSession() as session:
+        async with session.post('http://www.test.com/endpoint0', json={}) as resp:
+            assert await resp.text() == 'posted'
+
+
+@mock_http_server(url='http://www.test.com/endpoint0', response='slow', latency=60)
+async def test_timeout_virtual_time_aio(store):
+    with VirtualClock() as clock:
+        async with ClientSession(timeout=ClientTimeout(total=5)) as session:
+            with pytest.raises(asyncio.TimeoutError):
+                await session.get('http://www.test.com/endpoint0')
+    assert clock.elapsed == pytest.approx(5, abs=0.1)
+
+
+async def long_poll():
+    for body in ['first', 'second']:
+        await asyncio.sleep(0.01)
+        yield body
+
+
+@mock_http_server(url='http://www.test.com/endpoint0', response=long_poll())
+async def test_async_generator_aio(store):
+    async with ClientSession() as session:
+        assert [await (await session.get('http://www.test.com/endpoint0')).text() for _ in range(2)] == \
+               ['first', 'second']
@@ -0,0 +1,53 @@
+from pytest_factory.framework.mall import MALL
+from pytest_factory.monkeypatch import tornado
+from pytest_factory.monkeypatch.tornado import constructor, recycler, TornadoRequest
+from tests.test_monkeypatch.passthru_app import PassthruTestHandler
+
+
+def test_application_shared():
+    handler0 = constructor(req_obj=TornadoRequest(sut_callable=PassthruTestHandler, url='endpoint0'),
+                           sut_callable=PassthruTestHandler)
+    handler1 = constructor(req_obj=TornadoRequest(sut_callable=PassthruTestHandler, url='endpoint1'),
+                           sut_callable=PassthruTestHandler)
+    assert handler0 is not handler1
+    assert handler0.application is handler1.application
+
+
+def test_handler_recycled():
+    handler0 = constructor(req_obj=TornadoRequest(sut_callable=PassthruTestHandler, url='endpoint0'),
+                           sut_callable=PassthruTestHandler)
+    handler0.foo = 'bar'
+    recycler(sut=handler0, sut_callable=PassthruTestHandler)
+    handler1 = constructor(req_obj=TornadoRequest(sut_callable=PassthruTestHandler, url='endpoint1'),
+                           sut_callable=PassthruTestHandler)
+    assert handler1 is handler0
+    assert handler1.request.uri == 'endpoint1'
+    assert not hasattr(handler1, 'foo')
+
+
+
+class ResetHandler(PassthruTestHandler):
+    def reset(self) -> bool:
+        return not getattr(self, 'broken', False)
+
+
+def test_handler_reset_and_pool_size(monkeypatch):
+    tornado.clear()
+    monkeypatch.setattr(tornado, 'MAX_POOLED_HANDLERS', 2)
+    handlers = [constructor(req_obj=TornadoRequest(sut_callable=ResetHandler, url='endpoint0'),
+                            sut_callable=ResetHandler) for _ in range(4)]
+    handlers[1].broken = True
+    for handler in handlers:
+        recycler(sut=handler, sut_callable=ResetHandler)
+    assert tornado._HANDLER_POOL[ResetHandler] == [handlers[0], handlers[2]]
+
+
+def test_clear():
+    handler = constructor(req_obj=TornadoRequest(sut_callable=PassthruTestHandler, url='endpoint0'),
+                          sut_callable=PassthruTestHandler)
+    application = handler.application
+    recycler(sut=handler, sut_callable=PassthruTestHandler)
+    MALL.clear_monkeypatch_caches()
+    assert not tornado._APPLICATIONS and not tornado._HANDLER_POOL
+    assert constructor(req_obj=TornadoRequest(sut_callable=PassthruTestHandler, url='endpoint0'),
+                       sut_callable=PassthruTestHandler).application is not application
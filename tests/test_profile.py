@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from pytest_factory.framework.exceptions import MissingTestDoubleException
+from pytest_factory.framework.http_types import MockHttpRequest, MockHttpResponse
+from pytest_factory.framework.mall import MALL
+from pytest_factory.framework.profile import Profiler
+from pytest_factory.framework.store import Store
+from tests.utils import get_store, URL
+
+
+@pytest.fixture()
+def profiler():
+    profiler = Profiler()
+    get_next_response = Store.get_next_response
+    profiler.enable()
+    yield profiler
+    profiler.disable()
+    assert Store.get_next_response is get_next_response
+
+
+def test_profile_store(profiler):
+    store = get_store([MockHttpResponse(body=b'a')])
+    store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL))
+    store.assert_no_missing_calls = False
+    assert store.get_next_response(factory_name='mock_http_server',
+                                   req_obj=MockHttpRequest(url='http://www.other.com')) is None
+    store.assert_no_missing_calls = True
+    with pytest.raises(MissingTestDoubleException):
+        store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url='http://www.other.com'))
+    store.check_no_uncalled_test_doubles()
+
+    entry = profiler.by_test()['tests.test_store']
+    assert entry['misses'] == 2
+    assert entry['phases']['get_next_response']['calls'] == 3
+    assert entry['phases']['lookup']['calls'] == 3
+    assert entry['phases']['stock']['calls'] == 2
+    assert entry['total'] == pytest.approx(entry['phases']['get_next_response']['seconds'] +
+                                           entry['phases']['check_uncalled']['seconds'])
+    assert profiler.by_dir()['tests']['misses'] == 2
+
+
+def test_profile_measure_and_merge(profiler, tmp_path):
+    profiler.current = 'test_dir.test_one'
+    with profiler.measure('patch_callables'):
+        pass
+    with profiler.measure('collect', test='test_dir.<collection>'):
+        pass
+    other = Profiler()
+    other.merge(profiler.dump())
+    other.merge(profiler.dump())
+    assert other.by_test()['test_dir.test_one']['phases']['patch_callables']['calls'] == 2
+    assert other.by_dir()['test_dir']['phases'].keys() == {'patch_callables', 'collect'}
+    assert any(line.startswith('test_dir: ') for line in other.report_lines())
+
+    path = tmp_path.joinpath('profile.json')
+    other.write(path)
+    with open(path) as f:
+        assert json.load(f)['by_dir']['test_dir']['phases']['collect']['calls'] == 2
+
+
+def test_profile_collecting(profiler):
+    """
+    the test doubles stocked while a test file is collected add to its collect phase, without counting as calls
+    """
+    profiler.collecting = 'tests.<collection>'
+    get_store([MockHttpResponse(body=b'a')])
+    profiler.collecting = None
+
+    collect = profiler.by_test()['tests.<collection>']['phases']['collect']
+    stock = profiler.by_test()['tests.test_store']['phases']['stock']
+    assert collect['calls'] == 0
+    assert collect['seconds'] == pytest.approx(stock['seconds'])
+
+
+def test_profile_collect(profiler):
+    """
+    the Stocker made for a test file is its collect phase, but only while the file is collected
+    """
+    with profiler.collect(test_dir='tests'), MALL.stock(test_dir='tests'):
+        pass
+    with MALL.stock(test_dir='tests'):
+        pass
+    assert profiler.by_test()['tests.<collection>']['phases'].keys() == {'collect'}
+    assert profiler.by_test()['tests.<collection>']['phases']['collect']['calls'] == 1
+    assert profiler.collecting is None
@@ -0,0 +1,110 @@
+from itertools import product
+
+from pytest_factory.framework.base_types import Factory, TrackedResponses, compare_unknown_types
+from pytest_factory.framework.http_types import MockHttpRequest
+from pytest_factory.framework.routing import PluginRouter
+
+
+def linear_match(factory: Factory, req_obj: MockHttpRequest):
+    for key in factory.keys():
+        if compare_unknown_types(key, req_obj):
+            return key
+    return None
+
+
+def make_factory(urls, method: str = 'get') -> Factory:
+    factory = Factory()
+    for url in urls:
+        factory.update({MockHttpRequest(url=url, method=method): TrackedResponses.from_any(None, url)})
+    return factory
+
+
+def test_exact_match():
+    factory = make_factory([f'http://www.test.com/endpoint{i}' for i in range(100)])
+    key = factory.get_matching_key(MockHttpRequest(url='http://www.test.com/endpoint42'))
+    assert key.url == 'http://www.test.com/endpoint42'
+
+
+def test_no_match():
+    factory = make_factory(['http://www.test.com/endpoint0'])
+    assert factory.get_matching_key(MockHttpRequest(url='http://www.test.com/endpoint1')) is None
+    assert factory.get_matching_key(MockHttpRequest(url='http://www.test.com/endpoint0', method='post')) is None
+
+
+def test_first_match_wins():
+    factory = make_factory(['http://www.test.com/*', 'http://www.test.com/endpoint0'])
+    key = factory.get_matching_key(MockHttpRequest(url='http://www.test.com/endpoint0'))
+    assert key.url == 'http://www.test.com/*'
+
+    factory = make_factory(['http://www.test.com/endpoint0', 'http://www.test.com/*'])
+    key = factory.get_matching_key(MockHttpRequest(url='http://www.test.com/endpoint0'))
+    assert key.url == 'http://www.test.com/endpoint0'
+
+
+def test_prefix_match():
+    factory = make_factory(['http://www.test.com/endpoint0'])
+    key = factory.get_matching_key(MockHttpRequest(url='http://www.test.com/endpoint0/more'))
+    assert key.url == 'http://www.test.com/endpoint0'
+
+
+def test_trailing_wildcard_match():
+    factory = make_factory(['http://www.test.com/endpoint0/*'])
+    key = factory.get_matching_key(MockHttpRequest(url='http://www.test.com/endpoint0'))
+    assert key.url == 'http://www.test.com/endpoint0/*'
+
+
+def test_string_keys_keep_order():
+    factory = make_factory(['http://www.test.com/endpoint0'])
+    factory.update({'http://www.test.com': 'plugin'})
+    key = factory.get_matching_key(MockHttpRequest(url='http://www.test.com/endpoint0'))
+    assert key.url == 'http://www.test.com/endpoint0'
+    key = factory.get_matching_key(MockHttpRequest(url='http://www.test.com/endpoint1'))
+    assert key == 'http://www.test.com'
+
+
+def test_matches_linear_scan():
+    segments = ['a', 'b', '*', '']
+    urls = [f'http://www.test.com/{x}/{y}' for x, y in product(segments, repeat=2)]
+    urls += [f'http://www.test.com/{x}' for x in segments] + ['http://*/a', 'http://www.test.com/a?x=1']
+    factory = make_factory(urls)
+    actual_urls = urls + ['http://www.test.com/a/b/c', 'http://www.other.com/a', 'http://www.test.com/a?x=2']
+    for url in actual_urls:
+        req_obj = MockHttpRequest(url=url)
+        assert factory.get_matching_key(req_obj) is linear_match(factory, req_obj), url
+
+
+def test_plugin_router_longest_prefix():
+    router = PluginRouter({'http://www.test.com': 'test', 'http://www.test.com/plugin0': 'plugin0',
+                           'https://www.test.com': 'https'})
+    assert router.match('http://www.test.com/plugin0/more?x=1') == 'plugin0'
+    assert router.match('http://www.test.com/plugin1') == 'test'
+    assert router.match('https://www.test.com/plugin0') == 'https'
+    assert router.match('http://www.test.community') is None
+    assert router.match(None) is None
+
+
+def test_plugin_router_unsplit_url():
+    router = PluginRouter({'somedomain.com': 'substring'})
+    assert router.match('http://www.somedomain.com/plugin0') == 'substring'
+
+
+def test_plugin_router_query():
+    router = PluginRouter({'https://x.com/v1?k=1': 'query', 'https://x.com/v1#top': 'fragment',
+                           'https://x.com': 'host'})
+    assert router.match('https://x.com/v1?k=1') == 'query'
+    assert router.match('https://x.com/v1?j=2&k=1') == 'query'
+    assert router.match('https://x.com/v1?k=2') == 'host'
+    assert router.match('https://x.com/v1/q?k=1') == 'host'
+    assert router.match('https://x.com/v1#top') == 'fragment'
+    assert router.match('https://x.com/v1') == 'host'
+    assert PluginRouter({'https://x.com/v1?k=1': 'query'}).match('https://x.com/v1/q?k=2') is None
+
+
+def test_plugin_router_whole_segments():
+    """
+    a plugin url prefixes the url of a request by whole path segments, not by characters
+    """
+    router = PluginRouter({'https://x.com/api': 'api'})
+    assert router.match('https://x.com/api') == 'api'
+    assert router.match('https://x.com/api/v1') == 'api'
+    assert router.match('https://x.com/apix') is None
@@ -0,0 +1,209 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from pytest_factory.framework.exceptions import LazyResponseException, OverCalledTestDoubleException, \
+    UnCalledTestDoubleException
+from pytest_factory.framework.mall import Mall
+from pytest_factory.framework.store import Store, StoreSummary
+from pytest_factory.framework.http_types import MockHttpRequest, MockHttpResponse
+from tests.utils import get_store, URL
+
+
+def test_route_memoized(monkeypatch):
+    store = get_store([MockHttpResponse(body=b) for b in [b'a', b'b']])
+    calls = []
+    get_matching_key = store.mock_http_server.get_matching_key
+    monkeypatch.setattr(store.mock_http_server, 'get_matching_key',
+                        lambda req_obj, **kwargs: calls.append(req_obj) or get_matching_key(req_obj, **kwargs))
+    bodies = [store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL)).body
+              for _ in range(2)]
+    assert bodies == [b'a', b'b']
+    assert len(calls) == 1
+
+
+def test_route_memo_invalidated_by_update():
+    store = get_store(MockHttpResponse(body=b'endpoint0'))
+    req_obj = MockHttpRequest(url=f'{URL}/more')
+    assert store.get_next_response(factory_name='mock_http_server', req_obj=req_obj).body == b'endpoint0'
+    store.update(factory_name='mock_http_server', req_obj=MockHttpRequest(url=f'{URL}/more'),
+                 response=MockHttpResponse(body=b'more'))
+    assert store._route_cache == {}
+
+
+def test_uncalled_count():
+    responses = [MockHttpResponse(body=b) for b in [b'a', b'b']]
+    store = get_store(responses)
+    store.update(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL), response=responses)
+    assert store._uncalled == {'mock_http_server': 2}
+    store.assert_no_extra_calls = False
+    for _ in range(3):
+        store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL))
+    assert store._uncalled == {'mock_http_server': 0}
+    assert next(iter(store.mock_http_server.values())).count == 3
+    store.check_no_uncalled_test_doubles()
+
+
+def test_threads_dequeue_once():
+    responses = [MockHttpResponse(body=str(i).encode()) for i in range(2000)]
+    store = get_store(responses)
+
+    def call(_) -> bytes:
+        return store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL)).body
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        bodies = list(pool.map(call, range(len(responses))))
+    assert sorted(bodies) == sorted(response.body for response in responses)
+    assert next(iter(store.mock_http_server.values())).count == len(responses)
+    assert store._uncalled == {'mock_http_server': 0}
+
+
+def test_uncalled_responses():
+    store = get_store([MockHttpResponse(body=b) for b in [b'a', b'b']])
+    store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL))
+    assert store._uncalled == {'mock_http_server': 1}
+    responses = next(iter(store.mock_http_server.values()))
+    assert [response.body for response in responses.uncalled_responses()] == [b'b']
+    with pytest.raises(UnCalledTestDoubleException):
+        store.check_no_uncalled_test_doubles()
+
+
+def test_lazy_responses():
+    store = get_store(MockHttpResponse(body=str(i).encode()) for i in range(10000))
+    assert store._uncalled == {'mock_http_server': 1}
+    for i in range(10000):
+        response = store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL))
+        assert response.body == str(i).encode()
+    assert store._uncalled == {'mock_http_server': 0}
+    with pytest.raises(OverCalledTestDoubleException) as exc_info:
+        store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL))
+    assert 'expected only 10000 calls' in str(exc_info.value)
+    store.check_no_uncalled_test_doubles()
+
+
+def test_lazy_async_responses():
+    async def responses():
+        for body in [b'a', b'b']:
+            yield MockHttpResponse(body=body)
+
+    store = get_store(responses())
+    store.assert_no_extra_calls = False
+    bodies = [store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL)).body
+              for _ in range(3)]
+    assert bodies == [b'a', b'b', b'b']
+
+
+@pytest.mark.asyncio
+async def test_lazy_async_responses_awaited():
+    """
+    asynchronous adapters await the next response, so the source may suspend, e.g. on an asyncio.Queue
+    """
+    async def responses():
+        queue = asyncio.Queue()
+        for body in [b'a', b'b', None]:
+            queue.put_nowait(body)
+        while True:
+            body = await queue.get()
+            await asyncio.sleep(0)
+            if body is None:
+                return
+            yield MockHttpResponse(body=body)
+
+    store = get_store(responses())
+    assert store._uncalled == {'mock_http_server': 1}
+    with pytest.raises(LazyResponseException):
+        store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL))
+    store = get_store(responses())
+    bodies = [(await store.aget_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL))).body
+              for _ in range(2)]
+    assert bodies == [b'a', b'b']
+    assert store._uncalled == {'mock_http_server': 0}
+    store.check_no_uncalled_test_doubles()
+    with pytest.raises(OverCalledTestDoubleException):
+        await store.aget_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL))
+
+
+@pytest.mark.asyncio
+async def test_lazy_async_responses_empty():
+    async def responses():
+        return
+        yield
+
+    store = get_store(responses())
+    store.assert_no_extra_calls = False
+    assert await store.aget_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL)) is None
+    assert store._uncalled == {'mock_http_server': 0}
+
+
+def test_lazy_responses_uncalled():
+    store = get_store(iter([MockHttpResponse(body=b'a'), MockHttpResponse(body=b'b')]))
+    store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL))
+    with pytest.raises(UnCalledTestDoubleException) as exc_info:
+        store.check_no_uncalled_test_doubles()
+    assert "'body': b'b'" in str(exc_info.value)
+
+
+def test_store_deferred():
+    store = Store(test_path='tests.test_store', defer=True)
+    store.update(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL),
+                 response=MockHttpResponse(body=b'a'))
+    assert not hasattr(store, 'mock_http_server')
+    store.stock()
+    assert store.get_next_response(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL)).body == b'a'
+
+
+def test_store_evicted_after_last_item():
+    mall = Mall()
+    items = [SimpleNamespace(name='test_evict', path=Path('tests/test_store.py')) for _ in range(2)]
+    mall.expect_items(items=items)
+    store = mall.get_store(item=items[0])
+    store.update(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL), response=MockHttpResponse())
+    store.messages.extend([MockHttpRequest(url=URL), MockHttpResponse()])
+    mall.check_out(item=items[0], failed=True)
+    assert mall.get_store(item=items[1]) is store
+    mall.check_out(item=items[1])
+    assert 'tests.test_evict' not in mall._by_test
+    assert mall.summaries['tests.test_evict'] == StoreSummary(test_path='tests.test_evict',
+                                                              calls={'mock_http_server': 0},
+                                                              uncalled={'mock_http_server': 1}, messages=2,
+                                                              failed=True)
+
+
+def test_store_retained(monkeypatch):
+    mall = Mall()
+    item = SimpleNamespace(name='test_retain', path=Path('tests/test_store.py'))
+    monkeypatch.setitem(mall._by_dir, 'tests', {'retain_stores': True})
+    store = mall.get_store(item=item)
+    mall.check_out(item=item)
+    assert mall.get_store(item=item) is store
+    assert mall.summaries == {}
+
+
+def test_merge_summaries():
+    summary = StoreSummary(test_path='tests.test_merge', calls={'mock_http_server': 1}, uncalled={}, messages=4,
+                           failed=False)
+    mall = Mall()
+    mall.merge_summaries(summaries=[summary._asdict()])
+    assert mall.summaries == {'tests.test_merge': summary}
+
+
+def test_summary_lines():
+    mall = Mall()
+    assert mall.summary_lines() == []
+    mall.merge_summaries(summaries=[
+        StoreSummary(test_path='tests.test_called', calls={'mock_http_server': 3}, uncalled={}, messages=8)._asdict(),
+        StoreSummary(test_path='tests.test_uncalled0', calls={'mock_http_server': 1, 'mock_smtp_server': 0},
+                     uncalled={'mock_smtp_server': 1}, messages=4, failed=True)._asdict(),
+        StoreSummary(test_path='tests.test_uncalled1', calls={'mock_http_server': 0},
+                     uncalled={'mock_http_server': 2}, messages=2)._asdict()
+    ])
+    assert mall.summary_lines(n_tests=1) == [
+        '3 tests, 4 calls to test doubles (mock_http_server 4, mock_smtp_server 0), 14 messages',
+        '2 tests left test doubles uncalled:',
+        'tests.test_uncalled1: mock_http_server 2',
+        '... and 1 more'
+    ]
+    assert mall.summary_lines()[-1] == 'tests.test_uncalled0: mock_smtp_server 1 (failed)'
@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('xdist')
+
+REPO_PATH = Path(__file__).parent.parent
+
+
+CONFIG = """[tests]
+assert_no_missing_calls = false
+requests = pytest_factory.monkeypatch.requests
+imports = requests
+"""
+
+TESTS = """import requests
+
+from pytest_factory.http import mock_http_server
+
+URL = 'http://www.test.com/endpoint'
+
+
+@mock_http_server(url=URL, response=['a', 'b'])
+def test_twice(store):
+    assert [requests.get(url=URL).text for _ in range(2)] == ['a', 'b']
+
+
+@mock_http_server(url=URL, response='a')
+def test_once(store):
+    assert requests.get(url=URL).text == 'a'
+
+
+@mock_http_server(url=URL, response=['a', 'b'])
+def test_uncalled(store):
+    assert requests.get(url=URL).text == 'a'
+
+
+@mock_http_server(url=URL, response='a')
+def test_not_run(store):
+    requests.get(url=URL)
+"""
+
+CONFTEST = """import json
+from pathlib import Path
+
+from pytest_factory.framework.mall import MALL
+
+
+def pytest_sessionfinish(session):
+    workerinput = getattr(session.config, 'workerinput', None)
+    if workerinput is not None:
+        deferred = sorted(key for key, store in MALL._by_test.items() if store._deferred is not None)
+        stocked = sorted(key for key, store in MALL._by_test.items() if store._deferred is None)
+        Path(__file__).parent.joinpath(workerinput['workerid'] + '.json').write_text(json.dumps(
+            {'ran': sorted(MALL.summaries), 'deferred': deferred, 'stocked': stocked}))
+"""
+
+
+def run_pytest(path: Path, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, '-m', 'pytest', '-p', 'pytest_factory.framework.pytest', '-p',
+                           'no:cacheprovider', '-p', 'no:randomly', '-n', '2', '-q', *args], capture_output=True,
+                          text=True, cwd=path, env=dict(os.environ, PYTHONPATH=str(REPO_PATH)))
+
+
+def test_xdist_factory_tests(tmp_path):
+    """
+    each worker only stocks the Stores of the tests that it runs, and the controller reports the StoreSummary of
+    every test
+    """
+    tests_path = tmp_path.joinpath('tests')
+    tests_path.mkdir()
+    tests_path.joinpath('config.ini').write_text(CONFIG)
+    tests_path.joinpath('test_app.py').write_text(TESTS)
+    tests_path.joinpath('conftest.py').write_text(CONFTEST)
+    result = run_pytest(tmp_path, '-k', 'not test_not_run')
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert '3 passed' in result.stdout
+    assert '3 tests, 4 calls to test doubles (mock_http_server 4), 8 messages' in result.stdout
+    assert 'tests.test_uncalled: mock_http_server 1' in result.stdout
+
+    workers = [json.loads(path.read_text()) for path in tests_path.glob('gw*.json')]
+    assert len(workers) == 2
+    assert sorted(key for worker in workers for key in worker['ran']) == \
+           ['tests.test_once', 'tests.test_twice', 'tests.test_uncalled']
+    tests = {'tests.test_once', 'tests.test_twice', 'tests.test_uncalled', 'tests.test_not_run'}
+    for worker in workers:
+        assert worker['stocked'] == []
+        assert worker['deferred'] == sorted(tests - set(worker['ran']))
+
+
+def test_xdist_without_config(tmp_path):
+    """
+    a project without config.ini runs with pytest-xdist, as it does without it
+    """
+    tmp_path.joinpath('test_plain.py').write_text('def test_plain():\n    assert True\n')
+    result = run_pytest(tmp_path)
+    assert 'INTERNALERROR' not in result.stdout + result.stderr
+    assert result.returncode == 0, result.stdout
+    assert '1 passed' in result.stdout
@@ -1,6 +1,10 @@
 import re
 from typing import List, Union, Optional, Callable, Tuple
 
+from pytest_factory.framework.base_types import BaseMockRequest
+from pytest_factory.framework.http_types import MockHttpRequest
+from pytest_factory.framework.store import Store
+
 UUID_PATTERN = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
 ISO_PATTERN_COMPLETE = r'\d{4}-[01]\d-[0-3]\dT[0-2]\d:[0-5]\d:[0-5]\d\.\d+([+-][0-2]\d:[0-5]\d|)'
 ISO_PATTERN_SECONDS = r'\d{4}-[01]\d-[0-3]\dT[0-2]\d:[0-5]\d:[0-5]\d([+-][0-2]\d:[0-5]\d|)'
@@ -19,6 +23,8 @@ Pattern = Union[str, re.Pattern]
 PatternOrPatterns = Union[Pattern, List[Pattern]]
 Repl = Union[str, Callable]
 
+URL = 'http://www.test.com/endpoint0'
+
 
 def mask(patterns: PatternOrPatterns, string: str, repl: Optional[Repl] = None) -> str:
     if not patterns:
@@ -43,3 +49,13 @@ def get_masked_pair(patterns: PatternOrPatterns, a: str, b: str,
 def get_logs(caplog, levelname: str = 'WARNING') -> List[str]:
     actual = [rec.message for rec in caplog.records if rec.levelname == levelname]
     return actual
+
+
+def get_store(responses: list) -> Store:
+    """
+    :return: a Store with a SUT and a mock_http_server test double at URL that returns responses
+    """
+    store = Store(test_path='tests.test_store')
+    store.update(factory_name='make_factory', req_obj=BaseMockRequest(), response=object(), response_is_sut=True)
+    store.update(factory_name='mock_http_server', req_obj=MockHttpRequest(url=URL), response=responses)
+    return store